@@ -2,56 +2,51 @@
 """
 Controle Direto - Envie comandos para o Arduino
 """
-import serial
+import os
+import sys
 import time
-import threading
+
+# Adiciona o diretório raiz ao path para imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from serial_transport import SerialTransport
 
 class ControleDireto:
     def __init__(self, porta='/dev/ttyUSB0'):
         self.porta = porta
-        self.serial = None
+        self.transporte = None
         self.rodando = True
         
     def conectar(self):
         try:
-            self.serial = serial.Serial(self.porta, 115200, timeout=0.1)
-            time.sleep(2)
+            self.transporte = SerialTransport(self.porta, 115200)
+            # Mensagens iniciais são descartadas; espera só o firmware ficar pronto
+            _, pronto = self.transporte.conectar()
+            if not pronto:
+                print("⚠ Firmware não confirmou que está pronto; continuando")
             print(f"✓ Conectado a {self.porta}\n")
-            
-            # Limpa buffer inicial
-            while self.serial.in_waiting:
-                self.serial.readline()
-            
             return True
         except Exception as e:
             print(f"✗ Erro: {e}")
             return False
     
-    def monitor_serial(self):
-        """Thread para ler respostas do Arduino"""
-        while self.rodando:
-            try:
-                if self.serial and self.serial.in_waiting:
-                    linha = self.serial.readline().decode('utf-8', errors='ignore').strip()
-                    if linha and linha != "OK":
-                        print(f"← {linha}")
-            except:
-                pass
-            time.sleep(0.01)
+    def monitor_serial(self, linha):
+        """Ouvinte da serial: imprime respostas do Arduino"""
+        if linha and linha != "OK":
+            print(f"← {linha}")
     
     def enviar(self, cmd):
         """Envia comando para Arduino"""
-        if self.serial:
-            self.serial.write(f"{cmd}\n".encode())
+        if self.transporte:
+            self.transporte.escrever(cmd)
             print(f"→ {cmd}")
     
     def executar(self):
         if not self.conectar():
             return
         
-        # Inicia thread de monitoramento
-        thread = threading.Thread(target=self.monitor_serial, daemon=True)
-        thread.start()
+        # Registra o monitor na thread leitora da serial
+        self.transporte.adicionar_ouvinte(self.monitor_serial)
         
         print("="*60)
         print("CONTROLE DIRETO - DIGITE COMANDOS")
@@ -86,8 +81,8 @@ class ControleDireto:
             print("\n\nInterrompido")
         finally:
             self.rodando = False
-            if self.serial:
-                self.serial.close()
+            if self.transporte:
+                self.transporte.fechar()
             print("\nDesconectado")
 
 if __name__ == "__main__":
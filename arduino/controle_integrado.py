@@ -13,16 +13,51 @@ Autor: Sistema Automatizado
 Data: 27/11/2025
 """
 
-import serial
+import argparse
 import time
-import threading
 import requests
 import sys
 import os
+from collections import deque
 
 # Adiciona o diretório raiz ao path para imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from dashboard.arduino import predicado_conclusao
+from dashboard.broker import BrokerClient
+from fila_regioes import CAMINHO_PADRAO as FILA_PADRAO, FilaRegioes
+from serial_transport import SerialTransport
+
+
+class Vazao:
+    """Pacotes/hora na janela recente e desde o início."""
+    
+    def __init__(self, janela):
+        self.janela = janela
+        self.inicio = time.monotonic()
+        self.total = 0
+        self._concluidos = deque()  # horários dos ciclos concluídos
+    
+    def registrar(self):
+        agora = time.monotonic()
+        self.total += 1
+        self._concluidos.append(agora)
+        while self._concluidos and self._concluidos[0] < agora - self.janela:
+            self._concluidos.popleft()
+    
+    def __str__(self):
+        decorrido = time.monotonic() - self.inicio
+        janela = min(self.janela, decorrido)
+        return (
+            f"{len(self._concluidos) / janela * 3600:.0f} pacotes/h (últimos {janela / 60:.0f} min) | "
+            f"{self.total / decorrido * 3600:.0f} pacotes/h no total"
+        )
+    
+    def resumo(self):
+        decorrido = time.monotonic() - self.inicio
+        return (f"{self.total} ciclos em {decorrido / 60:.1f} min"
+                + (f" ({self.total / decorrido * 3600:.0f} pacotes/h)" if decorrido > 0 else ""))
+
 
 class ControladorIntegrado:
     """
@@ -33,7 +68,11 @@ class ControladorIntegrado:
     # Mapeamento de regiões válidas
     REGIOES_VALIDAS = ['norte', 'nordeste', 'centro-oeste', 'sudeste', 'sul']
     
-    def __init__(self, porta_serial='/dev/ttyACM0', baudrate=115200, backend_url='http://127.0.0.1:8001'):
+    # Janela da vazão "corrente" (pacotes/hora dos últimos N segundos)
+    JANELA_VAZAO = 600
+    
+    def __init__(self, porta_serial='/dev/ttyACM0', baudrate=115200, backend_url='http://127.0.0.1:8001',
+                 broker_socket=None, fila_regioes=FILA_PADRAO):
         """
         Inicializa o controlador integrado.
         
@@ -41,37 +80,48 @@ class ControladorIntegrado:
             porta_serial: Porta serial do Arduino
             baudrate: Taxa de comunicação
             backend_url: URL base do backend Django
+            broker_socket: Socket do broker serial (manage.py serial_broker).
+                Se informado, os comandos passam pelo broker em vez de abrir a porta.
+            fila_regioes: Arquivo SQLite da fila de pacotes do modo automático
         """
         self.porta = porta_serial
         self.baudrate = baudrate
         self.backend_url = backend_url.rstrip('/')
-        self.serial_conn = None
+        self.transporte = None
+        self._respostas = None  # Assinatura: fila das linhas recebidas
+        self.broker = BrokerClient(broker_socket) if broker_socket else None
         self.executando = True
         self.aguardando_qr = False
-        self.ultimo_codigo_processado = None
-        
-        # Thread para monitorar serial
-        self._monitor_thread = None
+        self._http = requests.Session()
+        self.caminho_fila = fila_regioes
+        self.fila = None  # FilaRegioes, aberta no modo automático
+        self.verboso = True  # imprime cada linha enviada/recebida
+        # Com várias estações (multi_estacao.py): nome desta, nomes de todas e
+        # se é esta instância que traz os pacotes do backend para a fila
+        self.estacao = None
+        self.estacoes = ()
+        self.sincronizar_backend = True
         
     def conectar_serial(self):
-        """Estabelece conexão serial com Arduino."""
+        """Estabelece conexão serial com Arduino (ou com o broker serial)."""
+        if self.broker:
+            if self.broker.conectar(self.porta):
+                print(f"✓ Conectado ao Arduino via broker {self.broker.caminho}")
+                return True
+            print(f"✗ Broker serial indisponível em {self.broker.caminho}")
+            return False
         try:
-            self.serial_conn = serial.Serial(
-                self.porta,
-                self.baudrate,
-                timeout=0.1
-            )
-            time.sleep(2)  # Aguarda reset do Arduino
+            self.transporte = SerialTransport(self.porta, self.baudrate)
+            # Termina no banner READY (ou na resposta a um STATUS), sem sleep fixo
+            _, pronto = self.transporte.conectar(ao_receber=lambda linha: print(f"  Arduino: {linha}"))
+            if not pronto:
+                self.transporte.fechar()
+                print(f"✗ Arduino em {self.porta} não respondeu")
+                return False
             print(f"✓ Conectado ao Arduino em {self.porta}")
             
-            # Lê mensagens iniciais
-            for _ in range(20):
-                if self.serial_conn.in_waiting:
-                    linha = self.serial_conn.readline().decode('utf-8', errors='ignore').strip()
-                    if linha:
-                        print(f"  Arduino: {linha}")
-                time.sleep(0.1)
-            
+            # A partir daqui toda linha recebida fica nesta fila até ser lida
+            self._respostas = self.transporte.assinar()
             return True
         except Exception as e:
             print(f"✗ Erro ao conectar Arduino: {e}")
@@ -87,76 +137,156 @@ class ControladorIntegrado:
         Returns:
             True se enviado com sucesso
         """
-        if not self.serial_conn:
+        if not self.transporte:
             print("✗ Serial não conectada!")
             return False
         
         try:
-            self.serial_conn.write(f"{comando}\n".encode())
-            print(f"→ Arduino: {comando}")
+            self.transporte.escrever(comando)
+            if self.verboso:
+                print(f"→ Arduino: {comando}")
             return True
         except Exception as e:
             print(f"✗ Erro ao enviar: {e}")
             return False
     
-    def ler_resposta_arduino(self, timeout=30):
+    def ler_resposta_arduino(self, timeout=30, comando=None):
         """
-        Lê resposta do Arduino até receber OK ou timeout.
+        Lê a resposta do Arduino até a última linha do comando (ver
+        dashboard.arduino.predicado_conclusao) ou timeout.
         
         Args:
             timeout: Tempo máximo de espera em segundos
+            comando: Comando cuja resposta está sendo lida
             
         Returns:
             Lista de linhas recebidas
         """
-        respostas = []
-        tempo_inicio = time.time()
-        
-        while (time.time() - tempo_inicio) < timeout:
-            if self.serial_conn and self.serial_conn.in_waiting:
-                try:
-                    linha = self.serial_conn.readline().decode('utf-8', errors='ignore').strip()
-                    if linha:
-                        respostas.append(linha)
-                        print(f"← Arduino: {linha}")
-                        
-                        # Verifica sinais especiais
-                        if linha == "READY_FOR_QR":
-                            self.aguardando_qr = True
-                            return respostas
-                        elif linha == "OK" or linha == "PRONTO":
-                            self.aguardando_qr = False
-                            return respostas
-                        elif linha.startswith("ERRO:"):
-                            return respostas
-                except Exception as e:
-                    print(f"  Erro leitura: {e}")
+        if not self._respostas:
+            return []
+        
+        concluiu = predicado_conclusao(comando or "")
+        
+        def fim(linha):
+            if self.verboso:
+                print(f"← Arduino: {linha}")
             
-            time.sleep(0.01)
+            # Verifica sinais especiais
+            if linha == "READY_FOR_QR":
+                self.aguardando_qr = True
+            elif linha in ("OK", "PRONTO", "CICLO_INTERROMPIDO", "RESET_OK"):
+                self.aguardando_qr = False
+            return concluiu(linha)
         
+        respostas, _ = self._respostas.aguardar(fim, timeout)
         return respostas
     
-    def buscar_ultimo_pacote(self):
+    def executar_comando(self, comando, timeout=30):
         """
-        Busca o último pacote registrado no backend Django.
+        Envia um comando e aguarda a resposta, pela serial ou pelo broker.
         
+        Args:
+            comando: String com o comando
+            timeout: Tempo máximo de espera em segundos
+            
         Returns:
-            Dict com dados do pacote ou None
+            Lista de linhas recebidas
+        """
+        if not self.broker:
+            # Linhas que sobraram de um comando anterior não são resposta deste
+            for linha in self._respostas.drenar() if self._respostas else []:
+                if self.verboso:
+                    print(f"  (descartado) {linha}")
+            if not self.enviar_comando(comando):
+                return []
+            return self.ler_resposta_arduino(timeout=timeout, comando=comando)
+        
+        if self.verboso:
+            print(f"→ Arduino: {comando}")
+        sucesso, respostas = self.broker.enviar_comando(comando, timeout=timeout)
+        if not sucesso:
+            print(f"✗ Erro no broker: {respostas}")
+            return []
+        if self.verboso:
+            for linha in respostas:
+                print(f"← Arduino: {linha}")
+        self.aguardando_qr = self.broker.aguardando_qr
+        return respostas
+    
+    def buscar_pacotes(self, apos):
+        """
+        Busca no backend os pacotes com id maior que ``apos`` (cursor).
+        
+        Returns:
+            (lista de pacotes do mais antigo ao mais novo, último id) ou
+            ([], apos) em caso de erro
         """
         try:
             url = f"{self.backend_url}/api/pacote/"
-            resp = requests.get(url, timeout=5)
+            resp = self._http.get(url, params={'apos': apos}, timeout=5)
             resp.raise_for_status()
             data = resp.json()
-            
-            if data.get('pacotes') and len(data['pacotes']) > 0:
-                return data['pacotes'][0]  # Mais recente
-            return None
-            
+            return data.get('pacotes', []), data.get('ultimo_id', apos)
         except Exception as e:
-            print(f"  Erro ao buscar pacote: {e}")
+            print(f"  Erro ao buscar pacotes: {e}")
+            return [], apos
+    
+    def ultimo_id_pacote(self):
+        """Id do pacote mais recente no backend (0 se não houver)."""
+        try:
+            resp = self._http.get(f"{self.backend_url}/api/pacote/", timeout=5)
+            resp.raise_for_status()
+            return resp.json().get('ultimo_id', 0)
+        except Exception as e:
+            print(f"  Erro ao buscar pacotes: {e}")
             return None
     
+    def sincronizar_fila(self):
+        """
+        Traz para a fila todos os pacotes novos do backend desde o cursor
+        gravado. Na primeira execução o cursor começa no pacote mais recente
+        (o histórico anterior não é reenviado).
+        
+        Returns:
+            Quantos pacotes entraram, ou None se o backend não respondeu
+        """
+        cursor = self.fila.cursor
+        if cursor is None:
+            cursor = self.ultimo_id_pacote()
+            if cursor is None:
+                return None
+            self.fila.adicionar([], cursor)
+        
+        novos = 0
+        while True:
+            pacotes, ultimo = self.buscar_pacotes(cursor)
+            if not pacotes:
+                return novos
+            novos += self.fila.adicionar(pacotes, ultimo)
+            cursor = ultimo
+    
+    def aguardar_pacote(self, timeout, intervalo=0.1, desde=None):
+        """
+        Espera um pacote pendente na fila (sincronizando com o backend) e o
+        reserva. Só depois da reserva gravada o REGIAO pode ser enviado.
+        Com ``desde``, só aceita pacotes que entraram na fila depois dele.
+        
+        Returns:
+            Dict do pacote reservado ou None se o timeout expirar
+        """
+        prazo = time.monotonic() + timeout
+        while self.executando:
+            if self.sincronizar_backend:
+                self.sincronizar_fila()
+            pacote = self.fila.proximo(self.estacao, self.estacoes, desde)
+            if pacote and self.fila.reservar(pacote['pacote_id']):
+                return pacote
+            if time.monotonic() >= prazo:
+                return None
+            if not pacote:
+                time.sleep(intervalo)
+        return None
+    
     def normalizar_regiao(self, regiao):
         """
         Normaliza o nome da região para o formato esperado pelo Arduino.
@@ -190,8 +320,7 @@ class ControladorIntegrado:
         print("="*60)
         
         # Envia comando para pegar objeto
-        self.enviar_comando("INICIAR")
-        respostas = self.ler_resposta_arduino(timeout=30)
+        respostas = self.executar_comando("INICIAR", timeout=30)
         
         if self.aguardando_qr:
             print("\n✓ Objeto capturado! Aguardando leitura do QR code...")
@@ -200,12 +329,13 @@ class ControladorIntegrado:
             print("\n✗ Falha ao iniciar ciclo")
             return False
     
-    def processar_regiao(self, regiao):
+    def processar_regiao(self, regiao, timeout=60):
         """
         Processa a região lida do QR code.
         
         Args:
             regiao: Nome da região
+            timeout: Tempo máximo (s) para o ciclo terminar
             
         Returns:
             True se processado com sucesso
@@ -221,55 +351,96 @@ class ControladorIntegrado:
         
         # Envia comando de região para o Arduino
         comando = f"REGIAO:{regiao_normalizada}"
-        self.enviar_comando(comando)
         
         # Aguarda conclusão do ciclo
-        respostas = self.ler_resposta_arduino(timeout=60)
+        respostas = self.executar_comando(comando, timeout=timeout)
         
-        if "PRONTO" in respostas or "OK" in respostas:
+        if respostas and respostas[-1] == "OK":
             print("\n✓ Ciclo concluído com sucesso!")
             return True
         else:
             print("\n⚠ Ciclo pode não ter sido concluído corretamente")
             return False
     
-    def monitorar_backend(self):
+    def executar_ciclo(self, timeout_pegar=30, timeout_qr=15, timeout_ciclo=60,
+                       regiao_sem_leitura=None, intervalo=0.1):
         """
-        Thread que monitora o backend para novos pacotes.
-        Quando um novo pacote é detectado e o Arduino está aguardando QR,
-        envia automaticamente a região para o Arduino.
-        """
-        print("\n[Monitor] Iniciando monitoramento do backend...")
+        Um objeto do modo automático: INICIAR → pacote da fila → REGIAO.
+        Em caso de falha manda RESET para deixar o braço pronto para o próximo.
         
-        while self.executando:
-            try:
-                # Só verifica se Arduino está aguardando QR
-                if self.aguardando_qr:
-                    pacote = self.buscar_ultimo_pacote()
-                    
-                    if pacote and pacote.get('codigo') != self.ultimo_codigo_processado:
-                        regiao = pacote.get('regiao')
-                        codigo = pacote.get('codigo')
-                        nome = pacote.get('nome', 'Desconhecido')
-                        
-                        print(f"\n[Monitor] Novo pacote detectado!")
-                        print(f"  Código: {codigo}")
-                        print(f"  Nome: {nome}")
-                        print(f"  Região: {regiao}")
-                        
-                        # Processa a região
-                        if self.processar_regiao(regiao):
-                            self.ultimo_codigo_processado = codigo
-                
-            except Exception as e:
-                print(f"[Monitor] Erro: {e}")
+        Só vale um pacote lido depois do INICIAR deste ciclo. Os pendentes
+        anteriores (leitura que chegou após um PARAR, pacotes lidos com o
+        controlador parado) expiram aqui em vez de irem para este objeto.
+        
+        Args:
+            timeout_pegar: Limite (s) para o INICIAR chegar a READY_FOR_QR
+            timeout_qr: Limite (s) para o QR ser lido com o objeto na câmera
+            timeout_ciclo: Limite (s) para o REGIAO terminar
+            regiao_sem_leitura: Região usada quando o QR não é lido a tempo
+                (None = interrompe o ciclo com PARAR)
+            intervalo: Intervalo (s) entre consultas à fila
             
-            time.sleep(0.5)  # Polling a cada 500ms
+        Returns:
+            (sucesso, motivo da falha ou None)
+        """
+        # modo_automatico sincroniza a fila logo antes: leituras atrasadas do
+        # objeto anterior já entraram e ficam antes do corte
+        inicio = time.time()
+        # Com várias estações, os pacotes sem estação expiram pela janela do
+        # multi_estacao (outra estação pode estar esperando por eles)
+        expirados = self.fila.expirar(inicio, self.estacao if self.estacoes else None)
+        if expirados:
+            print(f"\n⚠ [{self.rotulo}] {expirados} pacote(s) lido(s) antes do ciclo marcado(s) como expirado(s)")
+        
+        self.executar_comando("INICIAR", timeout=timeout_pegar)
+        if not self.aguardando_qr:
+            return self._falha_ciclo("INICIAR não chegou a READY_FOR_QR")
+        
+        pacote = self.aguardar_pacote(timeout_qr, intervalo, desde=inicio)
+        regiao = self.normalizar_regiao(pacote['regiao']) if pacote else None
+        if pacote:
+            print(f"\n[{self.rotulo}] Pacote {pacote['codigo']} ({pacote['nome']}) → {pacote['regiao']}")
+            if not regiao:
+                self.fila.falhar(pacote['pacote_id'], "região inválida")
+        if not regiao:
+            if not regiao_sem_leitura:
+                self.executar_comando("PARAR", timeout=10)
+                return self._falha_ciclo("QR não lido a tempo" if not pacote else "Região inválida")
+            print(f"\n⚠ [{self.rotulo}] Sem região válida, usando {regiao_sem_leitura}")
+            regiao = regiao_sem_leitura
+        
+        sucesso = self.processar_regiao(regiao, timeout=timeout_ciclo)
+        if pacote and regiao == self.normalizar_regiao(pacote['regiao']):
+            if sucesso:
+                self.fila.concluir(pacote['pacote_id'])
+            else:
+                self.fila.falhar(pacote['pacote_id'], "ciclo não terminou")
+        if not sucesso:
+            return self._falha_ciclo("Ciclo não terminou")
+        return True, None
+    
+    @property
+    def rotulo(self):
+        return f"Auto {self.estacao}" if self.estacao else "Auto"
+    
+    def _falha_ciclo(self, motivo):
+        self.executar_comando("RESET", timeout=30)
+        self.aguardando_qr = False
+        return False, motivo
     
-    def modo_automatico(self):
+    def modo_automatico(self, timeout_pegar=30, timeout_qr=15, timeout_ciclo=60,
+                        regiao_sem_leitura=None, max_ciclos=0, max_falhas=5, intervalo=0.1):
         """
-        Executa o sistema em modo completamente automático.
-        Inicia ciclos continuamente e processa regiões do backend.
+        Operação contínua, sem interação: INICIAR → espera o pacote lido pela
+        câmera → REGIAO → e o próximo INICIAR sai assim que o ciclo termina.
+        Os pacotes passam pela FilaRegioes: cada um é enviado no máximo uma
+        vez, em ordem, e só para o objeto cujo ciclo estava aberto quando ele
+        foi lido.
+        
+        Args:
+            max_ciclos: Para depois de N ciclos (0 = sem limite)
+            max_falhas: Para depois de N falhas seguidas
+            (demais: ver executar_ciclo)
         """
         print("\n" + "="*60)
         print("MODO AUTOMÁTICO - OPERAÇÃO CONTÍNUA")
@@ -277,26 +448,44 @@ class ControladorIntegrado:
         print("Pressione Ctrl+C para parar")
         print("="*60)
         
-        # Inicia thread de monitoramento do backend
-        self._monitor_thread = threading.Thread(
-            target=self.monitorar_backend,
-            daemon=True
-        )
-        self._monitor_thread.start()
+        self.fila = FilaRegioes(self.caminho_fila)
+        print(f"[Fila] {self.caminho_fila}: " + (", ".join(
+            f"{estado}={n}" for estado, n in self.fila.contagens().items() if n) or "vazia"))
+        
+        vazao = Vazao(self.JANELA_VAZAO)
+        total = falhas_seguidas = 0
         
         try:
-            while self.executando:
-                # Se não está aguardando QR, inicia novo ciclo
-                if not self.aguardando_qr:
-                    print("\n[Auto] Pronto para novo ciclo")
-                    input("  Pressione ENTER para iniciar ou Ctrl+C para sair...")
-                    self.iniciar_ciclo()
+            while self.executando and (not max_ciclos or total < max_ciclos):
+                if falhas_seguidas >= max_falhas:
+                    print("\n✗ [Auto] Falhas demais seguidas, parando")
+                    break
                 
-                time.sleep(0.5)
+                if self.sincronizar_fila() is None:
+                    falhas_seguidas += 1
+                    time.sleep(min(2 ** falhas_seguidas, 30))
+                    continue
+                
+                inicio_ciclo = time.monotonic()
+                sucesso, motivo = self.executar_ciclo(
+                    timeout_pegar, timeout_qr, timeout_ciclo, regiao_sem_leitura, intervalo
+                )
+                if not sucesso:
+                    falhas_seguidas += 1
+                    print(f"\n✗ [Auto] {motivo} ({falhas_seguidas}/{max_falhas} falhas seguidas)")
+                    continue
+                
+                falhas_seguidas = 0
+                total += 1
+                vazao.registrar()
+                print(f"[Auto] Ciclo {total}: {time.monotonic() - inicio_ciclo:.1f}s | {vazao}")
                 
         except KeyboardInterrupt:
             print("\n\n[Auto] Parando sistema...")
             self.executando = False
+        
+        print(f"\n[Auto] {vazao.resumo()}")
+        self.fila.fechar()
     
     def modo_manual(self):
         """
@@ -326,16 +515,13 @@ class ControladorIntegrado:
                 self.processar_regiao(regiao)
                 
             elif escolha == '3':
-                self.enviar_comando("C")
-                self.ler_resposta_arduino(timeout=10)
+                self.executar_comando("C", timeout=10)
                 
             elif escolha == '4':
-                self.enviar_comando("STATUS")
-                self.ler_resposta_arduino(timeout=5)
+                self.executar_comando("STATUS", timeout=5)
                 
             elif escolha == '5':
-                self.enviar_comando("RESET")
-                self.ler_resposta_arduino(timeout=10)
+                self.executar_comando("RESET", timeout=10)
                 self.aguardando_qr = False
                 
             elif escolha == 'A':
@@ -348,12 +534,13 @@ class ControladorIntegrado:
             else:
                 print("Opção inválida!")
     
-    def executar(self, modo='manual'):
+    def executar(self, modo='manual', **opcoes_auto):
         """
         Executa o controlador.
         
         Args:
             modo: 'manual' ou 'automatico'
+            opcoes_auto: Parâmetros repassados a modo_automatico
         """
         if not self.conectar_serial():
             print("\n✗ Não foi possível conectar ao Arduino")
@@ -362,7 +549,7 @@ class ControladorIntegrado:
         
         try:
             if modo == 'automatico':
-                self.modo_automatico()
+                self.modo_automatico(**opcoes_auto)
             else:
                 self.modo_manual()
                 
@@ -370,13 +557,30 @@ class ControladorIntegrado:
             print("\n\nInterrompido pelo usuário")
         finally:
             self.executando = False
-            if self.serial_conn:
-                self.serial_conn.close()
+            if self.transporte:
+                self.transporte.fechar()
             print("Conexão fechada.")
 
 
 def main():
     """Função principal."""
+    parser = argparse.ArgumentParser(description='Controlador integrado Arduino + Django + QR Code')
+    parser.add_argument('--porta', help='Porta serial (padrão: /dev/ttyACM0)')
+    parser.add_argument('--backend', help='URL do backend (padrão: http://127.0.0.1:8001)')
+    parser.add_argument('--broker', default=os.environ.get('DASHLOG_SERIAL_BROKER', ''),
+                        help='Socket do broker serial (padrão: $DASHLOG_SERIAL_BROKER ou conexão direta)')
+    parser.add_argument('--modo', choices=['manual', 'automatico'], help='Modo de operação')
+    parser.add_argument('--ciclos', type=int, default=0, help='Para depois de N ciclos (0 = sem limite)')
+    parser.add_argument('--timeout-pegar', type=float, default=30, help='Limite (s) para pegar o objeto')
+    parser.add_argument('--timeout-qr', type=float, default=15, help='Limite (s) para ler o QR code')
+    parser.add_argument('--timeout-ciclo', type=float, default=60, help='Limite (s) para o ciclo da região')
+    parser.add_argument('--regiao-sem-leitura', choices=ControladorIntegrado.REGIOES_VALIDAS,
+                        help='Região para objetos sem leitura (padrão: interrompe o ciclo)')
+    parser.add_argument('--max-falhas', type=int, default=5, help='Para depois de N falhas seguidas')
+    parser.add_argument('--intervalo', type=float, default=0.1, help='Intervalo (s) entre consultas ao backend')
+    parser.add_argument('--fila', default=FILA_PADRAO, help=f'Arquivo SQLite da fila de pacotes (padrão: {FILA_PADRAO})')
+    args = parser.parse_args()
+    
     print("""
     ╔══════════════════════════════════════════════════════════╗
     ║  CONTROLADOR INTEGRADO - SISTEMA DE SEPARAÇÃO           ║
@@ -384,25 +588,50 @@ def main():
     ╚══════════════════════════════════════════════════════════╝
     """)
     
-    # Configurações
-    porta = input("Porta serial (Enter=/dev/ttyACM0): ").strip()
-    if not porta:
-        porta = '/dev/ttyACM0'
+    # Sem argumentos, pergunta como antes
+    interativo = len(sys.argv) == 1
     
-    backend = input("URL do backend (Enter=http://127.0.0.1:8001): ").strip()
-    if not backend:
-        backend = 'http://127.0.0.1:8001'
+    porta = args.porta
+    if porta is None and interativo:
+        porta = input("Porta serial (Enter=/dev/ttyACM0): ").strip()
+    porta = porta or '/dev/ttyACM0'
     
-    modo = input("Modo [M]anual ou [A]utomático (Enter=M): ").strip().upper()
-    modo = 'automatico' if modo == 'A' else 'manual'
+    backend = args.backend
+    if backend is None and interativo:
+        backend = input("URL do backend (Enter=http://127.0.0.1:8001): ").strip()
+    backend = backend or 'http://127.0.0.1:8001'
+    
+    broker = args.broker
+    if interativo:
+        broker = input(f"Socket do broker serial (Enter={broker or 'conexão direta'}): ").strip() or broker
+    broker = broker or None
+    
+    modo = args.modo
+    if modo is None:
+        if interativo:
+            modo = input("Modo [M]anual ou [A]utomático (Enter=M): ").strip().upper()
+            modo = 'automatico' if modo == 'A' else 'manual'
+        else:
+            modo = 'manual'
     
     # Cria e executa controlador
     controlador = ControladorIntegrado(
         porta_serial=porta,
-        backend_url=backend
+        backend_url=backend,
+        broker_socket=broker,
+        fila_regioes=args.fila
     )
     
-    controlador.executar(modo=modo)
+    controlador.executar(
+        modo=modo,
+        timeout_pegar=args.timeout_pegar,
+        timeout_qr=args.timeout_qr,
+        timeout_ciclo=args.timeout_ciclo,
+        regiao_sem_leitura=args.regiao_sem_leitura,
+        max_ciclos=args.ciclos,
+        max_falhas=args.max_falhas,
+        intervalo=args.intervalo,
+    )
 
 
 if __name__ == "__main__":
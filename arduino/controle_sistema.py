@@ -3,28 +3,140 @@
 Sistema de Controle Integrado - Garra Robótica + QR Code + Esteira
 Autor: Sistema Automatizado
 Data: 19/11/2025
+
+A câmera é lida por uma thread própria e a leitura do QR decodifica cada
+frame novo em tons de cinza e reduzido (LARGURA_DECODIFICACAO). A janela de
+preview é opcional, desenhada pela thread principal durante a leitura (o
+macOS não aceita janelas do OpenCV fora dela), e o sistema funciona sem
+monitor (--headless, o padrão no Linux sem DISPLAY).
 """
 
-import serial
+import argparse
+import os
+import threading
 import time
 import cv2
 from pyzbar import pyzbar
-import threading
+from pyzbar.pyzbar import ZBarSymbol
 import sys
 
+# Adiciona o diretório raiz ao path para imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from serial_transport import SerialTransport
+
+
+# Largura (px) em que o frame é decodificado; 0 = resolução original.
+# O pyzbar custa proporcional aos pixels: 640 px é ~4x mais rápido que 1280.
+LARGURA_DECODIFICACAO = 640
+
+# Tempo (s) que o último QR lido fica destacado no preview
+DESTAQUE_QR = 2.0
+
+
+class CapturaCamera:
+    """
+    Lê a câmera numa thread e guarda só o frame mais recente. Quem consome
+    espera por um frame novo (``proximo_frame``) em vez de ler em loop.
+    """
+    
+    def __init__(self, indice=0):
+        self.cap = cv2.VideoCapture(indice)
+        if not self.cap.isOpened():
+            raise RuntimeError(f"Não foi possível abrir a câmera {indice}")
+        self._frame = None
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._ler, name="captura-camera", daemon=True)
+        self._thread.start()
+    
+    def _ler(self):
+        while not self._parar.is_set():
+            ret, frame = self.cap.read()
+            if not ret:
+                time.sleep(0.1)
+                continue
+            with self._cond:
+                self._frame = frame
+                self._seq += 1
+                self._cond.notify_all()
+    
+    def proximo_frame(self, ultimo_seq=0, timeout=None):
+        """Espera um frame mais novo que ``ultimo_seq``. Retorna (seq, frame) ou (ultimo_seq, None)."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > ultimo_seq, timeout):
+                return ultimo_seq, None
+            return self._seq, self._frame
+    
+    def release(self):
+        self._parar.set()
+        self._thread.join(timeout=1.0)
+        self.cap.release()
+
+
+class PreviewCamera:
+    """
+    Janela de preview desenhada pela thread principal: o HighGUI do macOS só
+    aceita imshow/waitKey nela. A leitura do QR chama ``mostrar`` com cada
+    frame já decodificado, e ele só desenha ``fps`` vezes por segundo.
+    """
+    
+    def __init__(self, fps=15):
+        self.intervalo = 1.0 / fps
+        self.texto = "Aguardando QR Code..."
+        self.cancelar = threading.Event()  # tecla 'q' cancela a leitura em andamento
+        self._destaque = None  # (pontos, texto, até quando)
+        self._proximo = 0.0
+    
+    def destacar(self, pontos, texto, frame=None):
+        """Destaca o QR lido por DESTAQUE_QR s (e já desenha ``frame``, se dado)."""
+        self._destaque = (pontos, texto, time.monotonic() + DESTAQUE_QR)
+        if frame is not None:
+            self.mostrar(frame, forcar=True)
+    
+    def mostrar(self, frame, forcar=False):
+        agora = time.monotonic()
+        if not forcar and agora < self._proximo:
+            return
+        self._proximo = agora + self.intervalo
+        frame = frame.copy()
+        destaque = self._destaque
+        if destaque and agora < destaque[2]:
+            pontos, texto, _ = destaque
+            for i in range(len(pontos)):
+                cv2.line(frame, pontos[i], pontos[(i + 1) % len(pontos)], (0, 255, 0), 3)
+            cv2.putText(frame, texto, (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+        else:
+            cv2.putText(frame, self.texto, (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+        cv2.imshow('Camera - Posicione QR Code', frame)
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            self.cancelar.set()
+    
+    def fechar(self):
+        cv2.destroyAllWindows()
+
+
 class ControladorSistema:
-    def __init__(self, porta_serial='/dev/ttyACM0', baudrate=115200):
+    def __init__(self, porta_serial='/dev/ttyACM0', baudrate=115200, preview=True,
+                 largura_decodificacao=LARGURA_DECODIFICACAO):
         """
         Inicializa o controlador do sistema
         
         Args:
             porta_serial: Porta onde o Arduino está conectado
             baudrate: Taxa de comunicação serial
+            preview: Mostra a janela da câmera (False = headless)
+            largura_decodificacao: Largura (px) do frame decodificado; 0 = original
         """
         self.porta = porta_serial
         self.baudrate = baudrate
-        self.serial_conn = None
+        self.transporte = None
         self.camera = None
+        self.preview = None
+        self.mostrar_preview = preview
+        self.largura_decodificacao = largura_decodificacao
+        self._em_comando = False  # monitor não imprime linhas de uma resposta
         self.executando = True
         
         # Mapeamento de destinos QR Code -> Posições dos servos
@@ -39,20 +151,12 @@ class ControladorSistema:
     def conectar_serial(self):
         """Estabelece conexão serial com Arduino"""
         try:
-            self.serial_conn = serial.Serial(
-                self.porta,
-                self.baudrate,
-                timeout=1
-            )
-            time.sleep(2)  # Aguarda reset do Arduino
+            self.transporte = SerialTransport(self.porta, self.baudrate)
+            # Termina no banner READY (ou na resposta a um STATUS), sem sleep fixo
+            _, pronto = self.transporte.conectar(ao_receber=lambda linha: print(f"  Arduino: {linha}"))
+            if not pronto:
+                print("⚠ Firmware não confirmou que está pronto; continuando")
             print(f"✓ Conectado ao Arduino em {self.porta}")
-            
-            # Lê mensagens iniciais do Arduino
-            for _ in range(10):
-                if self.serial_conn.in_waiting:
-                    linha = self.serial_conn.readline().decode('utf-8', errors='ignore').strip()
-                    print(f"  Arduino: {linha}")
-                time.sleep(0.1)
             return True
         except Exception as e:
             print(f"✗ Erro ao conectar: {e}")
@@ -65,51 +169,66 @@ class ControladorSistema:
         Args:
             comando: String com o comando a enviar
         """
-        if not self.serial_conn:
+        if not self.transporte:
             print("✗ Serial não conectada!")
             return False
         
+        def fim(linha):
+            print(f"← Arduino: {linha}")
+            return linha == "OK" or "READY_FOR_QR" in linha or "READY_FOR_CONVEYOR" in linha
+        
         try:
-            self.serial_conn.write(f"{comando}\n".encode())
+            self._em_comando = True
             print(f"→ Enviado: {comando}")
+            linhas, concluido = self.transporte.comando(comando, fim, timeout=30)
             
-            # Aguarda resposta
-            tempo_inicio = time.time()
-            while (time.time() - tempo_inicio) < 30:  # Timeout de 30s
-                if self.serial_conn.in_waiting:
-                    linha = self.serial_conn.readline().decode('utf-8', errors='ignore').strip()
-                    print(f"← Arduino: {linha}")
-                    
-                    if linha == "OK":
-                        return True
-                    elif "READY_FOR_QR" in linha:
-                        return "QR"
-                    elif "READY_FOR_CONVEYOR" in linha:
-                        return "CONVEYOR"
-                time.sleep(0.01)
-            
+            if concluido:
+                if "READY_FOR_QR" in linhas[-1]:
+                    return "QR"
+                elif "READY_FOR_CONVEYOR" in linhas[-1]:
+                    return "CONVEYOR"
             return True
         except Exception as e:
             print(f"✗ Erro ao enviar comando: {e}")
             return False
+        finally:
+            self._em_comando = False
     
     def inicializar_camera(self, indice=0):
         """Inicializa câmera para leitura de QR Code"""
         try:
-            self.camera = cv2.VideoCapture(indice)
-            if self.camera.isOpened():
-                print(f"✓ Câmera inicializada (índice {indice})")
-                return True
-            else:
-                print(f"✗ Não foi possível abrir a câmera {indice}")
-                return False
+            self.camera = CapturaCamera(indice)
+            print(f"✓ Câmera inicializada (índice {indice})")
+            if self.mostrar_preview:
+                self.preview = PreviewCamera()
+            return True
         except Exception as e:
             print(f"✗ Erro ao inicializar câmera: {e}")
             return False
     
+    def _decodificar(self, frame):
+        """
+        Procura QR Codes no frame em tons de cinza e reduzido.
+        Retorna [(dados, pontos na escala original)].
+        """
+        cinza = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        escala = 1.0
+        largura = cinza.shape[1]
+        if self.largura_decodificacao and largura > self.largura_decodificacao:
+            escala = largura / self.largura_decodificacao
+            altura = round(cinza.shape[0] / escala)
+            cinza = cv2.resize(cinza, (self.largura_decodificacao, altura), interpolation=cv2.INTER_AREA)
+        
+        encontrados = []
+        for qr in pyzbar.decode(cinza, symbols=[ZBarSymbol.QRCODE]):
+            pontos = [(round(p.x * escala), round(p.y * escala)) for p in qr.polygon]
+            encontrados.append((qr.data.decode('utf-8').strip().upper(), pontos))
+        return encontrados
+    
     def ler_qr_code(self, timeout=30):
         """
-        Lê QR Code da câmera
+        Lê QR Code da câmera. Cada frame novo é decodificado assim que chega;
+        o timeout é contado pelos frames, sem leitura em loop.
         
         Args:
             timeout: Tempo máximo de espera em segundos
@@ -125,48 +244,35 @@ class ControladorSistema:
         print("Posicione o QR Code na frente da câmera...")
         print(f"Destinos válidos: {', '.join(self.mapa_destinos.keys())}")
         
-        tempo_inicio = time.time()
-        
-        while (time.time() - tempo_inicio) < timeout:
-            ret, frame = self.camera.read()
+        if self.preview:
+            self.preview.cancelar.clear()
+        prazo = time.monotonic() + timeout
+        seq = 0
+        frames = 0
+        while True:
+            restante = prazo - time.monotonic()
+            if restante <= 0:
+                break
+            if self.preview and self.preview.cancelar.is_set():
+                print("✗ Leitura cancelada")
+                return None
             
-            if not ret:
-                print("✗ Erro ao capturar frame")
+            seq, frame = self.camera.proximo_frame(seq, timeout=min(restante, 1.0))
+            if frame is None:
                 continue
+            frames += 1
             
-            # Procura por QR Codes no frame
-            qr_codes = pyzbar.decode(frame)
-            
-            for qr in qr_codes:
-                dados = qr.data.decode('utf-8').strip().upper()
-                print(f"\n✓ QR Code detectado: {dados}")
-                
-                # Desenha retângulo ao redor do QR Code
-                pontos = qr.polygon
-                if len(pontos) == 4:
-                    pontos = [(p.x, p.y) for p in pontos]
-                    for i in range(4):
-                        cv2.line(frame, pontos[i], pontos[(i+1)%4], (0, 255, 0), 3)
-                
-                # Mostra o frame com detecção
-                cv2.putText(frame, f"Destino: {dados}", (50, 50), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-                cv2.imshow('QR Code Detectado', frame)
-                cv2.waitKey(2000)  # Mostra por 2 segundos
-                cv2.destroyAllWindows()
-                
+            for dados, pontos in self._decodificar(frame):
+                decorrido = timeout - (prazo - time.monotonic())
+                print(f"\n✓ QR Code detectado: {dados} ({decorrido:.2f}s, {frames} frames)")
+                if self.preview:
+                    self.preview.destacar(pontos, f"Destino: {dados}", frame)
                 return dados
-            
-            # Mostra preview da câmera
-            cv2.putText(frame, "Aguardando QR Code...", (50, 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-            cv2.imshow('Camera - Posicione QR Code', frame)
-            
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
+            # Depois da decodificação: o QR nunca espera pela janela
+            if self.preview:
+                self.preview.mostrar(frame)
         
-        cv2.destroyAllWindows()
-        print("✗ Timeout - QR Code não detectado")
+        print(f"✗ Timeout - QR Code não detectado ({frames} frames)")
         return None
     
     def obter_posicao_destino(self, codigo_qr):
@@ -239,17 +345,10 @@ class ControladorSistema:
         print("="*60 + "\n")
         return True
     
-    def monitorar_serial(self):
-        """Thread para monitorar continuamente a serial"""
-        while self.executando:
-            if self.serial_conn and self.serial_conn.in_waiting:
-                try:
-                    linha = self.serial_conn.readline().decode('utf-8', errors='ignore').strip()
-                    if linha and linha != "OK":
-                        print(f"← {linha}")
-                except:
-                    pass
-            time.sleep(0.05)
+    def monitorar_serial(self, linha):
+        """Ouvinte da serial: imprime linhas recebidas fora de um comando"""
+        if linha and linha != "OK" and not self._em_comando:
+            print(f"← {linha}")
     
     def menu_interativo(self):
         """Menu interativo para controle manual"""
@@ -277,17 +376,16 @@ class ControladorSistema:
         print("  X - Sair")
         print("="*60)
     
-    def executar(self):
+    def executar(self, camera=0):
         """Loop principal do sistema"""
         if not self.conectar_serial():
             return
         
         # Tenta inicializar câmera
-        self.inicializar_camera()
+        self.inicializar_camera(camera)
         
-        # Inicia thread de monitoramento
-        thread_monitor = threading.Thread(target=self.monitorar_serial, daemon=True)
-        thread_monitor.start()
+        # Registra o monitor na thread leitora da serial
+        self.transporte.adicionar_ouvinte(self.monitorar_serial)
         
         while self.executando:
             self.menu_interativo()
@@ -365,16 +463,33 @@ class ControladorSistema:
                 print("✗ Opção inválida!")
         
         # Cleanup
+        if self.preview:
+            self.preview.fechar()
         if self.camera:
             self.camera.release()
-        if self.serial_conn:
-            self.serial_conn.close()
-        cv2.destroyAllWindows()
+        if self.transporte:
+            self.transporte.fechar()
         print("Sistema encerrado.")
 
 
 def main():
     """Função principal"""
+    parser = argparse.ArgumentParser(description='Controle da garra com leitura de QR Code')
+    parser.add_argument('--porta', help='Porta serial do Arduino (padrão: pergunta, Enter=/dev/ttyACM0)')
+    parser.add_argument('--camera', type=int, default=0, help='Índice da câmera')
+    grupo = parser.add_mutually_exclusive_group()
+    grupo.add_argument('--headless', dest='preview', action='store_false', default=None,
+                       help='Sem janela de preview (padrão no Linux sem DISPLAY)')
+    grupo.add_argument('--preview', dest='preview', action='store_true',
+                       help='Mostra a janela da câmera')
+    parser.add_argument('--largura-decodificacao', type=int, default=LARGURA_DECODIFICACAO,
+                        help=f'Largura (px) do frame decodificado; 0 = original (padrão: {LARGURA_DECODIFICACAO})')
+    args = parser.parse_args()
+    
+    preview = args.preview
+    if preview is None:
+        preview = sys.platform != 'linux' or bool(os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY'))
+    
     print("""
     ╔══════════════════════════════════════════════════════════╗
     ║  SISTEMA DE CONTROLE - GARRA ROBÓTICA + QR CODE         ║
@@ -383,15 +498,21 @@ def main():
     """)
     
     # Solicita porta serial
-    porta = input("Porta serial do Arduino (padrão /dev/ttyACM0): ").strip()
+    porta = args.porta
+    if porta is None:
+        porta = input("Porta serial do Arduino (padrão /dev/ttyACM0): ").strip()
     if not porta:
         porta = '/dev/ttyACM0'
     
     # Cria e executa controlador
-    controlador = ControladorSistema(porta_serial=porta)
+    controlador = ControladorSistema(
+        porta_serial=porta,
+        preview=preview,
+        largura_decodificacao=args.largura_decodificacao
+    )
     
     try:
-        controlador.executar()
+        controlador.executar(camera=args.camera)
     except KeyboardInterrupt:
         print("\n\nPrograma interrompido pelo usuário")
     except Exception as e:
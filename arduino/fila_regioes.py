@@ -0,0 +1,293 @@
+"""
+Fila persistente (SQLite) dos pacotes que aguardam o comando REGIAO:<x>.
+
+Todo pacote novo do backend (cursor ``/api/pacote/?apos=<id>``) entra na
+fila como ``pendente``, e o cursor é gravado na mesma transação. Para cada
+objeto, o controlador pega o pendente mais antigo e o marca ``enviando``
+(commit) ANTES de escrever na serial; depois marca ``concluido`` ou
+``falhou``. Assim nenhum pacote é pulado e nenhum REGIAO é enviado duas vezes:
+
+    pendente → enviando → concluido | falhou
+                   └──── (reinício no meio do envio) → incerto
+
+Ao reabrir a fila, linhas que ficaram em ``enviando`` viram ``incerto`` e não
+são reenviadas (no máximo uma vez): o objeto pode ter sido separado ou não,
+e quem decide é o operador (``reenfileirar``).
+
+Um pacote só vale para o objeto que estava na câmera quando ele foi lido.
+Cada ciclo pede ``proximo(desde=<hora do INICIAR>)`` e antes marca como
+``expirado`` (``expirar``) os pendentes mais antigos: a leitura que chegou
+depois de um PARAR por timeout, ou os pacotes lidos com o controlador
+parado, nunca vão para o próximo objeto.
+
+    pendente → expirado   (lido antes do INICIAR do ciclo atual)
+
+Um pacote reenfileirado pelo operador fica fora dessa regra: vai para o
+próximo objeto, qualquer que seja a hora da leitura.
+
+Com várias estações (multi_estacao.py) cada pacote guarda a estação que leu o
+QR; ``proximo(estacao)`` dá preferência aos pacotes da estação e, na falta
+deles, pega os sem estação conhecida. Como a reserva é atômica, duas
+estações nunca enviam o mesmo pacote.
+
+Uso avulso:
+    python fila_regioes.py                 # resumo da fila
+    python fila_regioes.py --listar incerto
+    python fila_regioes.py --reenfileirar 42
+"""
+
+import argparse
+import os
+import sqlite3
+import threading
+import time
+
+
+CAMINHO_PADRAO = os.environ.get(
+    'DASHLOG_FILA_REGIOES',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fila_regioes.sqlite3'),
+)
+
+PENDENTE = 'pendente'
+ENVIANDO = 'enviando'
+CONCLUIDO = 'concluido'
+FALHOU = 'falhou'
+INCERTO = 'incerto'
+EXPIRADO = 'expirado'
+
+ESTADOS = (PENDENTE, ENVIANDO, CONCLUIDO, FALHOU, INCERTO, EXPIRADO)
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS pacotes (
+    pacote_id        INTEGER PRIMARY KEY,
+    codigo           TEXT,
+    nome             TEXT,
+    regiao           TEXT,
+    estacao          TEXT,
+    estado           TEXT NOT NULL DEFAULT 'pendente',
+    tentativas       INTEGER NOT NULL DEFAULT 0,
+    erro             TEXT,
+    criado_em        REAL NOT NULL,
+    reenfileirado_em REAL,
+    atualizado_em    REAL NOT NULL
+);
+-- Só os pendentes entram no índice: a busca do próximo não cresce com o
+-- histórico de concluídos (a consulta usa o literal para casar com o WHERE)
+CREATE INDEX IF NOT EXISTS pacotes_pendentes
+    ON pacotes (pacote_id) WHERE estado = 'pendente';
+CREATE TABLE IF NOT EXISTS meta (
+    chave TEXT PRIMARY KEY,
+    valor TEXT
+);
+"""
+
+
+class FilaRegioes:
+    """Fila de trabalho do controlador, num arquivo SQLite (modo WAL)."""
+
+    def __init__(self, caminho=CAMINHO_PADRAO):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # FULL: o 'enviando' precisa estar no disco antes do comando sair
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.executescript(_ESQUEMA)
+        self._migrar()
+        self.incertos = self._recuperar()
+
+    def _transacao(self, sql, parametros=()):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self._db.execute(sql, parametros)
+                self._db.execute("COMMIT")
+                return cursor
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _migrar(self):
+        """Acrescenta colunas novas em filas criadas por versões anteriores."""
+        colunas = {linha['name'] for linha in self._db.execute("PRAGMA table_info(pacotes)")}
+        if 'estacao' not in colunas:
+            self._db.execute("ALTER TABLE pacotes ADD COLUMN estacao TEXT")
+        if 'reenfileirado_em' not in colunas:
+            self._db.execute("ALTER TABLE pacotes ADD COLUMN reenfileirado_em REAL")
+
+    def _recuperar(self):
+        """Marca como incertos os envios interrompidos por um reinício."""
+        cursor = self._transacao(
+            "UPDATE pacotes SET estado = ?, atualizado_em = ? WHERE estado = ?",
+            (INCERTO, time.time(), ENVIANDO),
+        )
+        if cursor.rowcount:
+            print(f"[Fila] {cursor.rowcount} envio(s) interrompido(s) marcado(s) como incerto(s)")
+        return cursor.rowcount
+
+    # ----- cursor do backend -----
+
+    @property
+    def cursor(self):
+        """Maior id de pacote já visto no backend (None na primeira execução)."""
+        with self._lock:
+            linha = self._db.execute("SELECT valor FROM meta WHERE chave = 'cursor'").fetchone()
+        return int(linha['valor']) if linha else None
+
+    def adicionar(self, pacotes, cursor):
+        """
+        Enfileira os pacotes novos (ignora ids repetidos) e avança o cursor,
+        tudo numa transação. Retorna quantos entraram.
+        """
+        agora = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                antes = self._db.total_changes
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO pacotes "
+                    "(pacote_id, codigo, nome, regiao, estacao, estado, criado_em, atualizado_em) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (p['id'], p.get('codigo'), p.get('nome'), p.get('regiao'), p.get('estacao') or None,
+                         PENDENTE, agora, agora)
+                        for p in pacotes
+                    ],
+                )
+                novos = self._db.total_changes - antes
+                self._db.execute(
+                    "INSERT INTO meta (chave, valor) VALUES ('cursor', ?) "
+                    "ON CONFLICT(chave) DO UPDATE SET valor = excluded.valor",
+                    (str(cursor),),
+                )
+                self._db.execute("COMMIT")
+                return novos
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    # ----- envio -----
+
+    def proximo(self, estacao=None, estacoes=(), desde=None):
+        """
+        Pendente mais antigo (dict) ou None. Com ``estacao``, só os pacotes
+        dela (primeiro) ou os que não são de nenhuma das ``estacoes``. Com
+        ``desde`` (time.time() do INICIAR), só os que entraram na fila depois
+        (ou foram reenfileirados pelo operador).
+        """
+        filtro, parametros = "", ()
+        if desde is not None:
+            filtro, parametros = "AND (criado_em >= ? OR reenfileirado_em IS NOT NULL) ", (desde,)
+        if estacao is None:
+            sql = f"SELECT * FROM pacotes WHERE estado = 'pendente' {filtro}ORDER BY pacote_id LIMIT 1"
+        else:
+            outras = [e for e in estacoes if e != estacao]
+            sql = (
+                f"SELECT * FROM pacotes WHERE estado = 'pendente' {filtro}"
+                f"AND (estacao = ? OR estacao IS NULL OR estacao NOT IN ({', '.join('?' * len(outras))})) "
+                "ORDER BY estacao IS NOT ?, pacote_id LIMIT 1"
+            )
+            parametros = (*parametros, estacao, *outras, estacao)
+        with self._lock:
+            linha = self._db.execute(sql, parametros).fetchone()
+        return dict(linha) if linha else None
+
+    def reservar(self, pacote_id):
+        """
+        Marca o pacote como ``enviando``. Retorna False se ele não estava
+        mais pendente (outro processo já o pegou): nesse caso não envie.
+        """
+        cursor = self._transacao(
+            "UPDATE pacotes SET estado = ?, tentativas = tentativas + 1, atualizado_em = ? "
+            "WHERE pacote_id = ? AND estado = ?",
+            (ENVIANDO, time.time(), pacote_id, PENDENTE),
+        )
+        return cursor.rowcount == 1
+
+    def expirar(self, antes, estacao=None):
+        """
+        Marca como ``expirado`` os pendentes que entraram na fila antes de
+        ``antes`` (só os da ``estacao``, se dada). Reenfileirados pelo
+        operador não expiram. Retorna quantos.
+        """
+        sql = (
+            "UPDATE pacotes SET estado = ?, erro = ?, atualizado_em = ? "
+            "WHERE estado = ? AND criado_em < ? AND reenfileirado_em IS NULL"
+        )
+        parametros = (EXPIRADO, "lido antes do ciclo", time.time(), PENDENTE, antes)
+        if estacao is not None:
+            sql += " AND estacao = ?"
+            parametros += (estacao,)
+        return self._transacao(sql, parametros).rowcount
+
+    def concluir(self, pacote_id):
+        self._finalizar(pacote_id, CONCLUIDO, None)
+
+    def falhar(self, pacote_id, erro):
+        self._finalizar(pacote_id, FALHOU, erro)
+
+    def _finalizar(self, pacote_id, estado, erro):
+        self._transacao(
+            "UPDATE pacotes SET estado = ?, erro = ?, atualizado_em = ? "
+            "WHERE pacote_id = ? AND estado = ?",
+            (estado, erro, time.time(), pacote_id, ENVIANDO),
+        )
+
+    def reenfileirar(self, pacote_id):
+        """
+        Volta um pacote falhou/incerto/expirado para pendente (decisão do
+        operador): ele vai para o próximo objeto, sem a regra do ``desde``.
+        """
+        agora = time.time()
+        cursor = self._transacao(
+            "UPDATE pacotes SET estado = ?, erro = NULL, reenfileirado_em = ?, atualizado_em = ? "
+            "WHERE pacote_id = ? AND estado IN (?, ?, ?)",
+            (PENDENTE, agora, agora, pacote_id, FALHOU, INCERTO, EXPIRADO),
+        )
+        return cursor.rowcount == 1
+
+    # ----- consulta -----
+
+    def contagens(self):
+        with self._lock:
+            linhas = self._db.execute("SELECT estado, COUNT(*) AS n FROM pacotes GROUP BY estado").fetchall()
+        contagens = dict.fromkeys(ESTADOS, 0)
+        contagens.update({l['estado']: l['n'] for l in linhas})
+        return contagens
+
+    def listar(self, estado, limite=50):
+        with self._lock:
+            linhas = self._db.execute(
+                "SELECT * FROM pacotes WHERE estado = ? ORDER BY pacote_id LIMIT ?", (estado, limite)
+            ).fetchall()
+        return [dict(l) for l in linhas]
+
+    def fechar(self):
+        with self._lock:
+            self._db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fila persistente de regiões do controlador')
+    parser.add_argument('--fila', default=CAMINHO_PADRAO, help='Arquivo SQLite da fila')
+    parser.add_argument('--listar', choices=ESTADOS, help='Lista os pacotes neste estado')
+    parser.add_argument('--reenfileirar', type=int, metavar='ID', action='append', default=[],
+                        help='Volta um pacote falhou/incerto/expirado para pendente (pode repetir)')
+    args = parser.parse_args()
+
+    fila = FilaRegioes(args.fila)
+    for pacote_id in args.reenfileirar:
+        ok = fila.reenfileirar(pacote_id)
+        print(f"{'✓' if ok else '✗'} Pacote {pacote_id} {'reenfileirado' if ok else 'não está falhou/incerto/expirado'}")
+    if args.listar:
+        for p in fila.listar(args.listar):
+            print(f"  {p['pacote_id']:>6}  {p['codigo'] or '-':<15} {p['regiao'] or '-':<13} "
+                  f"tentativas={p['tentativas']} {p['erro'] or ''}")
+    print(f"Fila {fila.caminho} | cursor={fila.cursor} | "
+          + " ".join(f"{estado}={n}" for estado, n in fila.contagens().items()))
+    fila.fechar()
+
+
+if __name__ == "__main__":
+    main()
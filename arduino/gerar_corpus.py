@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Gerador de corpus sintético de QR Codes distorcidos, para medir o decodificador.
+
+Cada frame tem (ou não, nos frames vazios) uma etiqueta ``regiao:nome`` igual
+às impressas pelo gerar_qrcodes.py, colada num fundo com textura e depois
+degradada como numa câmera de linha: escala, rotação, perspectiva, exposição,
+reflexo (glare), desfoque de movimento, ruído e compressão JPEG. As
+transformações são feitas em NumPy/OpenCV sobre o frame inteiro, e os frames
+são gerados num pool de processos.
+
+O gabarito vai para ``manifesto.ndjson`` (um frame por linha: arquivo,
+conteúdo, cantos do QR e parâmetros sorteados). Cada frame depende só de
+(semente, índice), então o mesmo comando gera o mesmo corpus.
+
+Uso:
+    # 10 mil frames 1280x720
+    python gerar_corpus.py --quantidade 10000 --saida corpus/
+
+    # Faixas próprias (pode repetir) e 10% de frames sem QR
+    python gerar_corpus.py --quantidade 2000 --faixa desfoque=0:40 --fracao-vazios 0.1
+
+    # Acurácia e tempo do decodificador, por faixa de cada parâmetro
+    python gerar_corpus.py --avaliar corpus/ --decodificador opencv
+"""
+
+import argparse
+import json
+import math
+import os
+import time
+from functools import lru_cache
+from multiprocessing import Pool
+
+import cv2
+import numpy as np
+import qrcode
+
+
+# Nomes por região (conteúdo dos QR: "regiao:nome")
+NOMES = {
+    'norte': ['amazonas', 'para', 'acre', 'roraima', 'rondonia', 'amapa', 'tocantins'],
+    'nordeste': ['bahia', 'pernambuco', 'ceara', 'maranhao', 'paraiba', 'piaui', 'alagoas', 'sergipe'],
+    'centro-oeste': ['goias', 'brasilia', 'mato grosso', 'mato grosso do sul'],
+    'sudeste': ['saopaulo', 'rio de janeiro', 'minas gerais', 'espirito santo'],
+    'sul': ['parana', 'santa catarina', 'rio grande do sul'],
+}
+
+# Faixas (mín, máx) de cada distorção, sorteadas uniformemente por frame
+FAIXAS = {
+    'escala': (60, 360),        # lado do QR (sem a zona de silêncio), px
+    'rotacao': (-180, 180),     # graus
+    'perspectiva': (0, 0.2),    # deslocamento dos cantos / lado da etiqueta
+    'exposicao': (0.55, 1.25),  # ganho global
+    'brilho': (0, 220),         # intensidade do reflexo (glare)
+    'desfoque': (0, 21),        # comprimento do rastro de movimento, px
+    'ruido': (0, 20),           # desvio padrão do ruído gaussiano
+    'jpeg': (35, 95),           # qualidade JPEG
+}
+
+# Limites das faixas na tabela da avaliação
+LIMITES_AVALIACAO = {
+    'escala': (90, 120, 160, 220, 300),
+    'rotacao': (15, 45, 90, 135),
+    'perspectiva': (0.05, 0.1, 0.15),
+    'exposicao': (0.7, 0.85, 1.0, 1.15),
+    'brilho': (50, 100, 150),
+    'desfoque': (3, 7, 11, 15),
+    'ruido': (5, 10, 15),
+    'jpeg': (50, 65, 80),
+}
+
+
+# =========================
+# Geração
+# =========================
+
+@lru_cache(maxsize=None)
+def _matriz_qr(conteudo):
+    """Matriz do QR (True = módulo escuro) com a zona de silêncio de 4 módulos."""
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_H, border=4)
+    qr.add_data(conteudo)
+    qr.make(fit=True)
+    return np.array(qr.get_matrix(), dtype=bool)
+
+
+def _fundo(rng, largura, altura):
+    """Fundo colorido com manchas suaves e alguns traços (caixas, esteira)."""
+    manchas = rng.uniform(40, 220, size=(rng.integers(3, 9), rng.integers(4, 14), 3)).astype(np.float32)
+    fundo = cv2.resize(manchas, (largura, altura), interpolation=cv2.INTER_CUBIC)
+    for _ in range(rng.integers(0, 8)):
+        p1 = tuple(int(v) for v in rng.integers(0, (largura, altura)))
+        p2 = tuple(int(v) for v in rng.integers(0, (largura, altura)))
+        cor = tuple(float(v) for v in rng.uniform(0, 255, 3))
+        cv2.line(fundo, p1, p2, cor, int(rng.integers(1, 12)))
+    return fundo
+
+
+def _kernel_movimento(comprimento, angulo):
+    tamanho = max(1, int(round(comprimento)))
+    if tamanho < 2:
+        return None
+    kernel = np.zeros((tamanho, tamanho), np.float32)
+    kernel[tamanho // 2, :] = 1.0
+    rotacao = cv2.getRotationMatrix2D(((tamanho - 1) / 2, (tamanho - 1) / 2), angulo, 1.0)
+    kernel = cv2.warpAffine(kernel, rotacao, (tamanho, tamanho))
+    return kernel / kernel.sum()
+
+
+def _sortear(rng, faixas):
+    return {nome: float(rng.uniform(minimo, maximo)) for nome, (minimo, maximo) in faixas.items()}
+
+
+def gerar_frame(indice, semente, largura, altura, faixas, fracao_vazios, pasta_frames, qualidade_base=None):
+    """
+    Gera e grava um frame. Retorna o registro do manifesto.
+    Roda nos processos do pool; depende só de (semente, indice).
+    """
+    rng = np.random.default_rng([semente, indice])
+    p = _sortear(rng, faixas)
+    regiao = str(rng.choice(list(NOMES)))
+    conteudo = f"{regiao}:{rng.choice(NOMES[regiao])}"
+    vazio = rng.random() < fracao_vazios
+
+    frame = _fundo(rng, largura, altura)
+    cantos = None
+    if not vazio:
+        matriz = _matriz_qr(conteudo)
+        modulos = matriz.shape[0]
+        # Etiqueta em resolução alta; o warp reduz para o tamanho sorteado
+        px = max(2, math.ceil(400 / modulos))
+        etiqueta = np.where(matriz, 0, 255).astype(np.float32)
+        etiqueta = cv2.resize(etiqueta, (modulos * px, modulos * px), interpolation=cv2.INTER_NEAREST)
+        lado_src = modulos * px
+
+        # Lado da etiqueta inteira (com zona de silêncio); girada e deformada
+        # ela precisa caber no frame, então frames pequenos limitam a escala
+        folga = math.sqrt(2) / 2 * (1 + 2 * p['perspectiva'])
+        lado = min(p['escala'] * modulos / (modulos - 8), 0.49 * min(largura, altura) / folga)
+        p['escala'] = lado * (modulos - 8) / modulos
+        raio = lado * folga
+        centro = rng.uniform((raio, raio), (largura - raio, altura - raio))
+
+        meio = lado / 2
+        quadrado = np.array([[-meio, -meio], [meio, -meio], [meio, meio], [-meio, meio]], np.float32)
+        ang = math.radians(p['rotacao'])
+        rot = np.array([[math.cos(ang), -math.sin(ang)], [math.sin(ang), math.cos(ang)]], np.float32)
+        destino = quadrado @ rot.T + centro
+        destino += rng.uniform(-1, 1, (4, 2)).astype(np.float32) * p['perspectiva'] * lado
+
+        origem = np.array([[0, 0], [lado_src, 0], [lado_src, lado_src], [0, lado_src]], np.float32)
+        h = cv2.getPerspectiveTransform(origem, destino.astype(np.float32))
+        # Warp e composição só no retângulo que a etiqueta ocupa
+        x0, y0 = np.floor(destino.min(axis=0)).astype(int)
+        x1, y1 = np.ceil(destino.max(axis=0)).astype(int) + 1
+        h_roi = np.array([[1, 0, -x0], [0, 1, -y0], [0, 0, 1]], np.float64) @ h
+        tamanho_roi = (int(x1 - x0), int(y1 - y0))
+        qr = cv2.warpPerspective(etiqueta, h_roi, tamanho_roi, flags=cv2.INTER_LINEAR, borderValue=255)
+        mascara = cv2.warpPerspective(
+            np.ones((lado_src, lado_src), np.float32), h_roi, tamanho_roi, flags=cv2.INTER_LINEAR
+        )[..., None]
+        roi = frame[y0:y1, x0:x1]
+        roi += (qr[..., None] - roi) * mascara
+
+        borda = 4 * px
+        interno = np.array([[[borda, borda], [lado_src - borda, borda],
+                             [lado_src - borda, lado_src - borda], [borda, lado_src - borda]]], np.float32)
+        cantos = [[round(float(x), 1), round(float(y), 1)] for x, y in cv2.perspectiveTransform(interno, h)[0]]
+
+    # Iluminação: ganho global e um reflexo circular
+    frame *= p['exposicao']
+    if p['brilho'] > 1:
+        gx, gy = (float(v) for v in rng.uniform((0, 0), (largura, altura)))
+        raio_brilho = rng.uniform(0.1, 0.4) * max(largura, altura)
+        # Gaussiana separável: produto externo de dois vetores
+        gauss_x = np.exp(-((np.arange(largura, dtype=np.float32) - gx) ** 2) / (2 * raio_brilho ** 2))
+        gauss_y = np.exp(-((np.arange(altura, dtype=np.float32) - gy) ** 2) / (2 * raio_brilho ** 2))
+        frame += (np.outer(gauss_y * np.float32(p['brilho']), gauss_x))[..., None]
+
+    kernel = _kernel_movimento(p['desfoque'], rng.uniform(0, 180))
+    if kernel is not None:
+        frame = cv2.filter2D(frame, -1, kernel)
+    if p['ruido'] > 0:
+        # Ruído de luminância: um canal, somado aos três
+        frame += (rng.standard_normal((altura, largura), dtype=np.float32) * np.float32(p['ruido']))[..., None]
+
+    frame = cv2.convertScaleAbs(frame)
+    qualidade = int(round(p['jpeg']))
+    ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, qualidade])
+    if not ok:
+        raise RuntimeError(f"Falha ao codificar o frame {indice}")
+    arquivo = f"{indice:07d}.jpg"
+    with open(os.path.join(pasta_frames, arquivo), 'wb') as saida:
+        saida.write(jpeg.tobytes())
+
+    p['jpeg'] = qualidade
+    return {
+        "arquivo": os.path.join('frames', arquivo),
+        "conteudo": None if vazio else conteudo,
+        "cantos": cantos,
+        "parametros": {k: round(v, 3) for k, v in p.items()},
+    }
+
+
+def _gerar_lote(args):
+    return [gerar_frame(i, *args[1:]) for i in args[0]]
+
+
+def gerar_corpus(quantidade, saida, semente=0, largura=1280, altura=720, faixas=None,
+                 fracao_vazios=0.05, processos=None):
+    """Gera o corpus em ``saida`` (frames/ e manifesto.ndjson). Retorna os segundos gastos."""
+    faixas = dict(FAIXAS, **(faixas or {}))
+    pasta_frames = os.path.join(saida, 'frames')
+    os.makedirs(pasta_frames, exist_ok=True)
+    processos = processos or os.cpu_count() or 1
+
+    inicio = time.monotonic()
+    tamanho_lote = max(1, min(64, quantidade // (8 * processos)))
+    lotes = [
+        (range(i, min(i + tamanho_lote, quantidade)), semente, largura, altura, faixas, fracao_vazios, pasta_frames)
+        for i in range(0, quantidade, tamanho_lote)
+    ]
+    # Só o processo principal escreve o manifesto, na ordem dos índices
+    with Pool(processos) as pool, open(os.path.join(saida, 'manifesto.ndjson'), 'w', encoding='utf-8') as manifesto:
+        feitos = 0
+        for registros in pool.imap(_gerar_lote, lotes):
+            for registro in registros:
+                manifesto.write(json.dumps(registro, ensure_ascii=False) + '\n')
+            feitos += len(registros)
+            if feitos % 1000 < len(registros) or feitos == quantidade:
+                decorrido = time.monotonic() - inicio
+                print(f"  {feitos}/{quantidade} frames ({feitos / decorrido:.0f} frames/s)", flush=True)
+    return time.monotonic() - inicio
+
+
+# =========================
+# Avaliação
+# =========================
+
+_decodificar = None
+
+
+def _iniciar_decodificador(nome):
+    global _decodificar
+    if nome == 'pyzbar':
+        from pyzbar import pyzbar
+        from pyzbar.pyzbar import ZBarSymbol
+
+        def _decodificar(frame):
+            cinza = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            achados = pyzbar.decode(cinza, symbols=[ZBarSymbol.QRCODE])
+            return achados[0].data.decode('utf-8', 'replace') if achados else None
+    else:
+        # Mesmo detector do script-read-qrcode.py
+        detector = cv2.QRCodeDetector()
+
+        def _decodificar(frame):
+            dados, _, _ = detector.detectAndDecode(frame)
+            return dados or None
+
+
+def _avaliar_frame(tarefa):
+    pasta, registro = tarefa
+    frame = cv2.imread(os.path.join(pasta, registro['arquivo']))
+    inicio = time.perf_counter()
+    lido = _decodificar(frame)
+    ms = (time.perf_counter() - inicio) * 1000
+    return registro, lido, ms
+
+
+def _faixa(valor, limites):
+    for i, limite in enumerate(limites):
+        if valor < limite:
+            return i
+    return len(limites)
+
+
+def _rotulo_faixa(i, limites):
+    if i == 0:
+        return f"< {limites[0]:g}"
+    if i == len(limites):
+        return f">= {limites[-1]:g}"
+    return f"{limites[i - 1]:g}–{limites[i]:g}"
+
+
+def avaliar(pasta, decodificador='opencv', processos=None, limite=0):
+    """
+    Decodifica todos os frames do corpus e compara com o gabarito.
+    Imprime acurácia, leituras erradas, falsos positivos, tempo por frame
+    e a acurácia por faixa de cada parâmetro.
+    """
+    with open(os.path.join(pasta, 'manifesto.ndjson'), encoding='utf-8') as manifesto:
+        registros = [json.loads(linha) for linha in manifesto if linha.strip()]
+    if limite:
+        registros = registros[:limite]
+
+    processos = processos or os.cpu_count() or 1
+    inicio = time.monotonic()
+    with Pool(processos, initializer=_iniciar_decodificador, initargs=(decodificador,)) as pool:
+        resultados = pool.map(_avaliar_frame, [(pasta, r) for r in registros], chunksize=16)
+    decorrido = time.monotonic() - inicio
+
+    com_qr = [(r, lido, ms) for r, lido, ms in resultados if r['conteudo']]
+    vazios = [(r, lido, ms) for r, lido, ms in resultados if not r['conteudo']]
+    certos = sum(1 for r, lido, _ in com_qr if lido == r['conteudo'])
+    errados = sum(1 for r, lido, _ in com_qr if lido and lido != r['conteudo'])
+    falsos = sum(1 for _, lido, _ in vazios if lido)
+    tempos = sorted(ms for _, _, ms in resultados)
+
+    print(f"\nDecodificador: {decodificador} | {len(resultados)} frames em {decorrido:.1f}s "
+          f"({processos} processos)")
+    if com_qr:
+        print(f"Acurácia: {certos}/{len(com_qr)} ({100 * certos / len(com_qr):.1f}%) | "
+              f"leituras erradas: {errados} | falsos positivos: {falsos}/{len(vazios)}")
+    if tempos:
+        print(f"Tempo por frame: média {sum(tempos) / len(tempos):.1f} ms | "
+              f"p50 {tempos[len(tempos) // 2]:.1f} ms | p95 {tempos[int(0.95 * (len(tempos) - 1))]:.1f} ms")
+
+    for parametro, limites in LIMITES_AVALIACAO.items():
+        contagem = [[0, 0] for _ in range(len(limites) + 1)]
+        for r, lido, _ in com_qr:
+            valor = r['parametros'][parametro]
+            if parametro == 'rotacao':
+                valor = abs(valor)
+            faixa = contagem[_faixa(valor, limites)]
+            faixa[0] += 1
+            faixa[1] += lido == r['conteudo']
+        celulas = [
+            f"{_rotulo_faixa(i, limites)}: {100 * ok / n:.0f}% ({n})"
+            for i, (n, ok) in enumerate(contagem) if n
+        ]
+        print(f"  {parametro:<12} " + " | ".join(celulas))
+
+    return {"frames": len(resultados), "certos": certos, "errados": errados, "falsos_positivos": falsos}
+
+
+def _faixa_arg(texto):
+    nome, sep, valores = texto.partition('=')
+    minimo, sep2, maximo = valores.partition(':')
+    if not sep or not sep2 or nome not in FAIXAS:
+        raise argparse.ArgumentTypeError(f"Use PARAMETRO=MIN:MAX com PARAMETRO em {', '.join(FAIXAS)}")
+    try:
+        return nome, (float(minimo), float(maximo))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Faixa inválida: {texto}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Corpus sintético de QR Codes distorcidos')
+    parser.add_argument('--quantidade', type=int, default=1000, help='Número de frames')
+    parser.add_argument('--saida', default='corpus', help='Pasta do corpus')
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--largura', type=int, default=1280)
+    parser.add_argument('--altura', type=int, default=720)
+    parser.add_argument('--faixa', type=_faixa_arg, action='append', default=[], metavar='PARAMETRO=MIN:MAX',
+                        help=f"Faixa de uma distorção ({', '.join(FAIXAS)}); pode repetir")
+    parser.add_argument('--fracao-vazios', type=float, default=0.05, help='Fração de frames sem QR')
+    parser.add_argument('--processos', type=int, default=None, help='Processos do pool (padrão: CPUs)')
+    parser.add_argument('--avaliar', metavar='PASTA', help='Avalia o decodificador num corpus já gerado')
+    parser.add_argument('--decodificador', choices=['opencv', 'pyzbar'], default='opencv')
+    parser.add_argument('--limite', type=int, default=0, help='Avalia só os N primeiros frames')
+    args = parser.parse_args()
+
+    if args.avaliar:
+        avaliar(args.avaliar, args.decodificador, args.processos, args.limite)
+        return
+
+    print(f"Gerando {args.quantidade} frames {args.largura}x{args.altura} em {args.saida}/")
+    segundos = gerar_corpus(
+        args.quantidade, args.saida, semente=args.semente, largura=args.largura, altura=args.altura,
+        faixas=dict(args.faixa), fracao_vazios=args.fracao_vazios, processos=args.processos,
+    )
+    print(f"✓ {args.quantidade} frames em {segundos:.1f}s | gabarito: {os.path.join(args.saida, 'manifesto.ndjson')}")
+
+
+if __name__ == "__main__":
+    main()
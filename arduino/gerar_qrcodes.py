@@ -2,10 +2,28 @@
 """
 Gerador de QR Codes para Sistema de Seleção
 Cria QR Codes A-E para testes
+
+Modo lote (etiquetas ``regiao:nome`` para impressão):
+    python gerar_qrcodes.py --manifesto turno.csv --formato pdf --saida qr_codes/turno.pdf
+    python gerar_qrcodes.py --manifesto turno.ndjson --formato png --saida qr_codes/turno/
+
+O manifesto é CSV (cabeçalho com ``regiao,nome`` e opcional ``copias``) ou
+NDJSON (um objeto por linha com as mesmas chaves). As etiquetas são
+desenhadas num pool de processos e montadas em folhas A4. Cada etiqueta e
+cada folha ficam em cache pelo hash do conteúdo e do layout, então gerar de
+novo um lote igual (ou quase) só redesenha o que mudou.
 """
 
+import argparse
+import csv
+import hashlib
+import json
 import qrcode
 import os
+import shutil
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 def gerar_qr_codes():
     """Gera QR Codes para todos os destinos"""
@@ -129,6 +147,268 @@ def visualizar_qr_codes():
     
     cv2.destroyAllWindows()
 
+# =========================
+# Modo lote
+# =========================
+
+REGIOES_VALIDAS = ['norte', 'nordeste', 'centro-oeste', 'sudeste', 'sul']
+
+PASTA_CACHE = os.path.join('qr_codes', 'cache')
+
+# Muda quando o desenho da etiqueta/folha muda, invalidando o cache
+VERSAO_LAYOUT = 2
+
+# A4 em mm
+LARGURA_FOLHA_MM = 210
+ALTURA_FOLHA_MM = 297
+
+
+def carregar_manifesto(caminho):
+    """
+    Lê o manifesto (CSV ou NDJSON, pela extensão) e retorna a lista de
+    conteúdos ``regiao:nome``, já com as cópias. Linhas inválidas são
+    avisadas e ignoradas.
+    """
+    ndjson = os.path.splitext(caminho)[1].lower() in ('.ndjson', '.jsonl')
+    conteudos = []
+    with open(caminho, newline='', encoding='utf-8') as arquivo:
+        if ndjson:
+            registros = []
+            for numero, linha in enumerate(arquivo, 1):
+                if not linha.strip():
+                    continue
+                try:
+                    registros.append((numero, json.loads(linha)))
+                except json.JSONDecodeError as e:
+                    print(f"⚠ Linha {numero}: JSON inválido ({e})")
+        else:
+            registros = enumerate(csv.DictReader(arquivo), 2)
+        
+        for numero, registro in registros:
+            regiao = str(registro.get('regiao') or '').strip().lower()
+            nome = str(registro.get('nome') or '').strip()
+            if regiao not in REGIOES_VALIDAS or not nome:
+                print(f"⚠ Linha {numero}: região inválida ou nome vazio ({registro})")
+                continue
+            try:
+                copias = int(registro.get('copias') or 1)
+            except ValueError:
+                print(f"⚠ Linha {numero}: copias inválido ({registro.get('copias')})")
+                continue
+            conteudos.extend([f"{regiao}:{nome}"] * copias)
+    return conteudos
+
+
+def _chave(*partes):
+    return hashlib.sha256('\x1f'.join(str(p) for p in partes).encode('utf-8')).hexdigest()[:24]
+
+
+def _fonte(tamanho):
+    from PIL import ImageFont
+    try:
+        return ImageFont.load_default(size=tamanho)
+    except TypeError:  # Pillow < 10.1
+        return ImageFont.load_default()
+
+
+def _renderizar_etiqueta(tarefa):
+    """Desenha uma etiqueta (QR + legenda) em 1 bit. Roda no pool."""
+    from PIL import Image, ImageDraw
+    conteudo, caminho, lado_px = tarefa
+    
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_H, box_size=1, border=4)
+    qr.add_data(conteudo)
+    qr.make(fit=True)
+    img_qr = qr.make_image(fill_color="black", back_color="white").get_image().convert('1')
+    # Escala inteira: todos os módulos com a mesma largura em pixels
+    modulos = img_qr.size[0]
+    lado_qr = max(1, lado_px // modulos) * modulos
+    img_qr = img_qr.resize((lado_qr, lado_qr), Image.NEAREST)
+    
+    altura_texto = max(lado_px // 6, 12)
+    etiqueta = Image.new('1', (lado_px, lado_px + altura_texto), 1)
+    etiqueta.paste(img_qr, ((lado_px - lado_qr) // 2, (lado_px - lado_qr) // 2))
+    desenho = ImageDraw.Draw(etiqueta)
+    desenho.text((lado_px // 2, lado_px + altura_texto // 2), conteudo, fill=0,
+                 font=_fonte(int(altura_texto * 0.6)), anchor='mm')
+    
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    etiqueta.save(temporario, format='PNG', optimize=False)
+    os.replace(temporario, caminho)
+
+
+def _montar_folha(tarefa):
+    """Cola as etiquetas (já em cache) numa folha A4 em 1 bit. Roda no pool."""
+    from PIL import Image
+    caminhos, caminho, tamanho_folha, grade, passo, margem = tarefa
+    colunas, _ = grade
+    folha = Image.new('1', tamanho_folha, 1)
+    for i, caminho_etiqueta in enumerate(caminhos):
+        linha, coluna = divmod(i, colunas)
+        with Image.open(caminho_etiqueta) as etiqueta:
+            folha.paste(etiqueta, (margem[0] + coluna * passo[0], margem[1] + linha * passo[1]))
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    folha.save(temporario, format='PNG', optimize=False)
+    os.replace(temporario, caminho)
+
+
+def _dados_png(caminho):
+    """(largura, altura, IDAT concatenado) de um PNG 1 bit em tons de cinza."""
+    with open(caminho, 'rb') as arquivo:
+        dados = arquivo.read()
+    if dados[:8] != b'\x89PNG\r\n\x1a\n':
+        raise ValueError(f"{caminho} não é PNG")
+    pos, largura, altura, idat = 8, None, None, []
+    while pos < len(dados):
+        tamanho, tipo = struct.unpack('>I4s', dados[pos:pos + 8])
+        corpo = dados[pos + 8:pos + 8 + tamanho]
+        if tipo == b'IHDR':
+            largura, altura, bits, cor, _, _, entrelacado = struct.unpack('>IIBBBBB', corpo)
+            if (bits, cor, entrelacado) != (1, 0, 0):
+                raise ValueError(f"{caminho}: esperado PNG 1 bit cinza sem entrelaçamento")
+        elif tipo == b'IDAT':
+            idat.append(corpo)
+        elif tipo == b'IEND':
+            break
+        pos += 12 + tamanho
+    return largura, altura, b''.join(idat)
+
+
+def escrever_pdf(caminhos, saida, dpi):
+    """
+    Monta o PDF com uma folha PNG por página, copiando os dados comprimidos
+    do PNG direto para o PDF (FlateDecode com preditor PNG), sem decodificar
+    nem recomprimir as imagens.
+    """
+    offsets = []
+    with open(saida, 'wb') as pdf:
+        def objeto(numero, conteudo, stream=None):
+            offsets.append((numero, pdf.tell()))
+            pdf.write(f"{numero} 0 obj\n".encode() + conteudo)
+            if stream is not None:
+                pdf.write(b"\nstream\n" + stream + b"\nendstream")
+            pdf.write(b"\nendobj\n")
+        
+        pdf.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        total = len(caminhos)
+        objeto(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        kids = " ".join(f"{3 + 3 * i} 0 R" for i in range(total))
+        objeto(2, f"<< /Type /Pages /Kids [{kids}] /Count {total} >>".encode())
+        for i, caminho in enumerate(caminhos):
+            largura, altura, idat = _dados_png(caminho)
+            pontos = (largura * 72 / dpi, altura * 72 / dpi)
+            pagina, conteudo, imagem = 3 + 3 * i, 4 + 3 * i, 5 + 3 * i
+            objeto(pagina, (
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {pontos[0]:.2f} {pontos[1]:.2f}] "
+                f"/Resources << /XObject << /Im0 {imagem} 0 R >> >> /Contents {conteudo} 0 R >>"
+            ).encode())
+            desenho = f"q {pontos[0]:.2f} 0 0 {pontos[1]:.2f} 0 0 cm /Im0 Do Q".encode()
+            objeto(conteudo, f"<< /Length {len(desenho)} >>".encode(), desenho)
+            objeto(imagem, (
+                f"<< /Type /XObject /Subtype /Image /Width {largura} /Height {altura} "
+                f"/ColorSpace /DeviceGray /BitsPerComponent 1 /Filter /FlateDecode "
+                f"/DecodeParms << /Predictor 15 /Colors 1 /BitsPerComponent 1 /Columns {largura} >> "
+                f"/Length {len(idat)} >>"
+            ).encode(), idat)
+        
+        inicio_xref = pdf.tell()
+        pdf.write(f"xref\n0 {len(offsets) + 1}\n0000000000 65535 f \n".encode())
+        for _, offset in sorted(offsets):
+            pdf.write(f"{offset:010d} 00000 n \n".encode())
+        pdf.write(f"trailer\n<< /Size {len(offsets) + 1} /Root 1 0 R >>\nstartxref\n{inicio_xref}\n%%EOF\n".encode())
+
+
+def gerar_lote(conteudos, saida, formato='pdf', dpi=300, tamanho_mm=30, margem_mm=10,
+               espaco_mm=4, processos=None, pasta_cache=PASTA_CACHE):
+    """
+    Gera as folhas de etiquetas. Retorna um dict com os contadores.
+    
+    Args:
+        conteudos: Lista de conteúdos ``regiao:nome`` (uma etiqueta cada)
+        saida: Arquivo .pdf ou pasta das folhas PNG
+        formato: 'pdf' ou 'png'
+        dpi: Resolução de impressão
+        tamanho_mm: Lado do QR na etiqueta
+        margem_mm, espaco_mm: Margem da folha e espaço entre etiquetas
+        processos: Tamanho do pool (None = número de CPUs)
+    """
+    inicio = time.monotonic()
+    mm = dpi / 25.4
+    lado_px = round(tamanho_mm * mm)
+    altura_px = lado_px + max(lado_px // 6, 12)
+    tamanho_folha = (round(LARGURA_FOLHA_MM * mm), round(ALTURA_FOLHA_MM * mm))
+    margem = (round(margem_mm * mm), round(margem_mm * mm))
+    passo = (lado_px + round(espaco_mm * mm), altura_px + round(espaco_mm * mm))
+    grade = (
+        (tamanho_folha[0] - 2 * margem[0] + round(espaco_mm * mm)) // passo[0],
+        (tamanho_folha[1] - 2 * margem[1] + round(espaco_mm * mm)) // passo[1],
+    )
+    por_folha = grade[0] * grade[1]
+    if por_folha < 1:
+        raise ValueError("Etiqueta maior que a folha")
+    
+    pasta_etiquetas = os.path.join(pasta_cache, 'etiquetas')
+    pasta_folhas = os.path.join(pasta_cache, 'folhas')
+    os.makedirs(pasta_etiquetas, exist_ok=True)
+    os.makedirs(pasta_folhas, exist_ok=True)
+    
+    # Etiquetas: uma por conteúdo distinto, desenhada só se não estiver em cache
+    caminhos = {}
+    a_desenhar = []
+    for conteudo in conteudos:
+        if conteudo in caminhos:
+            continue
+        caminho = os.path.join(pasta_etiquetas, _chave(VERSAO_LAYOUT, lado_px, conteudo) + '.png')
+        caminhos[conteudo] = caminho
+        if not os.path.exists(caminho):
+            a_desenhar.append((conteudo, caminho, lado_px))
+    
+    # Folhas: a chave é o hash das etiquetas que ela contém
+    folhas = []
+    a_montar = []
+    for i in range(0, len(conteudos), por_folha):
+        etiquetas = [caminhos[c] for c in conteudos[i:i + por_folha]]
+        caminho = os.path.join(
+            pasta_folhas, _chave(VERSAO_LAYOUT, tamanho_folha, grade, passo, margem, *etiquetas) + '.png'
+        )
+        folhas.append(caminho)
+        if not os.path.exists(caminho):
+            a_montar.append((etiquetas, caminho, tamanho_folha, grade, passo, margem))
+    
+    if a_desenhar or a_montar:
+        processos = processos or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=processos) as pool:
+            lote = min(max(1, len(a_desenhar) // (4 * processos)), 64)
+            list(pool.map(_renderizar_etiqueta, a_desenhar, chunksize=lote))
+            list(pool.map(_montar_folha, a_montar))
+    
+    if formato == 'pdf':
+        pasta = os.path.dirname(saida)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        escrever_pdf(folhas, saida, dpi)
+    else:
+        os.makedirs(saida, exist_ok=True)
+        for numero, caminho in enumerate(folhas, 1):
+            destino = os.path.join(saida, f"folha_{numero:04d}.png")
+            if os.path.exists(destino):
+                os.remove(destino)
+            try:
+                os.link(caminho, destino)
+            except OSError:
+                shutil.copyfile(caminho, destino)
+    
+    return {
+        "etiquetas": len(conteudos),
+        "distintas": len(caminhos),
+        "desenhadas": len(a_desenhar),
+        "folhas": len(folhas),
+        "folhas_montadas": len(a_montar),
+        "por_folha": por_folha,
+        "segundos": time.monotonic() - inicio,
+    }
+
+
 def menu():
     """Menu principal"""
     while True:
@@ -155,9 +435,46 @@ def menu():
         else:
             print("\n✗ Opção inválida!")
 
+def main():
+    parser = argparse.ArgumentParser(description='Gerador de QR Codes e folhas de etiquetas')
+    parser.add_argument('--manifesto', help='CSV ou NDJSON com regiao,nome[,copias] (sem ele: menu)')
+    parser.add_argument('--saida', help='Arquivo .pdf ou pasta das folhas PNG (padrão: qr_codes/<manifesto>)')
+    parser.add_argument('--formato', choices=['pdf', 'png'], default='pdf')
+    parser.add_argument('--dpi', type=int, default=300)
+    parser.add_argument('--tamanho-mm', type=float, default=30, help='Lado do QR na etiqueta (mm)')
+    parser.add_argument('--margem-mm', type=float, default=10, help='Margem da folha (mm)')
+    parser.add_argument('--espaco-mm', type=float, default=4, help='Espaço entre etiquetas (mm)')
+    parser.add_argument('--processos', type=int, default=None, help='Processos do pool (padrão: CPUs)')
+    parser.add_argument('--cache', default=PASTA_CACHE, help=f'Pasta do cache (padrão: {PASTA_CACHE})')
+    args = parser.parse_args()
+    
+    if not args.manifesto:
+        menu()
+        return
+    
+    conteudos = carregar_manifesto(args.manifesto)
+    if not conteudos:
+        print("✗ Nenhuma etiqueta válida no manifesto")
+        return
+    saida = args.saida
+    if not saida:
+        base = os.path.splitext(os.path.basename(args.manifesto))[0]
+        saida = os.path.join('qr_codes', base + ('.pdf' if args.formato == 'pdf' else ''))
+    
+    r = gerar_lote(
+        conteudos, saida, formato=args.formato, dpi=args.dpi, tamanho_mm=args.tamanho_mm,
+        margem_mm=args.margem_mm, espaco_mm=args.espaco_mm, processos=args.processos,
+        pasta_cache=args.cache,
+    )
+    print(f"✓ {r['etiquetas']} etiquetas ({r['distintas']} distintas, {r['desenhadas']} desenhadas) "
+          f"em {r['folhas']} folhas de {r['por_folha']} ({r['folhas_montadas']} montadas) "
+          f"em {r['segundos']:.1f}s")
+    print(f"  Saída: {saida}")
+
+
 if __name__ == "__main__":
     try:
-        menu()
+        main()
     except KeyboardInterrupt:
         print("\n\nPrograma interrompido pelo usuário")
     except ImportError as e:
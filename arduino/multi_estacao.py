@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Controlador multi-estação - vários braços na mesma linha de separação.
+
+Cada estação é um Arduino (porta serial própria) com a sua câmera. Uma thread
+por estação roda o ciclo automático do ControladorIntegrado (INICIAR → QR →
+REGIAO) de forma independente, e uma thread só traz os pacotes novos do
+backend para a FilaRegioes compartilhada.
+
+Roteamento: o leitor de QR de cada câmera grava o pacote com ``--estacao
+<nome>``, e a estação com esse nome o recebe. Pacotes sem estação (ou de uma
+estação desconhecida, ex.: uma câmera compartilhada) vão para a estação que
+estiver aguardando QR. A reserva na fila é atômica, então um pacote nunca é
+enviado a duas estações. Cada estação só aceita pacotes lidos depois do seu
+INICIAR; os sem estação que ninguém pegou dentro de timeout_pegar +
+timeout_qr expiram. Para aumentar a vazão da linha basta acrescentar
+braços.
+
+Uso:
+    python multi_estacao.py --estacao esquerda=/dev/ttyACM0 --estacao direita=/dev/ttyACM1
+
+    # Uma câmera por estação
+    python script-read-qrcode.py --source 0 --port 5001 --estacao esquerda
+    python script-read-qrcode.py --source 1 --port 5002 --estacao direita
+"""
+
+import argparse
+import threading
+import time
+
+from controle_integrado import ControladorIntegrado, Vazao
+from fila_regioes import CAMINHO_PADRAO as FILA_PADRAO, FilaRegioes
+
+
+class Estacao:
+    """Um braço (porta serial) e os contadores da sua thread."""
+
+    def __init__(self, nome, porta, backend_url, baudrate=115200):
+        self.nome = nome
+        self.porta = porta
+        self.controlador = ControladorIntegrado(
+            porta_serial=porta, baudrate=baudrate, backend_url=backend_url
+        )
+        self.controlador.verboso = False
+        self.controlador.estacao = nome
+        self.controlador.sincronizar_backend = False
+        self.estado = 'desconectada'
+        self.ciclos = 0
+        self.falhas = 0
+        self.tempo_ciclos = 0.0
+        self.thread = None
+
+    def resumo(self):
+        media = self.tempo_ciclos / self.ciclos if self.ciclos else 0
+        return (f"{self.nome} ({self.porta}): {self.estado}, {self.ciclos} ciclos, "
+                f"{self.falhas} falhas, ciclo médio {media:.1f}s")
+
+
+class ControladorMultiEstacao:
+    """Opera N estações em paralelo sobre uma fila de pacotes compartilhada."""
+
+    def __init__(self, estacoes, backend_url='http://127.0.0.1:8001', fila_regioes=FILA_PADRAO,
+                 baudrate=115200, timeout_pegar=30, timeout_qr=15, timeout_ciclo=60,
+                 regiao_sem_leitura=None, max_ciclos=0, max_falhas=5, intervalo=0.1):
+        """
+        Args:
+            estacoes: Dict nome → porta serial
+            backend_url: URL base do backend Django
+            fila_regioes: Arquivo SQLite da fila compartilhada
+            max_ciclos: Para depois de N ciclos somando as estações (0 = sem limite)
+            max_falhas: Uma estação para depois de N falhas seguidas
+            (demais: ver ControladorIntegrado.executar_ciclo)
+        """
+        self.estacoes = {
+            nome: Estacao(nome, porta, backend_url, baudrate) for nome, porta in estacoes.items()
+        }
+        self.fila = FilaRegioes(fila_regioes)
+        for estacao in self.estacoes.values():
+            estacao.controlador.fila = self.fila
+            estacao.controlador.estacoes = tuple(self.estacoes)
+
+        # Só esta instância fala com o backend (uma sessão HTTP, um cursor)
+        self._backend = ControladorIntegrado(backend_url=backend_url, fila_regioes=fila_regioes)
+        self._backend.fila = self.fila
+
+        self.opcoes_ciclo = {
+            'timeout_pegar': timeout_pegar,
+            'timeout_qr': timeout_qr,
+            'timeout_ciclo': timeout_ciclo,
+            'regiao_sem_leitura': regiao_sem_leitura,
+            'intervalo': intervalo,
+        }
+        self.max_ciclos = max_ciclos
+        self.max_falhas = max_falhas
+        self.intervalo = intervalo
+        # Nenhum ciclo espera um pacote por mais que isso depois do INICIAR
+        self.janela_pacote = timeout_pegar + timeout_qr
+        self.executando = True
+        self.vazao = Vazao(ControladorIntegrado.JANELA_VAZAO)
+        self._iniciados = 0
+        self._lock = threading.Lock()
+
+    # ----- threads -----
+
+    def _sincronizar(self):
+        falhas = 0
+        while self.executando:
+            if self._backend.sincronizar_fila() is None:
+                falhas += 1
+                time.sleep(min(2 ** falhas, 30))
+                continue
+            falhas = 0
+            self.fila.expirar(time.time() - self.janela_pacote)
+            time.sleep(self.intervalo)
+
+    def _reservar_ciclo(self):
+        with self._lock:
+            if self.max_ciclos and self._iniciados >= self.max_ciclos:
+                return False
+            self._iniciados += 1
+            return True
+
+    def _operar(self, estacao):
+        ctrl = estacao.controlador
+        falhas_seguidas = 0
+        while self.executando and ctrl.executando:
+            if falhas_seguidas >= self.max_falhas:
+                estacao.estado = 'parada (falhas)'
+                print(f"\n✗ [{estacao.nome}] Falhas demais seguidas, estação parada")
+                return
+            if not self._reservar_ciclo():
+                break
+
+            estacao.estado = 'operando'
+            inicio_ciclo = time.monotonic()
+            sucesso, motivo = ctrl.executar_ciclo(**self.opcoes_ciclo)
+            if not sucesso:
+                with self._lock:
+                    self._iniciados -= 1
+                falhas_seguidas += 1
+                estacao.falhas += 1
+                print(f"\n✗ [{estacao.nome}] {motivo} ({falhas_seguidas}/{self.max_falhas} falhas seguidas)")
+                continue
+
+            falhas_seguidas = 0
+            duracao = time.monotonic() - inicio_ciclo
+            estacao.ciclos += 1
+            estacao.tempo_ciclos += duracao
+            with self._lock:
+                self.vazao.registrar()
+                linha = str(self.vazao)
+            print(f"[{estacao.nome}] Ciclo {estacao.ciclos}: {duracao:.1f}s | linha: {linha}")
+        estacao.estado = 'parada'
+
+    # ----- operação -----
+
+    def conectar(self):
+        """Conecta todas as estações em paralelo; retorna as que responderam."""
+        def conectar_estacao(estacao):
+            if estacao.controlador.conectar_serial():
+                estacao.estado = 'conectada'
+
+        threads = [threading.Thread(target=conectar_estacao, args=(e,)) for e in self.estacoes.values()]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return [e for e in self.estacoes.values() if e.estado == 'conectada']
+
+    def executar(self):
+        print("\n" + "="*60)
+        print(f"MULTI-ESTAÇÃO - {len(self.estacoes)} ESTAÇÕES")
+        print("="*60)
+        for estacao in self.estacoes.values():
+            print(f"  {estacao.nome}: {estacao.porta}")
+        print("Pressione Ctrl+C para parar")
+        print("="*60)
+
+        conectadas = self.conectar()
+        if not conectadas:
+            print("\n✗ Nenhuma estação conectou")
+            self.fila.fechar()
+            return
+        for estacao in self.estacoes.values():
+            if estacao.estado != 'conectada':
+                print(f"⚠ [{estacao.nome}] Fora de operação: Arduino em {estacao.porta} não respondeu")
+
+        if self._backend.sincronizar_fila() is None:
+            print("⚠ Backend não respondeu; tentando de novo em segundo plano")
+        # Lidos com o controlador parado: não pertencem a nenhum objeto atual
+        expirados = self.fila.expirar(time.time())
+        if expirados:
+            print(f"⚠ [Multi] {expirados} pacote(s) lido(s) antes da partida marcado(s) como expirado(s)")
+        threading.Thread(target=self._sincronizar, name="multi-sincronizar", daemon=True).start()
+
+        for estacao in conectadas:
+            estacao.thread = threading.Thread(
+                target=self._operar, args=(estacao,), name=f"estacao-{estacao.nome}", daemon=True
+            )
+            estacao.thread.start()
+
+        try:
+            for estacao in conectadas:
+                while estacao.thread.is_alive():
+                    estacao.thread.join(0.5)
+        except KeyboardInterrupt:
+            print("\n\n[Multi] Parando estações (terminam o comando em andamento)...")
+            self.parar()
+            for estacao in conectadas:
+                estacao.thread.join(timeout=self.opcoes_ciclo['timeout_ciclo'])
+        finally:
+            self.executando = False
+            for estacao in conectadas:
+                if estacao.controlador.transporte:
+                    estacao.controlador.transporte.fechar()
+
+        print(f"\n[Multi] {self.vazao.resumo()}")
+        for estacao in self.estacoes.values():
+            print(f"  {estacao.resumo()}")
+        self.fila.fechar()
+
+    def parar(self):
+        self.executando = False
+        for estacao in self.estacoes.values():
+            estacao.controlador.executando = False
+
+
+def _estacao_arg(texto):
+    nome, sep, porta = texto.partition('=')
+    if not sep or not nome or not porta:
+        raise argparse.ArgumentTypeError(f"Use NOME=PORTA (ex.: esquerda=/dev/ttyACM0), não {texto!r}")
+    return nome.strip(), porta.strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Controlador de várias estações (braços) em paralelo')
+    parser.add_argument('--estacao', type=_estacao_arg, action='append', required=True, metavar='NOME=PORTA',
+                        help='Estação e sua porta serial (repita para cada braço)')
+    parser.add_argument('--backend', default='http://127.0.0.1:8001', help='URL do backend')
+    parser.add_argument('--baudrate', type=int, default=115200)
+    parser.add_argument('--fila', default=FILA_PADRAO, help=f'Arquivo SQLite da fila de pacotes (padrão: {FILA_PADRAO})')
+    parser.add_argument('--ciclos', type=int, default=0, help='Para depois de N ciclos no total (0 = sem limite)')
+    parser.add_argument('--timeout-pegar', type=float, default=30, help='Limite (s) para pegar o objeto')
+    parser.add_argument('--timeout-qr', type=float, default=15, help='Limite (s) para ler o QR code')
+    parser.add_argument('--timeout-ciclo', type=float, default=60, help='Limite (s) para o ciclo da região')
+    parser.add_argument('--regiao-sem-leitura', choices=ControladorIntegrado.REGIOES_VALIDAS,
+                        help='Região para objetos sem leitura (padrão: interrompe o ciclo)')
+    parser.add_argument('--max-falhas', type=int, default=5, help='Para a estação depois de N falhas seguidas')
+    parser.add_argument('--intervalo', type=float, default=0.1, help='Intervalo (s) entre consultas ao backend')
+    args = parser.parse_args()
+
+    estacoes = dict(args.estacao)
+    if len(estacoes) != len(args.estacao):
+        parser.error("nomes de estação repetidos")
+    if len(set(estacoes.values())) != len(estacoes):
+        parser.error("a mesma porta em duas estações")
+
+    controlador = ControladorMultiEstacao(
+        estacoes,
+        backend_url=args.backend,
+        fila_regioes=args.fila,
+        baudrate=args.baudrate,
+        timeout_pegar=args.timeout_pegar,
+        timeout_qr=args.timeout_qr,
+        timeout_ciclo=args.timeout_ciclo,
+        regiao_sem_leitura=args.regiao_sem_leitura,
+        max_ciclos=args.ciclos,
+        max_falhas=args.max_falhas,
+        intervalo=args.intervalo,
+    )
+    controlador.executar()
+
+
+if __name__ == "__main__":
+    main()
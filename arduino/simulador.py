@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+Simulador do firmware (arduino/src/main.cpp) num pseudo-terminal.
+
+Cria um PTY e responde nele como o Arduino: banner de boot terminando em
+READY, eco ">>> CMD: <comando>" e a mesma máquina de estados (INICIAR,
+REGIAO:<x>, STATUS, PARAR, RESET, C/CALIBRAR). Como o firmware, processa um
+comando por vez e bloqueia durante os movimentos; comandos que chegam no
+meio de um ciclo ficam no buffer da serial até ele terminar.
+
+Os tempos de cada fase seguem os delays do firmware e podem ser ajustados
+(--tempo fase=segundos) e comprimidos (--escala 100 = 100x mais rápido).
+
+Uso:
+    # Só o simulador: aponte o Django/controle_integrado para a porta impressa
+    python arduino/simulador.py --escala 10 --link /tmp/ttyARDUINO
+
+    # Teste de carga do ArduinoController contra o simulador
+    python arduino/simulador.py --carga 500 --escala 200
+"""
+
+import argparse
+import os
+import random
+import select
+import sys
+import threading
+import time
+import tty
+
+# Adiciona o diretório raiz ao path para imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# Duração (s) de cada fase no firmware real, estimada pelos delays e pela
+# velocidade dos servos (move_servo_gradual) e dos motores de passo
+TEMPOS_PADRAO = {
+    'boot': 1.0,            # delay(1000) do setup()
+    'calibracao': 5.9,      # calibracao_inicial()
+    'pegar': 10.1,          # pegar_objeto()
+    'recolher': 0.3,        # RECOLHENDO_BRACO
+    'girar': 2.3,           # GIRANDO_PARA_DIREITA
+    'defletor': 1.5,        # 1500 meios-passos a 15 RPM
+    'pausa': 0.5,           # delay(500) entre as etapas do ciclo
+    'soltar': 7.5,          # soltar_objeto()
+    'espera_esteira': 5.0,  # delay(5000) em retornarDefletor()
+    'voltar': 4.2,          # voltar_posicao_inicial()
+}
+
+REGIOES = ['norte', 'nordeste', 'centro-oeste', 'sudeste', 'sul']
+
+# Regiões que movem um motor de passo (centro-oeste passa reto)
+MENSAGENS_DEFLETOR = {
+    'norte': 'REGIAO:NORTE - Motor1 CW 1500',
+    'nordeste': 'REGIAO:NORDESTE - Motor3 CW 1500',
+    'sudeste': 'REGIAO:SUDESTE - Motor1 CCW 1500',
+    'sul': 'REGIAO:SUL - Motor3 CCW 1500',
+}
+
+# Estados do firmware (enum do main.cpp)
+AGUARDANDO = 'AGUARDANDO'
+PEGANDO_OBJETO = 'PEGANDO_OBJETO'
+AGUARDANDO_QR = 'AGUARDANDO_QR'
+MOVENDO_DEFLETOR = 'MOVENDO_DEFLETOR'
+SOLTANDO_OBJETO = 'SOLTANDO_OBJETO'
+RETORNANDO_DEFLETOR = 'RETORNANDO_DEFLETOR'
+VOLTANDO_POSICAO = 'VOLTANDO_POSICAO'
+
+
+class FirmwareSimulado:
+    """Máquina de estados do main.cpp respondendo num PTY."""
+
+    def __init__(self, escala=1.0, tempos=None, boot=True, link=None):
+        self.escala = escala
+        self.tempos = dict(TEMPOS_PADRAO, **(tempos or {}))
+        self.boot = boot
+        self.link = link
+        self.estado = AGUARDANDO
+        self.regiao_atual = ''
+        self.defletor_moveu = False
+        self.ciclos = 0
+        self.porta = None
+        self._mestre = None
+        self._escravo = None
+        self._parar_r, self._parar_w = os.pipe()
+        self._thread = None
+
+    # ----- ciclo de vida -----
+
+    def iniciar(self):
+        """Cria o PTY, sobe a thread do firmware e retorna o caminho da porta."""
+        self._mestre, self._escravo = os.openpty()
+        tty.setraw(self._escravo)
+        self.porta = os.ttyname(self._escravo)
+        if self.link:
+            if os.path.lexists(self.link):
+                os.unlink(self.link)
+            os.symlink(self.porta, self.link)
+        self._thread = threading.Thread(target=self._executar, name='firmware-simulado', daemon=True)
+        self._thread.start()
+        return self.link or self.porta
+
+    def parar(self):
+        os.write(self._parar_w, b'x')
+        if self._thread:
+            self._thread.join(timeout=2)
+        if self.link and os.path.islink(self.link):
+            os.unlink(self.link)
+        for fd in (self._mestre, self._escravo):
+            if fd is not None:
+                os.close(fd)
+        self._mestre = self._escravo = None
+
+    # ----- E/S -----
+
+    def _println(self, texto=''):
+        os.write(self._mestre, f'{texto}\r\n'.encode())
+
+    def _delay(self, fase):
+        time.sleep(self.tempos[fase] / self.escala)
+
+    def _executar(self):
+        if self.boot:
+            self._setup()
+        buffer = b''
+        while True:
+            prontos, _, _ = select.select([self._mestre, self._parar_r], [], [])
+            if self._parar_r in prontos:
+                return
+            try:
+                dados = os.read(self._mestre, 1024)
+            except OSError:
+                return
+            buffer += dados
+            *linhas, buffer = buffer.split(b'\n')
+            for bruta in linhas:
+                comando = bruta.decode('utf-8', errors='ignore').strip()
+                if comando:
+                    self._processar(comando)
+
+    # ----- firmware -----
+
+    def _setup(self):
+        self._delay('boot')
+        self._println()
+        self._println('=====================================================')
+        self._println('  SISTEMA AUTOMATIZADO - GARRA ROBOTICA (SIMULADOR)')
+        self._println('  Separacao de objetos por Regioes do Brasil')
+        self._println('=====================================================')
+        self._calibracao()
+        self._println()
+        self._println('Sistema pronto para operacao!')
+        self._println('READY')
+
+    def _calibracao(self):
+        self._println('CALIBRANDO...')
+        self._delay('calibracao')
+        self._println('CALIBRADO')
+
+    def _processar(self, comando):
+        self._println(f'>>> CMD: {comando}')
+        maiusculo = comando.upper()
+
+        if maiusculo == 'INICIAR':
+            if self.estado == AGUARDANDO:
+                self._pegar_objeto()
+            else:
+                self._println('ERRO:CICLO_EM_ANDAMENTO')
+        elif comando.startswith(('REGIAO:', 'regiao:')):
+            if self.estado == AGUARDANDO_QR:
+                self._ciclo_automatico(comando[7:].strip())
+            else:
+                self._println('ERRO:NAO_AGUARDANDO_QR')
+                self._println(f'ESTADO_ATUAL:{self.estado}')
+        elif maiusculo in ('C', 'CALIBRAR'):
+            self._calibracao()
+            self._println('OK')
+        elif maiusculo == 'STATUS':
+            self._println(f'ESTADO:{self.estado}')
+            self._println(f'REGIAO_ATUAL:{self.regiao_atual or "NENHUMA"}')
+            self._println('OK')
+        elif maiusculo == 'RESET':
+            self._println('EXECUTANDO_RESET...')
+            self.defletor_moveu = False
+            self.regiao_atual = ''
+            self.estado = AGUARDANDO
+            self._voltar_posicao_inicial()
+            self._println('RESET_OK')
+        elif maiusculo in ('PARAR', 'STOP'):
+            self._println('INTERROMPENDO_CICLO...')
+            self.defletor_moveu = False
+            self.regiao_atual = ''
+            self.estado = AGUARDANDO
+            self._println('CICLO_INTERROMPIDO')
+            self._println('OK')
+        else:
+            self._println(f'COMANDO_DESCONHECIDO:{comando}')
+
+    def _pegar_objeto(self):
+        self._println('PEGANDO...')
+        self.estado = PEGANDO_OBJETO
+        self._delay('pegar')
+        self.estado = AGUARDANDO_QR
+        self._println('READY_FOR_QR')
+
+    def _mover_defletor(self, regiao):
+        self._println(f'MOVENDO_DEFLETOR:{regiao}')
+        self.estado = MOVENDO_DEFLETOR
+        self.defletor_moveu = False
+        regiao = regiao.lower().strip()
+        if regiao in MENSAGENS_DEFLETOR:
+            self._println(MENSAGENS_DEFLETOR[regiao])
+            self._delay('defletor')
+            self.defletor_moveu = True
+        elif regiao in ('centro-oeste', 'centro oeste', 'centrooeste'):
+            self._println('REGIAO:CENTRO-OESTE - Passagem direta')
+        else:
+            self._println(f'REGIAO_INVALIDA:{regiao}')
+        self._println('DEFLETOR_POSICIONADO')
+
+    def _soltar_objeto(self):
+        self._println('SOLTANDO...2')
+        self.estado = SOLTANDO_OBJETO
+        self._delay('soltar')
+        self._println('OBJETO_SOLTO')
+
+    def _retornar_defletor(self):
+        self._println('RETORNANDO_DEFLETOR...')
+        self.estado = RETORNANDO_DEFLETOR
+        self._println('Aguardando 5s para objeto passar...')
+        self._delay('espera_esteira')
+        if self.defletor_moveu:
+            self._delay('defletor')
+            self.defletor_moveu = False
+        self._println('DEFLETOR_RETORNADO')
+
+    def _voltar_posicao_inicial(self):
+        self._println('VOLTANDO...')
+        self.estado = VOLTANDO_POSICAO
+        self._delay('voltar')
+        self.estado = AGUARDANDO
+        self._println('PRONTO')
+
+    def _ciclo_automatico(self, regiao):
+        self._println('=== INICIANDO CICLO AUTOMATICO ===')
+        self._println(f'REGIAO_DESTINO:{regiao}')
+        self.regiao_atual = regiao
+
+        self._println('RECOLHENDO_BRACO...')
+        self._delay('recolher')
+        self._println('GIRANDO_PARA_DIREITA...')
+        self._delay('girar')
+
+        self._mover_defletor(regiao)
+        self._delay('pausa')
+        self._soltar_objeto()
+        self._delay('pausa')
+        self._retornar_defletor()
+        self._delay('pausa')
+        self._voltar_posicao_inicial()
+
+        self.regiao_atual = ''
+        self.ciclos += 1
+        self._println('=== CICLO FINALIZADO ===')
+        self._println('OK')
+
+    def duracao_ciclo(self):
+        """Duração simulada (s, sem escala) de INICIAR + REGIAO com defletor."""
+        t = self.tempos
+        return (t['pegar'] + t['recolher'] + t['girar'] + 2 * t['defletor']
+                + 3 * t['pausa'] + t['soltar'] + t['espera_esteira'] + t['voltar'])
+
+
+# ===== TESTE DE CARGA =====
+
+def _percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def executar_carga(ciclos, escala, tempos=None, semente=None):
+    """
+    Roda ``ciclos`` ciclos INICIAR + REGIAO pelo ArduinoController contra o
+    simulador e imprime vazão e latências.
+    """
+    from dashboard.arduino import ArduinoController
+
+    sorteio = random.Random(semente)
+    simulador = FirmwareSimulado(escala=escala, tempos=tempos)
+    porta = simulador.iniciar()
+
+    controlador = ArduinoController()
+    controlador.verboso = False
+    inicio = time.monotonic()
+    if not controlador.conectar(porta):
+        print('✗ Controlador não conectou ao simulador')
+        simulador.parar()
+        return False
+    print(f'✓ Conectado ao simulador em {porta} ({(time.monotonic() - inicio) * 1000:.0f} ms)')
+
+    ecos = []       # comando submetido → eco ">>> CMD:" recebido (ms)
+    duracoes = {'INICIAR': [], 'REGIAO': []}  # comando submetido → última linha (ms)
+    falhas = 0
+
+    def executar(comando):
+        enviado = time.monotonic()
+        eco = []
+
+        def ao_receber(linha):
+            if not eco:
+                eco.append(time.monotonic())
+
+        linhas, concluido = controlador.submeter(comando, ao_receber=ao_receber).result()
+        fim = time.monotonic()
+        if eco:
+            ecos.append((eco[0] - enviado) * 1000)
+        duracoes[comando.split(':')[0]].append((fim - enviado) * 1000)
+        return concluido and not any(l.startswith('ERRO:') for l in linhas)
+
+    inicio = time.monotonic()
+    for i in range(ciclos):
+        try:
+            ok = executar('INICIAR') and executar(f'REGIAO:{sorteio.choice(REGIOES)}')
+        except Exception as e:
+            print(f'✗ Ciclo {i + 1}: {e}')
+            ok = False
+        if not ok:
+            falhas += 1
+            controlador.enviar_comando('RESET')
+        if (i + 1) % max(1, ciclos // 10) == 0:
+            print(f'  {i + 1}/{ciclos} ciclos')
+    decorrido = time.monotonic() - inicio
+
+    controlador.desconectar()
+    simulador.parar()
+
+    print('\n' + '=' * 60)
+    print('RESULTADO DA CARGA')
+    print('=' * 60)
+    print(f'Ciclos:              {ciclos} ({falhas} falhas)')
+    print(f'Escala de tempo:     {escala:g}x')
+    print(f'Tempo total:         {decorrido:.1f} s')
+    print(f'Vazão:               {ciclos / decorrido * 3600:.0f} ciclos/hora')
+    print(f'Vazão equivalente:   {ciclos / (decorrido * escala) * 3600:.0f} ciclos/hora em tempo real')
+    print(f'Ciclo simulado:      {simulador.duracao_ciclo():.1f} s (sem escala)')
+    print(f'Eco do comando (ms): p50={_percentil(ecos, 50):.2f} p95={_percentil(ecos, 95):.2f} '
+          f'max={max(ecos, default=0):.2f}')
+    for nome, valores in duracoes.items():
+        print(f'{nome:<8} (ms):       p50={_percentil(valores, 50):.1f} p95={_percentil(valores, 95):.1f} '
+              f'max={max(valores, default=0):.1f}')
+
+    # Fases medidas pela telemetria da serial (em tempo simulado)
+    telemetria = controlador.get_telemetria()
+    print(f"\nFases por ciclo (s, tempo simulado; gargalo: {telemetria['gargalo']}):")
+    for fase, dados in telemetria['fases'].items():
+        if dados['media'] is not None:
+            print(f"  {fase:<17} média={dados['media'] * escala:7.2f}  p95={dados['p95'] * escala:7.2f}")
+    return falhas == 0
+
+
+def _tempos_arg(texto):
+    fase, _, valor = texto.partition('=')
+    if fase not in TEMPOS_PADRAO or not valor:
+        raise argparse.ArgumentTypeError(
+            f"use fase=segundos, com fase em: {', '.join(TEMPOS_PADRAO)}"
+        )
+    return fase, float(valor)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulador do firmware do Arduino num PTY')
+    parser.add_argument('--escala', type=float, default=1.0,
+                        help='Compressão do tempo (ex: 100 = 100x mais rápido; padrão: 1)')
+    parser.add_argument('--tempo', type=_tempos_arg, action='append', default=[],
+                        metavar='FASE=S', help='Sobrescreve a duração de uma fase (pode repetir)')
+    parser.add_argument('--sem-boot', action='store_true',
+                        help='Não imprime o banner de boot (placa já estava ligada)')
+    parser.add_argument('--link', type=str, default=None,
+                        help='Cria um link simbólico estável para a porta (ex: /tmp/ttyARDUINO)')
+    parser.add_argument('--carga', type=int, default=0, metavar='N',
+                        help='Roda N ciclos pelo ArduinoController e mostra vazão/latência')
+    parser.add_argument('--semente', type=int, default=None, help='Semente do sorteio de regiões')
+    args = parser.parse_args()
+
+    tempos = dict(args.tempo)
+
+    if args.carga:
+        sys.exit(0 if executar_carga(args.carga, args.escala, tempos, args.semente) else 1)
+
+    simulador = FirmwareSimulado(escala=args.escala, tempos=tempos, boot=not args.sem_boot, link=args.link)
+    porta = simulador.iniciar()
+    print(f'✓ Simulador rodando em {porta} (escala {args.escala:g}x)')
+    print('  Ctrl+C para encerrar')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulador.parar()
+        print(f'\n✓ Simulador encerrado ({simulador.ciclos} ciclos)')
+
+
+if __name__ == '__main__':
+    main()
@@ -4,27 +4,33 @@ Script de Teste Simplificado - Motores de Passo
 Testa movimentos pequenos e mostra posições em tempo real
 """
 
-import serial
+import os
 import time
 import sys
 
+# Adiciona o diretório raiz ao path para imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from serial_transport import SerialTransport
+
 class TestadorMotores:
     def __init__(self, porta='/dev/ttyACM0', baudrate=115200):
         self.porta = porta
         self.baudrate = baudrate
-        self.serial_conn = None
+        self.transporte = None
+        self._linhas = None  # Assinatura: fila das linhas recebidas
     
     def conectar(self):
         """Conecta ao Arduino"""
         try:
             print(f"Conectando a {self.porta}...")
-            self.serial_conn = serial.Serial(self.porta, self.baudrate, timeout=1)
-            time.sleep(2)
+            self.transporte = SerialTransport(self.porta, self.baudrate)
             
-            # Limpa buffer inicial
-            while self.serial_conn.in_waiting:
-                linha = self.serial_conn.readline().decode('utf-8', errors='ignore').strip()
-                print(f"  {linha}")
+            # Mostra mensagens iniciais até o firmware ficar pronto
+            _, pronto = self.transporte.conectar(ao_receber=lambda linha: print(f"  {linha}"))
+            if not pronto:
+                print("⚠ Firmware não confirmou que está pronto; continuando")
+            self._linhas = self.transporte.assinar()
             
             print("✓ Conectado!\n")
             return True
@@ -34,19 +40,14 @@ class TestadorMotores:
     
     def enviar_comando(self, cmd):
         """Envia comando e mostra todas as respostas"""
-        if not self.serial_conn:
+        if not self.transporte:
             return
         
         print(f"\n→ Comando: {cmd}")
-        self.serial_conn.write(f"{cmd}\n".encode())
-        
-        time.sleep(0.5)
-        while self.serial_conn.in_waiting:
-            linha = self.serial_conn.readline().decode('utf-8', errors='ignore').strip()
-            if linha:
-                print(f"  {linha}")
+        self.transporte.escrever(cmd)
         
-        time.sleep(0.1)
+        for linha in self._linhas.drenar() + self._linhas.coletar(0.6):
+            print(f"  {linha}")
     
     def teste_basico(self):
         """Teste básico de movimentos"""
@@ -168,11 +169,10 @@ class TestadorMotores:
                 print("\nMonitorando... (Ctrl+C para parar)")
                 try:
                     while True:
-                        if self.serial_conn.in_waiting:
-                            linha = self.serial_conn.readline().decode('utf-8', errors='ignore').strip()
-                            if linha:
-                                print(f"  {linha}")
-                        time.sleep(0.05)
+                        linha = self._linhas.proxima()
+                        if linha is None:
+                            break  # porta fechada
+                        print(f"  {linha}")
                 except KeyboardInterrupt:
                     print("\nMonitoramento interrompido")
             elif escolha == '0':
@@ -188,8 +188,8 @@ class TestadorMotores:
             except KeyboardInterrupt:
                 print("\n\nInterrompido pelo usuário")
             finally:
-                if self.serial_conn:
-                    self.serial_conn.close()
+                if self.transporte:
+                    self.transporte.fechar()
                 print("\nConexão encerrada.")
 
 def main():
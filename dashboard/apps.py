@@ -1,4 +1,7 @@
 import os
+import signal
+import sys
+import threading
 from django.apps import AppConfig
 
 
@@ -11,6 +14,27 @@ class DashboardConfig(AppConfig):
         Chamado quando o app Django está pronto.
         Inicia o serviço de leitura de QR code automaticamente.
         """
+        # Logs do pacote "dashlog.*" passam pela fila do coletor
+        import log_estruturado
+        from django.conf import settings
+        log_estruturado.configurar(
+            "django",
+            caminho=settings.LOG_ARQUIVO or None,
+            max_bytes=settings.LOG_MAX_BYTES,
+            backups=settings.LOG_BACKUPS,
+            nivel=settings.LOG_NIVEL,
+        )
+
+        from django.db.backends.signals import connection_created
+        from .db import aplicar_pragmas_sqlite
+        connection_created.connect(aplicar_pragmas_sqlite, dispatch_uid='dashboard_sqlite_pragmas')
+
+        # No write-behind, SIGTERM precisa virar SystemExit para que o atexit
+        # do gravador esvazie a fila (runserver não trata SIGTERM sozinho).
+        if settings.PACOTES_WRITE_BEHIND and threading.current_thread() is threading.main_thread():
+            if signal.getsignal(signal.SIGTERM) == signal.SIG_DFL:
+                signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
         # Evita executar duas vezes no runserver (autoreload)
         if os.environ.get('RUN_MAIN') != 'true':
             return
@@ -20,6 +44,11 @@ class DashboardConfig(AppConfig):
             print("[Django] QR Reader gerenciado pelo start.py, pulando auto-start.", flush=True)
             return
         
+        # Em background: o runserver não espera o leitor subir para atender
+        threading.Thread(target=self._iniciar_qr_reader, name='qr-autostart', daemon=True).start()
+
+    @staticmethod
+    def _iniciar_qr_reader():
         try:
             from qrcode_service import start_qr_reader_service
             
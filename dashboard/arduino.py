@@ -0,0 +1,400 @@
+"""
+Controlador da conexão serial com o Arduino.
+
+Não depende do Django: é usado pelas views (conexão direta) e pelo broker
+serial (``manage.py serial_broker``), que é dono da porta quando o Django
+roda com vários workers.
+
+Os comandos passam por uma fila: uma thread despachante escreve um por vez
+na serial e devolve um Future por comando. As linhas são correlacionadas
+pelo eco ``>>> CMD: <comando>`` do firmware e cada comando termina por um
+predicado próprio (``predicado_conclusao``). Linhas que não pertencem a
+nenhum comando (ex.: um ``DEFLETOR_POSICIONADO`` atrasado) vão para o fluxo
+de eventos em vez de serem consumidas pelo próximo comando.
+
+A conexão é responsabilidade de uma thread supervisora: ``conectar`` pede a
+conexão a ela (que termina no banner READY do firmware, sem sleep fixo) e,
+se a porta cair (USB desconectado), ela reconecta sozinha com backoff
+exponencial. Um comando só espera a conexão quando há uma tentativa em
+andamento pedida antes dele (primeiro uso, depois de ``desconectar()``);
+com a porta caída e o supervisor em backoff, falha na hora com
+ConnectionError.
+"""
+import asyncio
+import itertools
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from serial_transport import TIMEOUT_BANNER, SerialTransport
+
+from .telemetria import Telemetria
+
+
+# Vai para a fila do coletor (log_estruturado): o ouvinte da serial não
+# espera o terminal
+log = logging.getLogger("dashlog.arduino")
+
+# Fim de resposta genérico (comandos sem regra própria)
+TERMINAIS_PADRAO = {"OK", "PRONTO", "RESET_OK", "CALIBRADO"}
+
+# Timeout padrão por comando (s): movimentos físicos demoram mais
+TIMEOUTS_PADRAO = {
+    "INICIAR": 30,
+    "REGIAO": 60,
+    "RESET": 30,
+    "C": 30,
+    "CALIBRAR": 30,
+}
+
+# Backoff das reconexões automáticas (s)
+BACKOFF_INICIAL = 0.5
+BACKOFF_MAXIMO = 30
+
+
+def _nome_comando(comando):
+    return comando.strip().upper().split(":", 1)[0]
+
+
+def predicado_conclusao(comando):
+    """Retorna a função que reconhece a última linha da resposta de ``comando``."""
+    nome = _nome_comando(comando)
+    if nome == "INICIAR":
+        return lambda l: l == "READY_FOR_QR" or l.startswith("ERRO:")
+    if nome == "REGIAO":
+        # PRONTO sai no meio do ciclo; o fim é o OK após "=== CICLO FINALIZADO ==="
+        return lambda l: l == "OK" or l.startswith("ERRO:")
+    if nome == "RESET":
+        return lambda l: l == "RESET_OK"
+    if nome in ("STATUS", "PARAR", "STOP", "C", "CALIBRAR"):
+        return lambda l: l == "OK"
+    return lambda l: l in TERMINAIS_PADRAO or l.startswith(("ERRO:", "COMANDO_DESCONHECIDO:"))
+
+
+class ComandoArduino:
+    """Um comando na fila: texto, predicado de conclusão, timeout e Future."""
+
+    def __init__(self, texto, fim=None, timeout=None, ao_receber=None):
+        self.texto = texto.strip()
+        self.fim = fim or predicado_conclusao(self.texto)
+        self.timeout = timeout or TIMEOUTS_PADRAO.get(_nome_comando(self.texto), 10)
+        self.ao_receber = ao_receber
+        self.conexao = None     # Future da conexão pendente que o comando aguarda
+        self.future = Future()
+        self.linhas = []
+        self.iniciado = False   # eco ">>> CMD:" já recebido
+        self.concluido = False
+
+
+# ===== CONTROLADOR ARDUINO GLOBAL =====
+# Gerencia conexão serial com Arduino
+class ArduinoController:
+    _instance = None
+    _lock = threading.Lock()
+    
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+    
+    def __init__(self):
+        if self._initialized:
+            return
+        self.transporte = None
+        self.porta = '/dev/ttyACM0'
+        self.baudrate = 115200
+        self.aguardando_qr = False
+        self.verboso = True  # imprime cada linha enviada/recebida
+
+        self._fila = queue.Queue()
+        self._cond = threading.Condition()
+        self._ativo = None  # ComandoArduino sendo executado
+        self.eventos = deque(maxlen=500)
+        self._seq = itertools.count(1)
+        self.telemetria = Telemetria()
+        self._despachante = threading.Thread(target=self._despachar, name="arduino-comandos", daemon=True)
+        self._despachante.start()
+
+        # Supervisor da conexão
+        self._manter_conectado = False
+        self._pedidos = []  # Futures de quem pediu conexão
+        self._conexao_pendente = None  # Future do último pedido de conexão
+        self._falhas = 0
+        self._proxima_tentativa = 0.0
+        self._supervisor = threading.Thread(target=self._supervisionar, name="arduino-conexao", daemon=True)
+        self._supervisor.start()
+        self._initialized = True
+
+    # ----- conexão -----
+
+    def _tentar_conectar(self):
+        """Abre a porta e espera o firmware ficar pronto. Roda no supervisor."""
+        if self.is_connected() and self.transporte.porta == self.porta:
+            return True
+        if self.transporte:
+            self.transporte.fechar()
+        transporte = SerialTransport(self.porta, self.baudrate)
+        transporte.adicionar_ouvinte(self._rotear)
+        try:
+            _, pronto = transporte.conectar(TIMEOUT_BANNER)
+            if not pronto:
+                raise TimeoutError(f"firmware não respondeu em {TIMEOUT_BANNER}s")
+        except Exception as e:
+            transporte.fechar()
+            log.warning("Erro conexão em %s: %s", self.porta, e)
+            return False
+        with self._cond:
+            self.transporte = transporte
+        log.info("Conectado em %s", self.porta)
+        return True
+
+    def _supervisionar(self):
+        """
+        Thread supervisora: atende pedidos de conexão e, enquanto a conexão
+        for desejada, reabre a porta quando ela cai, com backoff exponencial.
+        """
+        while True:
+            with self._cond:
+                while not self._pedidos:
+                    if self._manter_conectado and not self.is_connected():
+                        restante = self._proxima_tentativa - time.monotonic()
+                        if restante <= 0:
+                            break
+                        self._cond.wait(restante)
+                    else:
+                        self._cond.wait()
+                pedidos, self._pedidos = self._pedidos, []
+
+            conectado = self._tentar_conectar()
+            if conectado:
+                self._falhas = 0
+            else:
+                self._falhas += 1
+                espera = min(BACKOFF_MAXIMO, BACKOFF_INICIAL * 2 ** (self._falhas - 1))
+                self._proxima_tentativa = time.monotonic() + espera
+                if self._manter_conectado:
+                    log.info("Nova tentativa em %.1fs", espera)
+            for future in pedidos:
+                future.set_result(conectado)
+
+    def solicitar_conexao(self, porta=None):
+        """
+        Pede ao supervisor para conectar (e manter conectado) em ``porta``.
+        Retorna um Future resolvido com True/False após a tentativa.
+        """
+        future = Future()
+        with self._cond:
+            if porta:
+                self.porta = porta
+            self._manter_conectado = True
+            self._pedidos.append(future)
+            self._conexao_pendente = future
+            self._cond.notify_all()
+        return future
+
+    def conectar(self, porta=None):
+        """Conecta ao Arduino."""
+        return self.solicitar_conexao(porta).result()
+
+    async def conectar_async(self, porta=None):
+        """Versão assíncrona de conectar(): aguarda o supervisor sem prender uma thread."""
+        return await asyncio.wrap_future(self.solicitar_conexao(porta))
+    
+    def desconectar(self):
+        """Desconecta do Arduino (e desliga a reconexão automática)."""
+        with self._cond:
+            self._manter_conectado = False
+            transporte, self.transporte = self.transporte, None
+        if transporte:
+            transporte.fechar()
+
+    # ----- roteamento das linhas recebidas -----
+
+    def _atualizar_estado(self, linha):
+        if linha in ("READY_FOR_QR", "ESTADO:AGUARDANDO_QR"):
+            self.aguardando_qr = True
+        elif linha in ("OK", "PRONTO", "RESET_OK", "CICLO_INTERROMPIDO", "READY") or linha.startswith("ESTADO:"):
+            self.aguardando_qr = False
+
+    def _rotear(self, linha):
+        """Ouvinte do transporte: entrega a linha ao comando ativo ou aos eventos."""
+        with self._cond:
+            if linha is None:  # porta fechada
+                self._cond.notify_all()
+                return
+            if self.verboso:
+                log.info("← %s", linha)
+            ts = time.time()
+            self._atualizar_estado(linha)
+            self.telemetria.registrar(linha, ts)
+
+            cmd = self._ativo
+            if cmd is not None and not cmd.iniciado and linha == f">>> CMD: {cmd.texto}":
+                cmd.iniciado = True
+            pertence = cmd is not None and cmd.iniciado and not cmd.concluido
+
+            self.eventos.append({
+                "seq": next(self._seq),
+                "ts": ts,
+                "linha": linha,
+                "comando": cmd.texto if pertence else None,
+            })
+            if not pertence:
+                return
+
+            cmd.linhas.append(linha)
+            if cmd.fim(linha):
+                cmd.concluido = True
+                self._cond.notify_all()
+        if cmd.ao_receber:
+            try:
+                cmd.ao_receber(linha)
+            except Exception as e:
+                log.exception("Erro no callback de %s: %s", cmd.texto, e)
+
+    def eventos_desde(self, seq=0, limite=200):
+        """Linhas recebidas (solicitadas ou não) com número de sequência > ``seq``."""
+        with self._cond:
+            return [e for e in self.eventos if e["seq"] > seq][:limite]
+
+    def get_telemetria(self, desde=None, regiao=None, linhas=0):
+        """Durações das fases do ciclo (ver dashboard.telemetria)."""
+        return self.telemetria.resumo(desde=desde, regiao=regiao, linhas=linhas)
+
+    async def eventos_desde_async(self, seq=0, limite=200):
+        """Mesma interface do BrokerClient; aqui os eventos já estão na memória."""
+        return self.eventos_desde(seq, limite)
+
+    async def get_telemetria_async(self, desde=None, regiao=None, linhas=0):
+        """Versão assíncrona de get_telemetria(): o resumo roda numa thread."""
+        return await asyncio.to_thread(self.get_telemetria, desde, regiao, linhas)
+
+    # ----- fila de comandos -----
+
+    def _despachar(self):
+        """Thread despachante: executa um comando por vez, na ordem da fila."""
+        while True:
+            cmd = self._fila.get()
+            if not cmd.future.set_running_or_notify_cancel():
+                continue
+            try:
+                if cmd.conexao is not None:
+                    # Primeiro comando (ou depois de desconectar()): espera a tentativa
+                    # de conexão pedida antes dele, em vez de falhar na frente dela
+                    try:
+                        cmd.conexao.result(timeout=TIMEOUT_BANNER + 5)
+                    except Exception:
+                        pass
+                # Sem porta aberta o comando falha; quem reconecta é o supervisor
+                if not self.is_connected():
+                    raise ConnectionError("Não conectado")
+                with self._cond:
+                    self._ativo = cmd
+                if self.verboso:
+                    log.info("→ %s", cmd.texto)
+                self.transporte.escrever(cmd.texto)
+                with self._cond:
+                    self._cond.wait_for(
+                        lambda: cmd.concluido or not self.is_connected(), cmd.timeout
+                    )
+                    self._ativo = None
+                    cmd.future.set_result((list(cmd.linhas), cmd.concluido))
+            except Exception as e:
+                with self._cond:
+                    self._ativo = None
+                log.error("Erro: %s", e)
+                cmd.future.set_exception(e)
+
+    def submeter(self, comando, fim=None, timeout=None, ao_receber=None):
+        """
+        Enfileira um comando e retorna seu Future, resolvido com
+        (linhas, concluido) ou com a exceção da falha de envio.
+        """
+        conexao = None
+        if not self.is_connected():
+            with self._cond:
+                pendente = self._conexao_pendente
+            if not self._manter_conectado:
+                # Primeiro uso sem conectar(): abre a porta padrão em segundo plano
+                conexao = self.solicitar_conexao()
+            elif pendente is not None and not pendente.done():
+                conexao = pendente
+        cmd = ComandoArduino(comando, fim=fim, timeout=timeout, ao_receber=ao_receber)
+        # A espera pela conexão fica na thread despachante (com limite), não em
+        # quem chama: submeter() também é usado pelas views assíncronas
+        cmd.conexao = conexao
+        self._fila.put(cmd)
+        return cmd.future
+
+    def comandos_pendentes(self):
+        return self._fila.qsize() + (1 if self._ativo is not None else 0)
+    
+    def enviar_comando(self, comando, timeout=None, ao_receber=None):
+        """
+        Envia comando para Arduino. ``ao_receber(linha)`` é chamado a cada
+        linha da resposta, na thread leitora (usado pelos jobs).
+        """
+        try:
+            respostas, _ = self.submeter(comando, timeout=timeout, ao_receber=ao_receber).result()
+            return True, respostas
+        except ConnectionError as e:
+            return False, str(e)
+        except Exception as e:
+            log.error("Erro: %s", e)
+            return False, str(e)
+
+    async def enviar_comando_async(self, comando, timeout=None):
+        """
+        Versão assíncrona de enviar_comando(): aguarda o Future do comando
+        no event loop, sem prender uma thread.
+        """
+        try:
+            respostas, _ = await asyncio.wrap_future(self.submeter(comando, timeout=timeout))
+            return True, respostas
+        except ConnectionError as e:
+            return False, str(e)
+        except Exception as e:
+            log.error("Erro: %s", e)
+            return False, str(e)
+    
+    def enviar_regiao(self, regiao, ao_receber=None):
+        """Envia região para o Arduino processar."""
+        # Envia mesmo se não estiver no estado correto - o Arduino vai responder com erro se necessário
+        log.info("Enviando região: %s (aguardando_qr=%s)", regiao, self.aguardando_qr)
+        sucesso, resposta = self.enviar_comando(f"REGIAO:{regiao}", ao_receber=ao_receber)
+        if sucesso:
+            self.aguardando_qr = False  # Reseta flag após enviar
+        return sucesso, resposta
+
+    async def enviar_regiao_async(self, regiao):
+        """Versão assíncrona de enviar_regiao()."""
+        log.info("Enviando região: %s (aguardando_qr=%s)", regiao, self.aguardando_qr)
+        sucesso, resposta = await self.enviar_comando_async(f"REGIAO:{regiao}")
+        if sucesso:
+            self.aguardando_qr = False
+        return sucesso, resposta
+    
+    def is_connected(self):
+        """Verifica se está conectado."""
+        return self.transporte is not None and self.transporte.aberta
+    
+    def get_status(self):
+        """Retorna status da conexão."""
+        return {
+            "conectado": self.is_connected(),
+            "porta": self.porta,
+            "aguardando_qr": self.aguardando_qr,
+            "comandos_pendentes": self.comandos_pendentes(),
+            "reconectando": self._manter_conectado and not self.is_connected(),
+            "falhas_conexao": self._falhas
+        }
+
+    async def get_status_async(self):
+        """Mesma interface do BrokerClient; aqui o status já está na memória."""
+        return self.get_status()
@@ -0,0 +1,288 @@
+"""
+Broker serial: um único processo dono da porta do Arduino.
+
+O ``SerialBroker`` expõe o ``ArduinoController`` por um socket Unix local
+(``manage.py serial_broker``). Workers do Django e o
+``arduino/controle_integrado.py`` usam o ``BrokerClient``, que tem a mesma
+interface do controlador; assim o servidor web pode rodar com vários
+processos e os comandos continuam serializados na serial.
+
+Protocolo: uma requisição JSON por linha e uma resposta JSON por linha.
+    → {"op": "comando", "comando": "INICIAR", "timeout": 30}
+    ← {"sucesso": true, "resposta": [...], "status": {...}}
+
+Com ``"progresso": true`` (comando/regiao) o broker envia antes da resposta
+uma mensagem ``{"linha": "..."}`` por linha recebida do Arduino.
+
+Este módulo não importa o Django.
+"""
+import asyncio
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+from concurrent.futures import Future
+
+
+SOCKET_PADRAO = '/tmp/dashlog-serial.sock'
+
+# Folga entre o timeout do comando e o timeout do socket do cliente
+FOLGA_TIMEOUT = 5
+
+# Timeout do socket quando o comando usa o timeout padrão do controlador
+TIMEOUT_MAXIMO = 60
+
+_FIM = object()
+
+
+class _BrokerHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for linha in self.rfile:
+            linha = linha.strip()
+            if not linha:
+                continue
+            try:
+                req = json.loads(linha)
+                if req.get("progresso"):
+                    resposta = self._executar_com_progresso(req)
+                else:
+                    resposta = self.server.broker.executar(req)
+            except Exception as e:
+                resposta = {"sucesso": False, "erro": str(e)}
+            self._enviar(resposta)
+
+    def _enviar(self, mensagem):
+        self.wfile.write(json.dumps(mensagem).encode() + b"\n")
+        self.wfile.flush()
+
+    def _executar_com_progresso(self, req):
+        # O callback roda na thread leitora da serial, que não pode esperar
+        # pelo socket: as linhas passam por uma fila e esta thread as envia.
+        fila = queue.Queue()
+        resultado = {}
+
+        def executar():
+            try:
+                resultado.update(self.server.broker.executar(req, ao_receber=fila.put))
+            except Exception as e:
+                resultado.update({"sucesso": False, "erro": str(e)})
+            finally:
+                fila.put(_FIM)
+
+        threading.Thread(target=executar, daemon=True).start()
+        while True:
+            linha = fila.get()
+            if linha is _FIM:
+                return resultado
+            self._enviar({"linha": linha})
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class SerialBroker:
+    """Atende requisições RPC e as executa no controlador serial."""
+
+    def __init__(self, controlador, caminho=SOCKET_PADRAO):
+        self.controlador = controlador
+        self.caminho = caminho
+        self._server = None
+
+    def executar(self, req, ao_receber=None):
+        """
+        Executa uma requisição decodificada e retorna o dicionário de resposta.
+        ``ao_receber(linha)`` recebe as linhas de comando/regiao.
+        """
+        op = req.get("op")
+        ctrl = self.controlador
+
+        if op == "comando":
+            comando = req.get("comando", "")
+            if not comando:
+                return {"sucesso": False, "erro": "Comando não fornecido", "status": ctrl.get_status()}
+            sucesso, resposta = ctrl.enviar_comando(
+                comando, timeout=req.get("timeout"), ao_receber=ao_receber
+            )
+        elif op == "regiao":
+            sucesso, resposta = ctrl.enviar_regiao(req.get("regiao", ""), ao_receber=ao_receber)
+        elif op == "conectar":
+            sucesso, resposta = ctrl.conectar(req.get("porta")), None
+        elif op == "solicitar_conexao":
+            # Não espera a tentativa: o supervisor do broker conecta e mantém
+            ctrl.solicitar_conexao(req.get("porta"))
+            sucesso, resposta = True, None
+        elif op == "desconectar":
+            ctrl.desconectar()
+            sucesso, resposta = True, None
+        elif op == "status":
+            sucesso, resposta = True, None
+        elif op == "eventos":
+            sucesso, resposta = True, ctrl.eventos_desde(req.get("seq", 0), req.get("limite", 200))
+        elif op == "telemetria":
+            sucesso, resposta = True, ctrl.get_telemetria(
+                req.get("desde"), req.get("regiao"), req.get("linhas", 0)
+            )
+        else:
+            return {"sucesso": False, "erro": f"Operação desconhecida: {op}"}
+
+        return {"sucesso": sucesso, "resposta": resposta, "status": ctrl.get_status()}
+
+    def iniciar(self):
+        """Abre o socket (removendo um socket órfão) e atende até ser parado."""
+        if os.path.exists(self.caminho):
+            os.unlink(self.caminho)
+        self._server = _UnixServer(self.caminho, _BrokerHandler)
+        self._server.broker = self
+        os.chmod(self.caminho, 0o660)
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.caminho):
+                os.unlink(self.caminho)
+
+    def parar(self):
+        if self._server:
+            self._server.shutdown()
+
+
+class BrokerClient:
+    """
+    Cliente do broker com a mesma interface do ArduinoController
+    (conectar, enviar_comando, enviar_regiao, get_status, ... e as versões
+    ``_async``). Cada chamada abre uma conexão curta no socket Unix.
+    """
+
+    def __init__(self, caminho=SOCKET_PADRAO):
+        self.caminho = caminho
+        self.aguardando_qr = False
+        self._ultimo_status = {}
+
+    # ----- transporte -----
+
+    def _atualizar(self, resposta):
+        status = resposta.get("status")
+        if status:
+            self._ultimo_status = status
+            self.aguardando_qr = status.get("aguardando_qr", False)
+        return resposta
+
+    def _erro(self, e):
+        return {"sucesso": False, "resposta": f"Broker serial indisponível: {e}"}
+
+    def _chamar(self, req, timeout=None, ao_receber=None):
+        """
+        Envia ``req`` e retorna a resposta. Com ``ao_receber`` pede as linhas
+        de progresso ao broker e as repassa à medida que chegam.
+        """
+        if ao_receber:
+            req = dict(req, progresso=True)
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout((timeout or TIMEOUT_MAXIMO) + FOLGA_TIMEOUT)
+                sock.connect(self.caminho)
+                sock.sendall(json.dumps(req).encode() + b"\n")
+                with sock.makefile("rb") as arquivo:
+                    while True:
+                        linha = arquivo.readline()
+                        if not linha:
+                            raise ConnectionError("conexão fechada pelo broker")
+                        mensagem = json.loads(linha)
+                        if "linha" not in mensagem:
+                            return self._atualizar(mensagem)
+                        if ao_receber:
+                            ao_receber(mensagem["linha"])
+        except (OSError, ValueError) as e:
+            return self._erro(e)
+
+    async def _chamar_async(self, req, timeout=None):
+        try:
+            reader, writer = await asyncio.open_unix_connection(self.caminho)
+            try:
+                writer.write(json.dumps(req).encode() + b"\n")
+                await writer.drain()
+                linha = await asyncio.wait_for(
+                    reader.readline(), (timeout or TIMEOUT_MAXIMO) + FOLGA_TIMEOUT
+                )
+            finally:
+                writer.close()
+            if not linha:
+                raise ConnectionError("conexão fechada pelo broker")
+            return self._atualizar(json.loads(linha))
+        except (OSError, ValueError, asyncio.TimeoutError) as e:
+            return self._erro(e)
+
+    # ----- interface do controlador -----
+
+    def conectar(self, porta=None):
+        return self._chamar({"op": "conectar", "porta": porta})["sucesso"]
+
+    async def conectar_async(self, porta=None):
+        return (await self._chamar_async({"op": "conectar", "porta": porta}))["sucesso"]
+
+    def solicitar_conexao(self, porta=None):
+        """
+        Pede ao broker para conectar (e manter conectado) sem esperar a
+        tentativa. O Future indica só se o broker aceitou o pedido.
+        """
+        future = Future()
+        future.set_result(self._chamar({"op": "solicitar_conexao", "porta": porta})["sucesso"])
+        return future
+
+    def desconectar(self):
+        self._chamar({"op": "desconectar"})
+
+    def enviar_comando(self, comando, timeout=None, ao_receber=None):
+        r = self._chamar({"op": "comando", "comando": comando, "timeout": timeout}, timeout, ao_receber)
+        return r["sucesso"], r.get("resposta", r.get("erro"))
+
+    async def enviar_comando_async(self, comando, timeout=None):
+        r = await self._chamar_async({"op": "comando", "comando": comando, "timeout": timeout}, timeout)
+        return r["sucesso"], r.get("resposta", r.get("erro"))
+
+    def enviar_regiao(self, regiao, ao_receber=None):
+        r = self._chamar({"op": "regiao", "regiao": regiao}, ao_receber=ao_receber)
+        return r["sucesso"], r.get("resposta", r.get("erro"))
+
+    async def enviar_regiao_async(self, regiao):
+        r = await self._chamar_async({"op": "regiao", "regiao": regiao})
+        return r["sucesso"], r.get("resposta", r.get("erro"))
+
+    def eventos_desde(self, seq=0, limite=200):
+        r = self._chamar({"op": "eventos", "seq": seq, "limite": limite})
+        return r.get("resposta") if r["sucesso"] else []
+
+    async def eventos_desde_async(self, seq=0, limite=200):
+        r = await self._chamar_async({"op": "eventos", "seq": seq, "limite": limite})
+        return r.get("resposta") if r["sucesso"] else []
+
+    def get_telemetria(self, desde=None, regiao=None, linhas=0):
+        r = self._chamar({"op": "telemetria", "desde": desde, "regiao": regiao, "linhas": linhas})
+        if not r["sucesso"]:
+            return {"erro": r.get("resposta")}
+        return r["resposta"]
+
+    async def get_telemetria_async(self, desde=None, regiao=None, linhas=0):
+        r = await self._chamar_async({"op": "telemetria", "desde": desde, "regiao": regiao, "linhas": linhas})
+        if not r["sucesso"]:
+            return {"erro": r.get("resposta")}
+        return r["resposta"]
+
+    def is_connected(self):
+        return self.get_status().get("conectado", False)
+
+    def _status(self, r):
+        status = dict(r.get("status") or {"conectado": False, "porta": None, "aguardando_qr": False})
+        status["broker"] = self.caminho
+        if not r["sucesso"]:
+            status["erro"] = r.get("resposta")
+        return status
+
+    def get_status(self):
+        return self._status(self._chamar({"op": "status"}))
+
+    async def get_status_async(self):
+        return self._status(await self._chamar_async({"op": "status"}))
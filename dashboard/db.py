@@ -0,0 +1,20 @@
+"""
+Ajustes de conexão do banco de dados.
+"""
+from django.conf import settings
+
+
+def aplicar_pragmas_sqlite(sender, connection, **kwargs):
+    """
+    Receiver de ``connection_created``: aplica ``settings.SQLITE_PRAGMAS``
+    em cada nova conexão SQLite. Sem perfil ativo o dicionário é vazio e
+    a conexão fica com a configuração padrão.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', None)
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for nome, valor in pragmas.items():
+            cursor.execute(f'PRAGMA {nome} = {valor}')
@@ -0,0 +1,257 @@
+"""
+Etiquetas QR (``regiao:nome``) renderizadas pelo próprio dashboard.
+
+É a etiqueta do ``arduino/gerar_qrcodes.py`` (QR nível H, zona de silêncio de
+4 módulos, legenda embaixo), mas desenhada com o ``cv2.QRCodeEncoder``, que
+já é dependência do projeto; o cv2 só é importado na primeira etiqueta.
+
+Os bytes renderizados ficam num cache LRU limitado em bytes
+(``settings.ETIQUETAS_CACHE_BYTES``), pela chave formato + conteúdo + opções.
+O ETag é o hash dos bytes, então é forte e igual em todos os workers. A
+folha SVG reaproveita o mesmo cache: cada etiqueta distinta vira um
+``<symbol>`` desenhado uma vez, e as cópias são ``<use>``.
+"""
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+
+
+# Muda quando o desenho muda (entra na chave do cache e no ETag da folha)
+VERSAO_LAYOUT = 1
+
+ZONA_SILENCIO = 4  # módulos
+
+# A4 em mm (mesma folha do gerar_qrcodes.py)
+LARGURA_FOLHA_MM = 210
+
+
+class CacheLRU:
+    """Cache LRU de bytes limitado pelo total de bytes guardados."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._itens = OrderedDict()  # chave → (dados, etag)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, chave, gerar):
+        """Retorna (dados, etag); chama ``gerar()`` só se a chave não estiver no cache."""
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is not None:
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+                return item
+            self.falhas += 1
+
+        # Renderiza fora do lock; duas threads podem gerar a mesma chave, o
+        # resultado é idêntico
+        dados = gerar()
+        item = (dados, '"%s"' % hashlib.sha256(dados).hexdigest()[:32])
+        if len(dados) > self.max_bytes:
+            return item
+        with self._lock:
+            anterior = self._itens.pop(chave, None)
+            if anterior is not None:
+                self._bytes -= len(anterior[0])
+            self._itens[chave] = item
+            self._bytes += len(dados)
+            while self._bytes > self.max_bytes:
+                _, (removido, _) = self._itens.popitem(last=False)
+                self._bytes -= len(removido)
+        return item
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "itens": len(self._itens),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+            }
+
+
+cache = CacheLRU(settings.ETIQUETAS_CACHE_BYTES)
+
+_codificador = None
+_lock_codificador = threading.Lock()
+
+
+def matriz(conteudo):
+    """Módulos do QR (array bool, True = escuro), sem zona de silêncio."""
+    global _codificador
+    import cv2
+    import numpy as np
+
+    with _lock_codificador:
+        if _codificador is None:
+            parametros = cv2.QRCodeEncoder_Params()
+            parametros.correction_level = cv2.QRCodeEncoder_CORRECT_LEVEL_H
+            _codificador = cv2.QRCodeEncoder.create(parametros)
+        imagem = _codificador.encode(conteudo)
+    escuros = imagem == 0
+    # O encoder devolve uma borda própria; recorta pelos padrões de posição
+    linhas = np.flatnonzero(escuros.any(axis=1))
+    colunas = np.flatnonzero(escuros.any(axis=0))
+    return escuros[linhas[0]:linhas[-1] + 1, colunas[0]:colunas[-1] + 1]
+
+
+def _caminho_svg(modulos):
+    """Path SVG dos módulos escuros, uma sequência horizontal por comando."""
+    partes = []
+    for y, linha in enumerate(modulos):
+        x = 0
+        largura = len(linha)
+        while x < largura:
+            if not linha[x]:
+                x += 1
+                continue
+            inicio = x
+            while x < largura and linha[x]:
+                x += 1
+            partes.append(f"M{inicio + ZONA_SILENCIO} {y + ZONA_SILENCIO}h{x - inicio}v1h-{x - inicio}z")
+    return "".join(partes)
+
+
+def _altura_legenda(lado):
+    return lado / 6
+
+
+def _simbolo_svg(conteudo, legenda):
+    """
+    Etiqueta em unidades de módulo: retorna (largura, altura, conteúdo SVG)
+    para caber num ``<svg>`` ou ``<symbol>`` com o viewBox correspondente.
+    """
+    modulos = matriz(conteudo)
+    lado = len(modulos) + 2 * ZONA_SILENCIO
+    altura = lado
+    corpo = [f'<rect width="{lado}" height="{lado}" fill="#fff"/>',
+             f'<path d="{_caminho_svg(modulos)}" fill="#000"/>']
+    if legenda:
+        texto = _altura_legenda(lado)
+        altura = lado + texto
+        corpo[0] = f'<rect width="{lado}" height="{altura:g}" fill="#fff"/>'
+        corpo.append(
+            f'<text x="{lado / 2:g}" y="{lado + texto * 0.7:g}" font-size="{texto * 0.6:g}" '
+            f'font-family="sans-serif" text-anchor="middle">{escape(conteudo)}</text>'
+        )
+    return lado, altura, "".join(corpo)
+
+
+def _renderizar_svg(conteudo, tamanho_mm, legenda):
+    lado, altura, corpo = _simbolo_svg(conteudo, legenda)
+    escala = tamanho_mm / lado
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{tamanho_mm:g}mm" '
+        f'height="{altura * escala:g}mm" viewBox="0 0 {lado} {altura:g}" shape-rendering="crispEdges">'
+        f'{corpo}</svg>\n'
+    ).encode('utf-8')
+
+
+def _renderizar_png(conteudo, modulo, legenda):
+    import cv2
+    import numpy as np
+
+    modulos = matriz(conteudo)
+    qr = np.pad(np.where(modulos, 0, 255).astype(np.uint8), ZONA_SILENCIO, constant_values=255)
+    # Escala inteira: todos os módulos com a mesma largura em pixels
+    imagem = np.repeat(np.repeat(qr, modulo, axis=0), modulo, axis=1)
+    if legenda:
+        lado = imagem.shape[1]
+        altura_texto = max(int(_altura_legenda(lado)), 12)
+        faixa = np.full((altura_texto, lado), 255, np.uint8)
+        # Fontes Hershey só têm ASCII: "São Paulo" vira "Sao Paulo" na legenda
+        texto = unicodedata.normalize('NFKD', conteudo).encode('ascii', 'ignore').decode('ascii')
+        fonte = cv2.FONT_HERSHEY_SIMPLEX
+        (largura, altura), _ = cv2.getTextSize(texto, fonte, 1.0, 1)
+        escala = min(altura_texto * 0.6 / max(altura, 1), lado * 0.95 / max(largura, 1))
+        espessura = max(1, int(escala * 1.5))
+        (largura, altura), _ = cv2.getTextSize(texto, fonte, escala, espessura)
+        cv2.putText(faixa, texto, ((lado - largura) // 2, (altura_texto + altura) // 2),
+                    fonte, escala, 0, espessura, cv2.LINE_AA)
+        # Etiqueta em 1 bit, como as do gerar_qrcodes.py
+        imagem = np.vstack([imagem, np.where(faixa < 128, 0, 255).astype(np.uint8)])
+    ok, png = cv2.imencode('.png', imagem, [cv2.IMWRITE_PNG_BILEVEL, 1])
+    if not ok:
+        raise RuntimeError(f"Falha ao codificar a etiqueta {conteudo!r}")
+    return png.tobytes()
+
+
+def etiqueta(conteudo, formato, modulo=8, tamanho_mm=30, legenda=True):
+    """
+    Etiqueta de ``conteudo`` em 'png' (``modulo`` px por módulo) ou 'svg'
+    (``tamanho_mm`` de largura). Retorna (bytes, etag), do cache quando possível.
+    """
+    if formato == 'png':
+        chave = ('png', VERSAO_LAYOUT, conteudo, modulo, legenda)
+        return cache.obter(chave, lambda: _renderizar_png(conteudo, modulo, legenda))
+    if formato == 'svg':
+        chave = ('svg', VERSAO_LAYOUT, conteudo, tamanho_mm, legenda)
+        return cache.obter(chave, lambda: _renderizar_svg(conteudo, tamanho_mm, legenda))
+    raise ValueError(f"Formato inválido: {formato}")
+
+
+# ----- folha -----
+
+def grade_folha(quantidade, tamanho_mm=30, margem_mm=10, espaco_mm=4, legenda=True):
+    """(colunas, linhas, altura da etiqueta em mm, altura da folha em mm)."""
+    altura_etiqueta = tamanho_mm + (_altura_legenda(tamanho_mm) if legenda else 0)
+    colunas = int((LARGURA_FOLHA_MM - 2 * margem_mm + espaco_mm) // (tamanho_mm + espaco_mm))
+    if colunas < 1:
+        raise ValueError("Etiqueta maior que a largura da folha")
+    linhas = -(-quantidade // colunas)
+    altura = 2 * margem_mm + linhas * (altura_etiqueta + espaco_mm) - (espaco_mm if linhas else 0)
+    return colunas, linhas, altura_etiqueta, altura
+
+
+def etag_folha(conteudos, **opcoes):
+    """ETag da folha, calculado sem renderizar (a folha é função das entradas)."""
+    h = hashlib.sha256(repr((VERSAO_LAYOUT, sorted(opcoes.items()))).encode('utf-8'))
+    for conteudo in conteudos:
+        h.update(conteudo.encode('utf-8') + b'\0')
+    return 'W/"%s"' % h.hexdigest()[:32]
+
+
+def folha_svg(conteudos, tamanho_mm=30, margem_mm=10, espaco_mm=4, legenda=True):
+    """
+    Gera a folha SVG em pedaços (para StreamingHttpResponse): largura A4,
+    altura conforme o número de etiquetas. Cada conteúdo distinto é desenhado
+    uma vez (``<symbol>``, via cache); as cópias são ``<use>``.
+    """
+    colunas, _, altura_etiqueta, altura = grade_folha(len(conteudos), tamanho_mm, margem_mm, espaco_mm, legenda)
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+        f'width="{LARGURA_FOLHA_MM}mm" height="{altura:g}mm" '
+        f'viewBox="0 0 {LARGURA_FOLHA_MM} {altura:g}" shape-rendering="crispEdges">\n'
+    ).encode('utf-8')
+
+    simbolos = {}
+    for i, conteudo in enumerate(conteudos):
+        pedacos = []
+        if conteudo not in simbolos:
+            simbolos[conteudo] = f"e{len(simbolos)}"
+            # No cache fica o símbolo sem o id (que depende da folha)
+            simbolo, _ = cache.obter(
+                ('simbolo', VERSAO_LAYOUT, conteudo, legenda),
+                lambda: 'viewBox="0 0 {0} {1:g}">{2}</symbol>'
+                .format(*_simbolo_svg(conteudo, legenda)).encode('utf-8'),
+            )
+            pedacos.append(f'<symbol id="{simbolos[conteudo]}" {simbolo.decode("utf-8")}')
+        linha, coluna = divmod(i, colunas)
+        x = margem_mm + coluna * (tamanho_mm + espaco_mm)
+        y = margem_mm + linha * (altura_etiqueta + espaco_mm)
+        pedacos.append(
+            f'<use xlink:href="#{simbolos[conteudo]}" href="#{simbolos[conteudo]}" '
+            f'x="{x:g}" y="{y:g}" width="{tamanho_mm:g}" height="{altura_etiqueta:g}"/>\n'
+        )
+        yield "".join(pedacos).encode('utf-8')
+    yield b'</svg>\n'
@@ -0,0 +1,172 @@
+"""
+Gravação write-behind de pacotes.
+
+Com DASHLOG_WRITE_BEHIND=1 o receber_pacote_arduino só valida a requisição,
+enfileira o pacote aqui e responde 202. Uma única thread grava a fila em
+micro-lotes (a cada PACOTES_WRITE_BEHIND_INTERVALO_MS ou a cada
+PACOTES_WRITE_BEHIND_LOTE pacotes), cada lote numa transação só, na ordem de
+chegada. Na saída do processo a fila é esvaziada antes de encerrar.
+
+Os pacotes já foram confirmados ao cliente, então um lote que falha
+TENTATIVAS vezes não é descartado: vai para o arquivo de falhas
+(PACOTES_WRITE_BEHIND_FALHAS, um JSON por linha), contado em ``falhas()`` e
+em /api/saude/?detalhes=1, e volta para a fila na próxima partida do
+gravador.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Pacote
+from .resumo import registrar_pacotes
+
+
+log = logging.getLogger("dashlog.gravador")
+
+
+_PARAR = object()
+
+TENTATIVAS = 3
+
+
+class GravadorPacotes:
+    def __init__(self, max_lote=200, intervalo=0.005, arquivo_falhas=None):
+        self.max_lote = max_lote
+        self.intervalo = intervalo
+        self.arquivo_falhas = arquivo_falhas
+        self._fila = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def iniciar(self):
+        """Sobe a thread gravadora (uma vez) e registra o flush na saída."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name="gravador-pacotes", daemon=True)
+            self._thread.start()
+            atexit.register(self.parar)
+            self._retomar_falhas()
+
+    def enfileirar(self, codigo, nome, regiao, criado_em, estacao=""):
+        """Coloca um pacote na fila de gravação."""
+        self.iniciar()
+        self._fila.put({
+            "codigo": codigo, "nome": nome, "regiao": regiao, "criado_em": criado_em, "estacao": estacao,
+        })
+
+    def pendentes(self):
+        return self._fila.qsize()
+
+    def falhas(self):
+        """Pacotes no arquivo de falhas, à espera da próxima partida."""
+        if not self.arquivo_falhas:
+            return 0
+        try:
+            with open(self.arquivo_falhas, encoding="utf-8") as f:
+                return sum(1 for linha in f if linha.strip())
+        except FileNotFoundError:
+            return 0
+
+    def _guardar_falhas(self, lote):
+        if not self.arquivo_falhas:
+            log.error("Lote perdido (sem arquivo de falhas): %s", [p["codigo"] for p in lote])
+            return
+        with open(self.arquivo_falhas, "a", encoding="utf-8") as f:
+            for p in lote:
+                f.write(json.dumps(dict(p, criado_em=p["criado_em"].isoformat())) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        log.error("Lote de %d guardado em %s", len(lote), self.arquivo_falhas)
+
+    def _retomar_falhas(self):
+        """Reenfileira os pacotes do arquivo de falhas (o primeiro processo a renomeá-lo fica com ele)."""
+        if not self.arquivo_falhas or not os.path.exists(self.arquivo_falhas):
+            return
+        retomado = f"{self.arquivo_falhas}.{os.getpid()}"
+        try:
+            os.replace(self.arquivo_falhas, retomado)
+        except FileNotFoundError:
+            return
+        with open(retomado, encoding="utf-8") as f:
+            pacotes = [json.loads(linha) for linha in f if linha.strip()]
+        for p in pacotes:
+            p["criado_em"] = datetime.fromisoformat(p["criado_em"])
+            self._fila.put(p)
+        os.remove(retomado)
+        log.warning("%d pacote(s) do arquivo de falhas de volta à fila", len(pacotes))
+
+    def parar(self, timeout=30):
+        """Grava tudo que está na fila e encerra a thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._fila.put(_PARAR)
+        thread.join(timeout=timeout)
+
+    def _loop(self):
+        parar = False
+        while not parar:
+            item = self._fila.get()
+            if item is _PARAR:
+                break
+            lote = [item]
+            prazo = time.monotonic() + self.intervalo
+            while len(lote) < self.max_lote:
+                restante = prazo - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    item = self._fila.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if item is _PARAR:
+                    parar = True
+                    break
+                lote.append(item)
+            self._gravar_com_retentativa(lote)
+        connection.close()
+
+    def _gravar_com_retentativa(self, lote):
+        for tentativa in range(1, TENTATIVAS + 1):
+            try:
+                self._gravar(lote)
+                return
+            except Exception as e:
+                log.warning("Erro ao gravar lote de %d (tentativa %d): %s", len(lote), tentativa, e)
+                connection.close()
+                time.sleep(0.05 * tentativa)
+        self._guardar_falhas(lote)
+
+    def _gravar(self, lote):
+        """Mesma semântica do get_or_create por código, para o lote inteiro."""
+        with transaction.atomic():
+            vistos = set(
+                Pacote.objects.filter(codigo__in=[p["codigo"] for p in lote])
+                .values_list("codigo", flat=True)
+            )
+            novos = []
+            for p in lote:
+                if p["codigo"] in vistos:
+                    continue
+                vistos.add(p["codigo"])
+                novos.append(Pacote(**p))
+            if novos:
+                Pacote.objects.bulk_create(novos)
+                registrar_pacotes(novos)
+
+
+gravador = GravadorPacotes(
+    max_lote=settings.PACOTES_WRITE_BEHIND_LOTE,
+    intervalo=settings.PACOTES_WRITE_BEHIND_INTERVALO_MS / 1000,
+    arquivo_falhas=settings.PACOTES_WRITE_BEHIND_FALHAS,
+)
@@ -0,0 +1,354 @@
+"""
+Jobs assíncronos para operações longas do Arduino.
+
+``/api/arduino/iniciar/``, ``/api/arduino/regiao/`` e ``/api/arduino/upload/``
+criam um ``Job`` e respondem 202 com o id na hora. O trabalho roda num pool de
+threads de tamanho fixo (ARDUINO_JOBS_WORKERS) e o cliente acompanha por
+``/api/arduino/jobs/<id>/`` (estado e resultado) ou pelo fluxo SSE
+``/api/arduino/jobs/<id>/eventos/`` (linhas de progresso à medida que chegam).
+
+A fila de jobs também é limitada (ARDUINO_JOBS_MAX_PENDENTES): acima disso
+``submeter`` lança ``FilaCheia`` e a view responde 503.
+
+Com vários workers (broker serial) o job roda no processo que o criou, mas o
+status e o SSE podem cair em outro. Por isso, com ARDUINO_JOBS_DB definido,
+cada job é espelhado num arquivo SQLite compartilhado (estado, resultado e
+progresso) e ``obter`` devolve um ``JobRemoto`` que lê de lá quando o job não
+é deste processo. Job de um worker que morreu aparece como ``erro``.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+
+log = logging.getLogger("dashlog.jobs")
+
+
+PENDENTE = "pendente"
+EXECUTANDO = "executando"
+CONCLUIDO = "concluido"
+ERRO = "erro"
+
+# Linhas de progresso guardadas por job
+LIMITE_PROGRESSO = 500
+
+
+# Espera entre consultas ao arquivo para jobs de outro processo (segundos)
+INTERVALO_CONSULTA = 0.2
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id           TEXT PRIMARY KEY,
+    tipo         TEXT NOT NULL,
+    parametros   TEXT,
+    estado       TEXT NOT NULL,
+    criado_em    REAL NOT NULL,
+    iniciado_em  REAL,
+    concluido_em REAL,
+    resultado    TEXT,
+    erro         TEXT,
+    pid          INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS progresso (
+    job_id TEXT NOT NULL,
+    seq    INTEGER NOT NULL,
+    ts     REAL NOT NULL,
+    linha  TEXT,
+    PRIMARY KEY (job_id, seq)
+);
+"""
+
+
+class FilaCheia(Exception):
+    pass
+
+
+def _processo_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ArmazemJobs:
+    """Cópia dos jobs num arquivo SQLite (modo WAL) lido por todos os workers."""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None, timeout=5)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_ESQUEMA)
+
+    def salvar(self, job):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO jobs "
+                "(id, tipo, parametros, estado, criado_em, iniciado_em, concluido_em, resultado, erro, pid) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.id, job.tipo, json.dumps(job.parametros, default=str), job.estado, job.criado_em,
+                 job.iniciado_em, job.concluido_em, json.dumps(job.resultado, default=str), job.erro,
+                 os.getpid()),
+            )
+
+    def acrescentar_progresso(self, job_id, item):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO progresso (job_id, seq, ts, linha) VALUES (?, ?, ?, ?)",
+                (job_id, item["seq"], item["ts"], item["linha"]),
+            )
+            # Mesmo limite da memória: só as últimas LIMITE_PROGRESSO linhas
+            if item["seq"] > LIMITE_PROGRESSO:
+                self._db.execute(
+                    "DELETE FROM progresso WHERE job_id = ? AND seq <= ?",
+                    (job_id, item["seq"] - LIMITE_PROGRESSO),
+                )
+
+    def carregar(self, job_id):
+        with self._lock:
+            linha = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(linha) if linha else None
+
+    def progresso_desde(self, job_id, seq=0):
+        with self._lock:
+            linhas = self._db.execute(
+                "SELECT seq, ts, linha FROM progresso WHERE job_id = ? AND seq > ? ORDER BY seq",
+                (job_id, seq),
+            ).fetchall()
+        return [dict(linha) for linha in linhas]
+
+    def descartar(self, ids):
+        with self._lock:
+            for job_id in ids:
+                self._db.execute("DELETE FROM progresso WHERE job_id = ?", (job_id,))
+                self._db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+
+class Job:
+    """Estado, resultado e linhas de progresso de uma operação."""
+
+    # Jobs deste processo avisam os ouvintes; não há o que consultar
+    intervalo_consulta = None
+
+    def __init__(self, tipo, parametros=None, armazem=None):
+        self.id = uuid.uuid4().hex
+        self.tipo = tipo
+        self.parametros = parametros or {}
+        self.estado = PENDENTE
+        self.criado_em = time.time()
+        self.iniciado_em = None
+        self.concluido_em = None
+        self.resultado = None
+        self.erro = None
+        self._progresso = deque(maxlen=LIMITE_PROGRESSO)
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._ouvintes = []
+        self._armazem = armazem
+
+    @property
+    def terminado(self):
+        return self.estado in (CONCLUIDO, ERRO)
+
+    def _notificar(self):
+        for ouvinte in list(self._ouvintes):
+            try:
+                ouvinte()
+            except Exception as e:
+                log.exception("Erro no ouvinte do job %s: %s", self.id, e)
+
+    def _persistir(self, progresso=None):
+        if self._armazem is None:
+            return
+        try:
+            if progresso is not None:
+                self._armazem.acrescentar_progresso(self.id, progresso)
+            else:
+                self._armazem.salvar(self)
+        except sqlite3.Error as e:
+            log.error("Falha ao gravar o job %s em %s: %s", self.id, self._armazem.caminho, e)
+
+    def progresso(self, linha):
+        """Registra uma linha de progresso (chamado pela thread que executa o job)."""
+        with self._lock:
+            self._seq += 1
+            item = {"seq": self._seq, "ts": time.time(), "linha": linha}
+            self._progresso.append(item)
+        self._persistir(item)
+        self._notificar()
+
+    def progresso_desde(self, seq=0):
+        with self._lock:
+            return [p for p in self._progresso if p["seq"] > seq]
+
+    def adicionar_ouvinte(self, ouvinte):
+        """``ouvinte()`` é chamado a cada progresso e no fim; deve ser rápido."""
+        self._ouvintes.append(ouvinte)
+
+    def remover_ouvinte(self, ouvinte):
+        if ouvinte in self._ouvintes:
+            self._ouvintes.remove(ouvinte)
+
+    def _executar(self, funcao):
+        self.estado = EXECUTANDO
+        self.iniciado_em = time.time()
+        self._persistir()
+        try:
+            self.resultado = funcao(self)
+            self.estado = CONCLUIDO
+        except Exception as e:
+            log.exception("Job %s %s falhou: %s", self.tipo, self.id, e)
+            self.erro = str(e)
+            self.estado = ERRO
+        finally:
+            self.concluido_em = time.time()
+            self._persistir()
+            self._notificar()
+
+    def como_dict(self, progresso_apos=None):
+        dados = {
+            "job_id": self.id,
+            "tipo": self.tipo,
+            "parametros": self.parametros,
+            "estado": self.estado,
+            "criado_em": self.criado_em,
+            "iniciado_em": self.iniciado_em,
+            "concluido_em": self.concluido_em,
+            "resultado": self.resultado,
+            "erro": self.erro,
+        }
+        if progresso_apos is not None:
+            dados["progresso"] = self.progresso_desde(progresso_apos)
+        return dados
+
+
+class JobRemoto:
+    """
+    Job criado por outro worker, lido do ArmazemJobs a cada acesso. Mesma
+    interface de leitura do Job; sem ouvintes, quem acompanha consulta a cada
+    ``intervalo_consulta`` segundos.
+    """
+
+    intervalo_consulta = INTERVALO_CONSULTA
+
+    def __init__(self, armazem, dados):
+        self._armazem = armazem
+        self.id = dados["id"]
+        self.tipo = dados["tipo"]
+        self.parametros = json.loads(dados["parametros"] or "{}")
+
+    def _dados(self):
+        dados = self._armazem.carregar(self.id)
+        if dados is None:
+            raise KeyError(self.id)
+        if dados["estado"] in (PENDENTE, EXECUTANDO) and not _processo_vivo(dados["pid"]):
+            dados["estado"] = ERRO
+            dados["erro"] = f"Worker {dados['pid']} encerrado antes do fim do job"
+        return dados
+
+    @property
+    def estado(self):
+        return self._dados()["estado"]
+
+    @property
+    def terminado(self):
+        return self.estado in (CONCLUIDO, ERRO)
+
+    def progresso_desde(self, seq=0):
+        return self._armazem.progresso_desde(self.id, seq)
+
+    def adicionar_ouvinte(self, ouvinte):
+        pass
+
+    def remover_ouvinte(self, ouvinte):
+        pass
+
+    def como_dict(self, progresso_apos=None):
+        d = self._dados()
+        dados = {
+            "job_id": self.id,
+            "tipo": self.tipo,
+            "parametros": self.parametros,
+            "estado": d["estado"],
+            "criado_em": d["criado_em"],
+            "iniciado_em": d["iniciado_em"],
+            "concluido_em": d["concluido_em"],
+            "resultado": json.loads(d["resultado"]) if d["resultado"] else None,
+            "erro": d["erro"],
+        }
+        if progresso_apos is not None:
+            dados["progresso"] = self.progresso_desde(progresso_apos)
+        return dados
+
+
+class GerenciadorJobs:
+    def __init__(self, max_workers=2, max_pendentes=20, retencao=200, arquivo=None):
+        self.max_pendentes = max_pendentes
+        self.retencao = retencao
+        self._armazem = ArmazemJobs(arquivo) if arquivo else None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="arduino-job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submeter(self, tipo, funcao, parametros=None):
+        """
+        Cria um job que executa ``funcao(job)`` no pool; o retorno vira o
+        resultado do job. Lança FilaCheia se houver jobs demais esperando.
+        """
+        job = Job(tipo, parametros, self._armazem)
+        with self._lock:
+            if self.pendentes() >= self.max_pendentes:
+                raise FilaCheia(f"{self.max_pendentes} jobs aguardando execução")
+            self._jobs[job.id] = job
+            self._descartar_antigos()
+        job._persistir()
+        self._executor.submit(job._executar, funcao)
+        return job
+
+    def obter(self, job_id):
+        """Job deste processo ou, com o armazém, um JobRemoto; None se não existe."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None or self._armazem is None:
+            return job
+        try:
+            dados = self._armazem.carregar(job_id)
+        except sqlite3.Error as e:
+            log.error("Falha ao ler o job %s de %s: %s", job_id, self._armazem.caminho, e)
+            return None
+        return JobRemoto(self._armazem, dados) if dados else None
+
+    def pendentes(self):
+        return sum(1 for j in list(self._jobs.values()) if not j.terminado)
+
+    def _descartar_antigos(self):
+        # Só jobs terminados saem, dos mais antigos para os mais novos
+        excesso = len(self._jobs) - self.retencao
+        antigos = [i for i, j in self._jobs.items() if j.terminado][:max(excesso, 0)]
+        for job_id in antigos:
+            del self._jobs[job_id]
+        if antigos and self._armazem is not None:
+            try:
+                self._armazem.descartar(antigos)
+            except sqlite3.Error as e:
+                log.error("Falha ao descartar jobs antigos de %s: %s", self._armazem.caminho, e)
+
+
+jobs = GerenciadorJobs(
+    max_workers=settings.ARDUINO_JOBS_WORKERS,
+    max_pendentes=settings.ARDUINO_JOBS_MAX_PENDENTES,
+    arquivo=settings.ARDUINO_JOBS_DB,
+)
@@ -0,0 +1,226 @@
+"""
+Management command para medir a partida a frio do Django e do leitor de QR.
+
+Para cada rodada sobe um processo novo e mede, do spawn:
+- Django (runserver --noreload): tempo até a primeira resposta de /api/saude/;
+- leitor de QR (script-read-qrcode.py): tempo até a primeira resposta HTTP
+  (qualquer status: /saude dá 503 enquanto a câmera abre) e até o primeiro
+  QR decodificado, com os marcos do /stats do leitor.
+
+Sem --fonte, o leitor lê um stream MJPEG local servido por este comando, com
+uma etiqueta do dashboard (dashboard.etiquetas) no quadro.
+
+Uso:
+    python manage.py benchmark_inicio [--repeticoes=3] [--fonte=URL] [--sem-django] [--sem-qr]
+"""
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard import etiquetas
+
+
+CONTEUDO_QR = 'sul:benchmark'
+
+# Opener sem proxy (http_proxy do ambiente não deve interceptar 127.0.0.1)
+_opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _get(url, timeout=1.0):
+    """(status, corpo) ou None se não houve resposta HTTP."""
+    try:
+        with _opener.open(url, timeout=timeout) as resp:
+            return resp.status, resp.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+    except (urllib.error.URLError, OSError):
+        return None
+
+
+def _quadro_jpeg():
+    """Quadro 640x480 com a etiqueta de CONTEUDO_QR no centro, em JPEG."""
+    import cv2
+    import numpy as np
+
+    png, _ = etiquetas.etiqueta(CONTEUDO_QR, 'png', modulo=6, legenda=False)
+    etiqueta = cv2.imdecode(np.frombuffer(png, np.uint8), cv2.IMREAD_GRAYSCALE)
+    quadro = np.full((480, 640), 180, np.uint8)
+    y = (480 - etiqueta.shape[0]) // 2
+    x = (640 - etiqueta.shape[1]) // 2
+    quadro[y:y + etiqueta.shape[0], x:x + etiqueta.shape[1]] = etiqueta
+    ok, jpg = cv2.imencode('.jpg', cv2.cvtColor(quadro, cv2.COLOR_GRAY2BGR))
+    if not ok:
+        raise CommandError('Falha ao gerar o quadro do stream de teste')
+    return jpg.tobytes()
+
+
+def iniciar_stream(fps=15):
+    """Servidor MJPEG local (qualquer caminho) com o quadro de teste. Retorna (servidor, url)."""
+    quadro = _quadro_jpeg()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'multipart/x-mixed-replace; boundary=frame')
+            self.end_headers()
+            try:
+                while True:
+                    self.wfile.write(
+                        b'--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n' % len(quadro)
+                        + quadro + b'\r\n'
+                    )
+                    time.sleep(1 / fps)
+            except OSError:
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(('127.0.0.1', _porta_livre()), Handler)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f'http://127.0.0.1:{servidor.server_address[1]}/video'
+
+
+def _aguardar(condicao, prazo, intervalo=0.01):
+    while time.monotonic() < prazo:
+        resultado = condicao()
+        if resultado:
+            return resultado
+        time.sleep(intervalo)
+    return None
+
+
+def _encerrar(proc):
+    if proc.poll() is None:
+        proc.terminate()
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+
+def _ambiente():
+    env = os.environ.copy()
+    env['DASHLOG_DISABLE_QR_AUTOSTART'] = '1'
+    env.pop('DASHLOG_LOG_FILE', None)
+    return env
+
+
+def medir_django(timeout):
+    """Segundos do spawn do runserver até a primeira resposta 200 de /api/saude/."""
+    porta = _porta_livre()
+    inicio = time.monotonic()
+    proc = subprocess.Popen(
+        [sys.executable, 'manage.py', 'runserver', f'127.0.0.1:{porta}', '--noreload'],
+        cwd=settings.BASE_DIR, env=_ambiente(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        url = f'http://127.0.0.1:{porta}/api/saude/'
+        ok = _aguardar(lambda: (_get(url) or (None,))[0] == 200, inicio + timeout)
+        return {'resposta': time.monotonic() - inicio if ok else None}
+    finally:
+        _encerrar(proc)
+
+
+def medir_leitor(fonte, timeout):
+    """
+    Segundos do spawn do leitor até a primeira resposta HTTP e até o primeiro
+    QR decodificado, mais os marcos internos do /stats.
+    """
+    porta = _porta_livre()
+    script = os.path.join(settings.BASE_DIR, 'script-read-qrcode.py')
+    inicio = time.monotonic()
+    proc = subprocess.Popen(
+        [sys.executable, script, '--source', fonte, '--port', str(porta),
+         '--host', '127.0.0.1', '--backend-url', ''],
+        cwd=settings.BASE_DIR, env=_ambiente(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base = f'http://127.0.0.1:{porta}'
+    resultado = {'resposta': None, 'primeiro_qr': None, 'marcos': {}}
+    try:
+        prazo = inicio + timeout
+        if not _aguardar(lambda: _get(f'{base}/saude'), prazo):
+            return resultado
+        resultado['resposta'] = time.monotonic() - inicio
+
+        def lido():
+            resposta = _get(f'{base}/last_code')
+            return resposta and resposta[0] == 200 and json.loads(resposta[1]).get('codigo')
+
+        if _aguardar(lido, prazo):
+            resultado['primeiro_qr'] = time.monotonic() - inicio
+        stats = _get(f'{base}/stats')
+        if stats and stats[0] == 200:
+            resultado['marcos'] = json.loads(stats[1]).get('startup', {})
+        return resultado
+    finally:
+        _encerrar(proc)
+
+
+def _resumo(valores):
+    valores = [v for v in valores if v is not None]
+    if not valores:
+        return f"{'-':>9} {'-':>9} {'-':>9}"
+    return f"{statistics.median(valores) * 1000:>9.0f} {min(valores) * 1000:>9.0f} {max(valores) * 1000:>9.0f}"
+
+
+class Command(BaseCommand):
+    help = 'Mede a partida a frio: primeira resposta do Django e do leitor, e primeiro QR decodificado'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticoes', type=int, default=3, help='Processos novos por medida (padrão: 3)')
+        parser.add_argument('--fonte', default=None,
+                            help='Fonte do leitor (padrão: stream MJPEG local com uma etiqueta)')
+        parser.add_argument('--timeout', type=float, default=60.0, help='Limite por rodada, em s (padrão: 60)')
+        parser.add_argument('--sem-django', action='store_true', help='Não mede o Django')
+        parser.add_argument('--sem-qr', action='store_true', help='Não mede o leitor de QR')
+
+    def handle(self, *args, **options):
+        repeticoes = max(1, options['repeticoes'])
+        linhas = []
+
+        if not options['sem_django']:
+            medidas = [medir_django(options['timeout']) for _ in range(repeticoes)]
+            linhas.append(('django: 1ª resposta', [m['resposta'] for m in medidas]))
+
+        if not options['sem_qr']:
+            servidor = None
+            fonte = options['fonte']
+            if fonte is None:
+                servidor, fonte = iniciar_stream()
+            try:
+                medidas = [medir_leitor(fonte, options['timeout']) for _ in range(repeticoes)]
+            finally:
+                if servidor is not None:
+                    servidor.shutdown()
+            linhas.append(('leitor: 1ª resposta', [m['resposta'] for m in medidas]))
+            linhas.append(('leitor: 1º QR lido', [m['primeiro_qr'] for m in medidas]))
+            # Marcos internos (s desde o import do script; não inclui a partida do Python)
+            for marco in ('servidor', 'camera_aberta', 'primeiro_frame', 'primeira_leitura'):
+                valores = [m['marcos'].get(marco) for m in medidas]
+                if any(v is not None for v in valores):
+                    linhas.append((f'  /stats {marco}', valores))
+
+        self.stdout.write(f"{repeticoes} rodada(s) por medida, em ms\n")
+        self.stdout.write(f"{'medida':<28} {'mediana':>9} {'min':>9} {'max':>9}")
+        for nome, valores in linhas:
+            self.stdout.write(f"{nome:<28} {_resumo(valores)}")
@@ -0,0 +1,145 @@
+"""
+Management command para medir a vazão do SQLite com e sem o perfil de produção.
+
+Roda escritores (mesmo padrão do receber_pacote_arduino: SELECT pelo código e
+INSERT em transação) e leitores (mesma consulta do /api/pacote/) concorrentes
+contra um banco temporário, uma vez com a configuração padrão e outra com
+settings.SQLITE_PRAGMAS_PRODUCAO.
+
+Uso:
+    python manage.py benchmark_sqlite [--escritores=4] [--leitores=2] [--duracao=5]
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+SCHEMA = """
+CREATE TABLE dashboard_pacote (
+    id integer NOT NULL PRIMARY KEY AUTOINCREMENT,
+    nome varchar(100) NOT NULL,
+    codigo varchar(100) NOT NULL,
+    regiao varchar(20) NOT NULL,
+    criado_em datetime NOT NULL
+)
+"""
+
+REGIOES = ['norte', 'nordeste', 'centro-oeste', 'sudeste', 'sul']
+
+# Timeout padrão do backend sqlite3 do Django (segundos)
+TIMEOUT_PADRAO = 5
+
+
+def _conectar(caminho, pragmas, timeout):
+    conn = sqlite3.connect(caminho, timeout=timeout, isolation_level=None, check_same_thread=False)
+    for nome, valor in pragmas.items():
+        conn.execute(f'PRAGMA {nome} = {valor}')
+    return conn
+
+
+def _escritor(caminho, pragmas, timeout, parar, ident, resultado):
+    conn = _conectar(caminho, pragmas, timeout)
+    n = 0
+    while not parar.is_set():
+        codigo = f'{ident}-{n}'
+        try:
+            conn.execute('SELECT id FROM dashboard_pacote WHERE codigo = ?', (codigo,)).fetchone()
+            conn.execute('BEGIN')
+            conn.execute(
+                'INSERT INTO dashboard_pacote (nome, codigo, regiao, criado_em) VALUES (?, ?, ?, ?)',
+                ('bench', codigo, REGIOES[n % len(REGIOES)], datetime.now(timezone.utc).isoformat()),
+            )
+            conn.execute('COMMIT')
+            resultado['escritas'] += 1
+        except sqlite3.OperationalError:
+            resultado['bloqueios'] += 1
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+        n += 1
+    conn.close()
+
+
+def _leitor(caminho, pragmas, timeout, parar, resultado):
+    conn = _conectar(caminho, pragmas, timeout)
+    while not parar.is_set():
+        try:
+            conn.execute(
+                'SELECT id, codigo, nome, regiao, criado_em FROM dashboard_pacote '
+                'ORDER BY criado_em DESC LIMIT 10'
+            ).fetchall()
+            resultado['leituras'] += 1
+        except sqlite3.OperationalError:
+            resultado['bloqueios'] += 1
+    conn.close()
+
+
+def medir(pragmas, timeout, escritores, leitores, duracao):
+    """Executa uma rodada e retorna as contagens por segundo."""
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, 'bench.sqlite3')
+        conn = _conectar(caminho, pragmas, timeout)
+        conn.execute(SCHEMA)
+        conn.close()
+
+        parar = threading.Event()
+        resultados = []
+        threads = []
+        for i in range(escritores):
+            r = {'escritas': 0, 'leituras': 0, 'bloqueios': 0}
+            resultados.append(r)
+            threads.append(threading.Thread(
+                target=_escritor, args=(caminho, pragmas, timeout, parar, i, r)
+            ))
+        for _ in range(leitores):
+            r = {'escritas': 0, 'leituras': 0, 'bloqueios': 0}
+            resultados.append(r)
+            threads.append(threading.Thread(
+                target=_leitor, args=(caminho, pragmas, timeout, parar, r)
+            ))
+
+        inicio = time.monotonic()
+        for t in threads:
+            t.start()
+        time.sleep(duracao)
+        parar.set()
+        for t in threads:
+            t.join()
+        decorrido = time.monotonic() - inicio
+
+    return {
+        chave: sum(r[chave] for r in resultados) / decorrido
+        for chave in ('escritas', 'leituras', 'bloqueios')
+    }
+
+
+class Command(BaseCommand):
+    help = 'Compara a vazão concorrente do SQLite padrão com o perfil de produção'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escritores', type=int, default=4, help='Threads escrevendo pacotes (padrão: 4)')
+        parser.add_argument('--leitores', type=int, default=2, help='Threads lendo a lista do dashboard (padrão: 2)')
+        parser.add_argument('--duracao', type=float, default=5.0, help='Segundos por rodada (padrão: 5)')
+
+    def handle(self, *args, **options):
+        perfis = [
+            ('padrao', {}, TIMEOUT_PADRAO),
+            ('producao', settings.SQLITE_PRAGMAS_PRODUCAO, 20),
+        ]
+
+        self.stdout.write(
+            f"{options['escritores']} escritores, {options['leitores']} leitores, "
+            f"{options['duracao']:.0f}s por perfil\n"
+        )
+        self.stdout.write(f"{'perfil':<10} {'escritas/s':>12} {'leituras/s':>12} {'bloqueios/s':>12}")
+
+        for nome, pragmas, timeout in perfis:
+            r = medir(pragmas, timeout, options['escritores'], options['leitores'], options['duracao'])
+            self.stdout.write(
+                f"{nome:<10} {r['escritas']:>12.1f} {r['leituras']:>12.1f} {r['bloqueios']:>12.2f}"
+            )
@@ -5,9 +5,18 @@ Uso:
     python manage.py qrcode start [--source=0] [--port=5000] [--tunnel]
     python manage.py qrcode stop
     python manage.py qrcode status
+    python manage.py qrcode set [fps=15] [source=URL] [width=1280 height=720] [jpeg_quality=70] [backend_url=URL]
+
+O ``set`` altera o leitor em execução pelo /admin/config dele (sem
+reiniciar; exige QR_ADMIN_TOKEN igual ao do leitor). Sem chave=valor,
+mostra a configuração atual.
 """
-from django.core.management.base import BaseCommand
-from qrcode_service import start_qr_reader_service, stop_qr_reader_service, get_qr_reader_status
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from qrcode_service import (
+    get_qr_reader_status, qr_reader_config, start_qr_reader_service, stop_qr_reader_service,
+)
 
 
 class Command(BaseCommand):
@@ -17,8 +26,14 @@ class Command(BaseCommand):
         parser.add_argument(
             'action',
             type=str,
-            choices=['start', 'stop', 'status', 'restart'],
-            help='Ação a executar: start, stop, status ou restart'
+            choices=['start', 'stop', 'status', 'restart', 'set'],
+            help='Ação a executar: start, stop, status, restart ou set'
+        )
+        parser.add_argument(
+            'valores',
+            nargs='*',
+            metavar='chave=valor',
+            help='Para set: source, fps, width, height, jpeg_quality, backend_url'
         )
         parser.add_argument(
             '--source',
@@ -43,9 +58,23 @@ class Command(BaseCommand):
             action='store_true',
             help='Ativar cloudflare tunnel para acesso público'
         )
+        parser.add_argument(
+            '--host',
+            type=str,
+            default='127.0.0.1',
+            help='Host do leitor em execução, para set (padrão: 127.0.0.1)'
+        )
+        parser.add_argument(
+            '--token',
+            type=str,
+            default=None,
+            help='Token do /admin/config, para set (padrão: env QR_ADMIN_TOKEN)'
+        )
 
     def handle(self, *args, **options):
         action = options['action']
+        if options['valores'] and action != 'set':
+            raise CommandError('chave=valor só vale para "set"')
 
         if action == 'start':
             self.stdout.write(self.style.SUCCESS('Iniciando serviço de QR code...'))
@@ -89,3 +118,27 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.SUCCESS(f'Serviço reiniciado com PID {process.pid}'))
             else:
                 self.stdout.write(self.style.ERROR('Falha ao reiniciar o serviço'))
+
+        elif action == 'set':
+            mudancas = {}
+            for item in options['valores']:
+                chave, sep, valor = item.partition('=')
+                if not sep:
+                    raise CommandError(f'Use chave=valor (recebido: {item!r})')
+                mudancas[chave.strip()] = valor
+            try:
+                status, dados = qr_reader_config(
+                    mudancas or None, port=options['port'], host=options['host'], token=options['token']
+                )
+            except OSError as e:
+                raise CommandError(f"Leitor não respondeu em {options['host']}:{options['port']}: {e}")
+            if status >= 400:
+                raise CommandError(f"{status}: {dados.get('erro', dados)}")
+            if status == 202:
+                self.stdout.write(self.style.WARNING(
+                    'Troca de câmera em andamento; a fonte atual segue até a nova entregar frames '
+                    '(acompanhe com "qrcode set" sem valores).'
+                ))
+            elif mudancas:
+                self.stdout.write(self.style.SUCCESS('Configuração aplicada'))
+            self.stdout.write(json.dumps(dados.get('config', dados), indent=2, ensure_ascii=False))
@@ -0,0 +1,32 @@
+"""
+Management command para reconstruir o resumo de pacotes por região.
+
+Uso:
+    python manage.py reconstruir_resumo [--lote=1000]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from dashboard.resumo import reconstruir_resumo
+
+
+class Command(BaseCommand):
+    help = 'Recalcula do zero o resumo de pacotes por região (minuto/hora/dia)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Quantidade de linhas lidas/gravadas por lote (padrão: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('Reconstruindo resumo de regiões...'))
+        inicio = time.monotonic()
+        linhas = reconstruir_resumo(tamanho_lote=options['lote'])
+        duracao = time.monotonic() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'Resumo reconstruído: {linhas} janelas em {duracao:.2f}s'
+        ))
@@ -0,0 +1,55 @@
+"""
+Management command para rodar o broker serial do Arduino.
+
+O broker é o único processo que abre a porta serial. Os workers do Django
+(com DASHLOG_SERIAL_BROKER apontando para o socket) e o
+arduino/controle_integrado.py (--broker) enviam comandos por ele.
+
+Uso:
+    python manage.py serial_broker [--porta=/dev/ttyACM0] [--socket=/tmp/dashlog-serial.sock]
+"""
+import os
+import signal
+
+from django.core.management.base import BaseCommand
+
+from dashboard.arduino import ArduinoController
+from dashboard.broker import SOCKET_PADRAO, SerialBroker
+
+
+class Command(BaseCommand):
+    help = 'Inicia o broker que serializa o acesso à porta serial do Arduino'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--porta',
+            type=str,
+            default='/dev/ttyACM0',
+            help='Porta serial do Arduino (padrão: /dev/ttyACM0)'
+        )
+        parser.add_argument(
+            '--socket',
+            type=str,
+            default=os.environ.get('DASHLOG_SERIAL_BROKER') or SOCKET_PADRAO,
+            help=f'Caminho do socket Unix (padrão: $DASHLOG_SERIAL_BROKER ou {SOCKET_PADRAO})'
+        )
+
+    def handle(self, *args, **options):
+        controlador = ArduinoController()
+        if not controlador.conectar(options['porta']):
+            self.stdout.write(self.style.WARNING(
+                'Arduino não conectado; o broker continua tentando em segundo plano.'
+            ))
+
+        broker = SerialBroker(controlador, options['socket'])
+        # SIGTERM encerra como Ctrl+C (serve_forever roda na thread principal)
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+        self.stdout.write(self.style.SUCCESS(f"Broker serial ouvindo em {options['socket']}"))
+        try:
+            broker.iniciar()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            controlador.desconectar()
+            self.stdout.write(self.style.SUCCESS('Broker serial parado'))
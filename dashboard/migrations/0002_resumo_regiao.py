@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-19 00:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoRegiao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('regiao', models.CharField(max_length=20)),
+                ('granularidade', models.CharField(choices=[('minuto', 'Minuto'), ('hora', 'Hora'), ('dia', 'Dia')], max_length=10)),
+                ('inicio', models.DateTimeField()),
+                ('total', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['granularidade', '-inicio'], name='resumo_gran_inicio_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='resumoregiao',
+            constraint=models.UniqueConstraint(fields=('granularidade', 'regiao', 'inicio'), name='resumo_regiao_unico'),
+        ),
+    ]
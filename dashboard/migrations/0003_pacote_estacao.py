@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 00:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0002_resumo_regiao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pacote',
+            name='estacao',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+    ]
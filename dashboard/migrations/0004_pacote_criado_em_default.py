@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-19 01:56
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0003_pacote_estacao'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pacote',
+            name='criado_em',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -1,4 +1,7 @@
 from django.db import models
+from django.utils import timezone
+
+
 class Pacote(models.Model):
     nome = models.CharField(max_length=100)
     codigo = models.CharField(max_length=100)
@@ -9,9 +12,43 @@ class Pacote(models.Model):
         ("Sudeste", "Sudeste"),
         ("Sul", "Sul"),
     ])
-    criado_em = models.DateTimeField(auto_now_add=True)
+    # default (e não auto_now_add): o write-behind grava a hora da chegada,
+    # a mesma devolvida ao cliente no 202
+    criado_em = models.DateTimeField(default=timezone.now)
+    # Estação (braço + câmera) que leu o QR; vazio com uma estação só
+    estacao = models.CharField(max_length=50, blank=True, default="")
 
     def __str__(self):
         return f"{self.nome} - {self.codigo} ({self.regiao})"
 
 
+class ResumoRegiao(models.Model):
+    """Contagem de pacotes por região e janela de tempo (minuto, hora, dia).
+
+    Mantida incrementalmente em ``dashboard.resumo`` na mesma transação que
+    grava os pacotes, para que as estatísticas não precisem varrer ``Pacote``.
+    """
+    GRANULARIDADES = [
+        ("minuto", "Minuto"),
+        ("hora", "Hora"),
+        ("dia", "Dia"),
+    ]
+
+    regiao = models.CharField(max_length=20)
+    granularidade = models.CharField(max_length=10, choices=GRANULARIDADES)
+    inicio = models.DateTimeField()
+    total = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["granularidade", "regiao", "inicio"],
+                name="resumo_regiao_unico",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["granularidade", "-inicio"], name="resumo_gran_inicio_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.regiao} {self.granularidade} {self.inicio:%d/%m/%Y %H:%M}: {self.total}"
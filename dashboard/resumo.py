@@ -0,0 +1,133 @@
+"""
+Resumo incremental de pacotes por região e janela de tempo.
+
+Toda gravação de ``Pacote`` chama ``registrar_pacotes`` dentro da mesma
+transação, então ``ResumoRegiao`` acompanha a tabela de pacotes sem nunca
+precisar de um ``GROUP BY`` sobre o histórico inteiro. ``reconstruir_resumo``
+refaz a tabela do zero (usado pelo comando ``manage.py reconstruir_resumo``).
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Pacote, ResumoRegiao
+
+
+GRANULARIDADES = ("minuto", "hora", "dia")
+
+DURACAO_JANELA = {
+    "minuto": timedelta(minutes=1),
+    "hora": timedelta(hours=1),
+    "dia": timedelta(days=1),
+}
+
+
+def inicio_janela(momento, granularidade):
+    """Trunca ``momento`` (no fuso local) para o início da janela."""
+    local = timezone.localtime(momento)
+    if granularidade == "minuto":
+        return local.replace(second=0, microsecond=0)
+    if granularidade == "hora":
+        return local.replace(minute=0, second=0, microsecond=0)
+    if granularidade == "dia":
+        return local.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Granularidade inválida: {granularidade}")
+
+
+def _contar(pares):
+    """Agrupa pares (criado_em, regiao) em contagens por janela."""
+    contagens = Counter()
+    for criado_em, regiao in pares:
+        for granularidade in GRANULARIDADES:
+            contagens[(granularidade, regiao, inicio_janela(criado_em, granularidade))] += 1
+    return contagens
+
+
+def _incrementar(granularidade, regiao, inicio, quantidade):
+    filtro = ResumoRegiao.objects.filter(
+        granularidade=granularidade, regiao=regiao, inicio=inicio
+    )
+    if filtro.update(total=F("total") + quantidade):
+        return
+    try:
+        # Savepoint: se outro processo criou a linha entre o update e o create,
+        # a transação externa continua válida e basta repetir o update.
+        with transaction.atomic():
+            ResumoRegiao.objects.create(
+                granularidade=granularidade, regiao=regiao, inicio=inicio, total=quantidade
+            )
+    except IntegrityError:
+        filtro.update(total=F("total") + quantidade)
+
+
+def registrar_pacotes(pacotes):
+    """
+    Soma os pacotes recém-criados ao resumo.
+    Deve ser chamada na mesma transação que inseriu os pacotes.
+    """
+    contagens = _contar((p.criado_em, p.regiao) for p in pacotes)
+    with transaction.atomic():
+        for (granularidade, regiao, inicio), quantidade in contagens.items():
+            _incrementar(granularidade, regiao, inicio, quantidade)
+
+
+def reconstruir_resumo(tamanho_lote=1000):
+    """
+    Apaga e recalcula o resumo a partir de ``Pacote``.
+    Retorna o número de linhas de resumo gravadas.
+    """
+    with transaction.atomic():
+        # O delete vem primeiro para que, no SQLite, o lock de escrita seja
+        # obtido antes da leitura e nenhum pacote novo fique de fora.
+        ResumoRegiao.objects.all().delete()
+        pares = Pacote.objects.values_list("criado_em", "regiao").iterator(chunk_size=tamanho_lote)
+        contagens = _contar(pares)
+        ResumoRegiao.objects.bulk_create(
+            [
+                ResumoRegiao(granularidade=g, regiao=r, inicio=i, total=n)
+                for (g, r, i), n in contagens.items()
+            ],
+            batch_size=tamanho_lote,
+        )
+    return len(contagens)
+
+
+def consultar_resumo(granularidade, janelas=60, regiao=None):
+    """
+    Retorna as últimas ``janelas`` janelas da granularidade pedida.
+    Usa apenas o índice (granularidade, inicio): o custo depende do tamanho
+    da janela consultada, não do histórico de pacotes.
+    """
+    if granularidade not in DURACAO_JANELA:
+        raise ValueError(f"Granularidade inválida: {granularidade}")
+
+    atual = inicio_janela(timezone.now(), granularidade)
+    desde = atual - DURACAO_JANELA[granularidade] * (janelas - 1)
+
+    linhas = ResumoRegiao.objects.filter(granularidade=granularidade, inicio__gte=desde)
+    if regiao:
+        linhas = linhas.filter(regiao=regiao)
+
+    por_janela = {}
+    totais = Counter()
+    for inicio, reg, total in linhas.order_by("-inicio").values_list("inicio", "regiao", "total"):
+        por_janela.setdefault(inicio, {})[reg] = total
+        totais[reg] += total
+
+    return {
+        "granularidade": granularidade,
+        "desde": timezone.localtime(desde).strftime("%d/%m/%Y %H:%M:%S"),
+        "janelas": [
+            {
+                "inicio": timezone.localtime(inicio).strftime("%d/%m/%Y %H:%M:%S"),
+                "regioes": regioes,
+                "total": sum(regioes.values()),
+            }
+            for inicio, regioes in por_janela.items()
+        ],
+        "totais": dict(totais),
+        "total": sum(totais.values()),
+    }
@@ -0,0 +1,195 @@
+"""
+Telemetria da serial do Arduino.
+
+Toda linha recebida entra, com o horário, num buffer circular. Um analisador
+acompanha as mensagens de transição do firmware e, a cada ciclo completo
+(PEGANDO... até PRONTO), grava a duração de cada fase mecânica. As durações
+ficam em arrays float32 de tamanho fixo (4 bytes por fase por ciclo) e são
+resumidas sob demanda em histogramas, percentis e no gargalo do ciclo.
+
+Fases (cada uma vai de uma mensagem até a próxima, então somam o total):
+
+    pegar             PEGANDO...               → READY_FOR_QR
+    espera_qr         READY_FOR_QR             → === INICIANDO CICLO ... ===
+    girar             === INICIANDO CICLO ===  → MOVENDO_DEFLETOR:<regiao>
+    defletor          MOVENDO_DEFLETOR         → SOLTANDO...
+    soltar            SOLTANDO...              → RETORNANDO_DEFLETOR...
+    retorno_defletor  RETORNANDO_DEFLETOR...   → VOLTANDO...
+    voltar            VOLTANDO...              → PRONTO
+
+Este módulo não importa o Django.
+"""
+import math
+import threading
+import time
+from array import array
+from collections import deque
+
+
+FASES = ("pegar", "espera_qr", "girar", "defletor", "soltar", "retorno_defletor", "voltar")
+
+# Fases que dependem só da mecânica (espera_qr depende da câmera/leitor)
+FASES_MECANICAS = ("pegar", "girar", "defletor", "soltar", "retorno_defletor", "voltar")
+
+# Limites superiores (s) das faixas dos histogramas; a última é aberta
+FAIXAS = (0.1, 0.25, 0.5, 1, 2, 3, 5, 7.5, 10, 15, 20, 30, 60, 120)
+
+REGIOES = ("norte", "nordeste", "centro-oeste", "sudeste", "sul")
+
+
+def _fase_da_linha(linha):
+    """Fase que começa na ``linha`` (ou "fim"), ou None se não for transição."""
+    if linha == "PEGANDO...":
+        return "pegar"
+    if linha == "READY_FOR_QR":
+        return "espera_qr"
+    if linha == "=== INICIANDO CICLO AUTOMATICO ===":
+        return "girar"
+    if linha.startswith("MOVENDO_DEFLETOR:"):
+        return "defletor"
+    if linha.startswith("SOLTANDO"):
+        return "soltar"
+    if linha == "RETORNANDO_DEFLETOR...":
+        return "retorno_defletor"
+    if linha == "VOLTANDO...":
+        return "voltar"
+    if linha == "PRONTO":
+        return "fim"
+    return None
+
+
+def _percentil(ordenados, p):
+    if not ordenados:
+        return None
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+class Telemetria:
+    def __init__(self, max_linhas=5000, max_ciclos=10000):
+        self.max_ciclos = max_ciclos
+        self.linhas = deque(maxlen=max_linhas)  # (ts, linha)
+        # Ciclos completos, em anel: uma coluna por fase + total e início
+        self._duracoes = {
+            fase: array("f", bytes(4 * max_ciclos)) for fase in FASES + ("total",)
+        }
+        self._inicios = array("d", bytes(8 * max_ciclos))
+        self._regioes = array("b", bytes(max_ciclos))
+        self._proximo = 0
+        self.ciclos = 0          # ciclos completos desde o início
+        self.incompletos = 0     # ciclos interrompidos (PARAR, RESET, erro)
+        self._lock = threading.Lock()
+        self._atual = None       # {"inicio", "fase", "desde", "duracoes", "regiao"}
+
+    # ----- entrada -----
+
+    def registrar(self, linha, ts=None):
+        """Guarda a linha e avança o analisador de fases. Barato: roda na thread leitora."""
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            self.linhas.append((ts, linha))
+            self._analisar(ts, linha)
+
+    def _analisar(self, ts, linha):
+        atual = self._atual
+        if linha.startswith("REGIAO_DESTINO:") and atual is not None:
+            atual["regiao"] = linha.split(":", 1)[1].strip().lower()
+            return
+        if linha in ("CICLO_INTERROMPIDO", "EXECUTANDO_RESET...", "READY"):
+            # Ciclo abortado (ou placa reiniciada): descarta o parcial
+            if atual is not None:
+                self.incompletos += 1
+                self._atual = None
+            return
+
+        fase = _fase_da_linha(linha)
+        if fase is None:
+            return
+        if fase == "pegar":
+            if atual is not None:
+                self.incompletos += 1
+            self._atual = {"inicio": ts, "fase": "pegar", "desde": ts, "duracoes": {}, "regiao": None}
+            return
+        if atual is None:
+            return  # ex.: VOLTANDO.../PRONTO de um RESET fora de ciclo
+
+        atual["duracoes"][atual["fase"]] = ts - atual["desde"]
+        if fase == "fim":
+            self._gravar(atual, ts)
+            self._atual = None
+        else:
+            atual["fase"] = fase
+            atual["desde"] = ts
+
+    def _gravar(self, ciclo, fim):
+        i = self._proximo
+        for fase in FASES:
+            self._duracoes[fase][i] = ciclo["duracoes"].get(fase, math.nan)
+        self._duracoes["total"][i] = fim - ciclo["inicio"]
+        self._inicios[i] = ciclo["inicio"]
+        regiao = ciclo["regiao"]
+        self._regioes[i] = REGIOES.index(regiao) if regiao in REGIOES else -1
+        self._proximo = (i + 1) % self.max_ciclos
+        self.ciclos += 1
+
+    # ----- consulta -----
+
+    def _indices(self, desde=None, regiao=None):
+        n = min(self.ciclos, self.max_ciclos)
+        indices = range(n)
+        if desde is not None:
+            indices = [i for i in indices if self._inicios[i] >= desde]
+        if regiao is not None:
+            codigo = REGIOES.index(regiao) if regiao in REGIOES else -1
+            indices = [i for i in indices if self._regioes[i] == codigo]
+        return indices
+
+    def _resumir(self, valores):
+        ordenados = sorted(v for v in valores if not math.isnan(v))
+        contagens = [0] * (len(FAIXAS) + 1)
+        for v in ordenados:
+            contagens[next((k for k, limite in enumerate(FAIXAS) if v <= limite), len(FAIXAS))] += 1
+        return {
+            "ciclos": len(ordenados),
+            "media": round(sum(ordenados) / len(ordenados), 4) if ordenados else None,
+            "p50": _percentil(ordenados, 50),
+            "p95": _percentil(ordenados, 95),
+            "max": ordenados[-1] if ordenados else None,
+            "histograma": contagens,
+        }
+
+    def resumo(self, desde=None, regiao=None, linhas=0):
+        """
+        Histogramas e percentis por fase dos ciclos guardados, o gargalo
+        mecânico (fase com maior média) e a vazão máxima que o tempo médio
+        de ciclo permite. ``linhas`` inclui as últimas N linhas da serial.
+        """
+        with self._lock:
+            indices = self._indices(desde, regiao)
+            fases = {
+                fase: self._resumir([self._duracoes[fase][i] for i in indices])
+                for fase in FASES + ("total",)
+            }
+            recentes = list(self.linhas)[-linhas:] if linhas else []
+            ciclo_atual = None
+            if self._atual is not None:
+                ciclo_atual = {"fase": self._atual["fase"], "desde": self._atual["desde"]}
+
+        for dados in fases.values():
+            for chave in ("p50", "p95", "max"):
+                if dados[chave] is not None:
+                    dados[chave] = round(dados[chave], 4)
+
+        medias = {f: fases[f]["media"] for f in FASES_MECANICAS if fases[f]["media"] is not None}
+        gargalo = max(medias, key=medias.get) if medias else None
+        media_total = fases["total"]["media"]
+        return {
+            "ciclos": self.ciclos,
+            "ciclos_considerados": len(indices),
+            "incompletos": self.incompletos,
+            "faixas": list(FAIXAS),
+            "fases": fases,
+            "gargalo": gargalo,
+            "ciclos_por_hora_max": round(3600 / media_total, 1) if media_total else None,
+            "ciclo_atual": ciclo_atual,
+            "linhas": [{"ts": ts, "linha": linha} for ts, linha in recentes],
+        }
@@ -1,3 +1,117 @@
-from django.test import TestCase
+import os
+import sys
+import tempfile
+import time
 
-# Create your tests here.
+from django.conf import settings
+from django.test import SimpleTestCase
+
+# arduino/ não é pacote: os scripts importam uns aos outros pelo diretório
+sys.path.insert(0, str(settings.BASE_DIR / 'arduino'))
+
+import fila_regioes  # noqa: E402
+from fila_regioes import FilaRegioes  # noqa: E402
+
+
+def _pacote(pacote_id, regiao='sul', estacao=None):
+    return {'id': pacote_id, 'codigo': f'P{pacote_id}', 'nome': f'pacote {pacote_id}',
+            'regiao': regiao, 'estacao': estacao}
+
+
+class FilaRegioesTests(SimpleTestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.caminho = os.path.join(self.pasta.name, 'fila.sqlite3')
+        self.fila = FilaRegioes(self.caminho)
+
+    def tearDown(self):
+        self.fila.fechar()
+        self.pasta.cleanup()
+
+    def test_adicionar_grava_cursor_e_ignora_repetidos(self):
+        self.assertIsNone(self.fila.cursor)
+        self.assertEqual(self.fila.adicionar([_pacote(1), _pacote(2)], 2), 2)
+        self.assertEqual(self.fila.adicionar([_pacote(2), _pacote(3)], 3), 1)
+        self.assertEqual(self.fila.cursor, 3)
+        self.assertEqual(self.fila.contagens()[fila_regioes.PENDENTE], 3)
+
+    def test_proximo_e_o_pendente_mais_antigo(self):
+        self.fila.adicionar([_pacote(5), _pacote(7)], 7)
+        self.assertEqual(self.fila.proximo()['pacote_id'], 5)
+        self.assertTrue(self.fila.reservar(5))
+        self.assertEqual(self.fila.proximo()['pacote_id'], 7)
+
+    def test_reservar_so_uma_vez(self):
+        self.fila.adicionar([_pacote(1)], 1)
+        self.assertTrue(self.fila.reservar(1))
+        self.assertFalse(self.fila.reservar(1))
+        self.assertIsNone(self.fila.proximo())
+
+    def test_concluir_e_falhar_so_a_partir_de_enviando(self):
+        self.fila.adicionar([_pacote(1), _pacote(2)], 2)
+        self.fila.concluir(1)  # ainda pendente: não muda
+        self.assertEqual(self.fila.listar(fila_regioes.PENDENTE)[0]['pacote_id'], 1)
+        self.fila.reservar(1)
+        self.fila.concluir(1)
+        self.fila.reservar(2)
+        self.fila.falhar(2, 'ciclo não terminou')
+        contagens = self.fila.contagens()
+        self.assertEqual(contagens[fila_regioes.CONCLUIDO], 1)
+        self.assertEqual(contagens[fila_regioes.FALHOU], 1)
+        self.assertEqual(self.fila.listar(fila_regioes.FALHOU)[0]['erro'], 'ciclo não terminou')
+
+    def test_proximo_desde_ignora_leituras_anteriores_ao_ciclo(self):
+        self.fila.adicionar([_pacote(1)], 1)
+        inicio = time.time()
+        self.assertIsNone(self.fila.proximo(desde=inicio))
+        self.fila.adicionar([_pacote(2)], 2)
+        self.assertEqual(self.fila.proximo(desde=inicio)['pacote_id'], 2)
+
+    def test_expirar_marca_pendentes_antigos(self):
+        self.fila.adicionar([_pacote(1), _pacote(2)], 2)
+        self.fila.reservar(2)
+        self.assertEqual(self.fila.expirar(time.time()), 1)
+        self.assertEqual(self.fila.listar(fila_regioes.EXPIRADO)[0]['pacote_id'], 1)
+        self.assertIsNone(self.fila.proximo())
+        self.assertEqual(self.fila.listar(fila_regioes.ENVIANDO)[0]['pacote_id'], 2)
+
+    def test_expirar_por_estacao(self):
+        self.fila.adicionar([_pacote(1, estacao='esquerda'), _pacote(2, estacao='direita'), _pacote(3)], 3)
+        self.assertEqual(self.fila.expirar(time.time(), 'esquerda'), 1)
+        pendentes = [p['pacote_id'] for p in self.fila.listar(fila_regioes.PENDENTE)]
+        self.assertEqual(pendentes, [2, 3])
+
+    def test_proximo_prefere_a_estacao_e_pula_as_outras(self):
+        estacoes = ('esquerda', 'direita')
+        self.fila.adicionar([
+            _pacote(1, estacao='direita'), _pacote(2), _pacote(3, estacao='esquerda'), _pacote(4, estacao='outra'),
+        ], 4)
+        self.assertEqual(self.fila.proximo('esquerda', estacoes)['pacote_id'], 3)
+        self.fila.reservar(3)
+        self.assertEqual(self.fila.proximo('esquerda', estacoes)['pacote_id'], 2)
+        self.fila.reservar(2)
+        # "outra" não é estação conhecida: vale para qualquer uma
+        self.assertEqual(self.fila.proximo('esquerda', estacoes)['pacote_id'], 4)
+        self.fila.reservar(4)
+        self.assertIsNone(self.fila.proximo('esquerda', estacoes))
+
+    def test_reenfileirar_volta_para_o_proximo_ciclo(self):
+        self.fila.adicionar([_pacote(1)], 1)
+        self.fila.expirar(time.time())
+        self.assertTrue(self.fila.reenfileirar(1))
+        self.assertFalse(self.fila.reenfileirar(1))
+        # Decisão do operador: vale para o próximo objeto e não expira
+        self.assertEqual(self.fila.expirar(time.time() + 1), 0)
+        self.assertEqual(self.fila.proximo(desde=time.time() + 1)['pacote_id'], 1)
+
+    def test_reabrir_marca_envios_interrompidos_como_incertos(self):
+        self.fila.adicionar([_pacote(1), _pacote(2)], 2)
+        self.fila.reservar(1)
+        self.fila.fechar()
+
+        self.fila = FilaRegioes(self.caminho)
+        self.assertEqual(self.fila.incertos, 1)
+        self.assertEqual(self.fila.listar(fila_regioes.INCERTO)[0]['pacote_id'], 1)
+        # O incerto não é reenviado; o cursor sobrevive ao reinício
+        self.assertEqual(self.fila.proximo()['pacote_id'], 2)
+        self.assertEqual(self.fila.cursor, 2)
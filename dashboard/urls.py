@@ -6,8 +6,17 @@ urlpatterns= [
   path('admin/', admin.site.urls),
   path('', views.index, name='index'), 
   path("api/arduino/pacote/", views.receber_pacote_arduino, name="receber_pacote_arduino"), 
+  path("api/arduino/pacote-regiao/", views.receber_pacote_e_regiao, name="receber_pacote_e_regiao"),
   path("api/pacote/", views.listar_pacotes, name="listar_pacotes"),
+  path("api/estatisticas/", views.estatisticas_regioes, name="estatisticas_regioes"),
+  path("api/saude/", views.saude, name="saude"),
+  path("api/logs/", views.logs, name="logs"),
   path("camera/", views.camera_view, name="camera_view"),
+
+  # Etiquetas QR (PNG/SVG)
+  path("api/pacote/<int:pacote_id>/etiqueta.<str:formato>", views.etiqueta_pacote, name="etiqueta_pacote"),
+  path("api/etiqueta.<str:formato>", views.etiqueta_conteudo, name="etiqueta_conteudo"),
+  path("api/etiquetas/folha.svg", views.folha_etiquetas, name="folha_etiquetas"),
   
   # Rotas de controle do Arduino
   path("api/arduino/conectar/", views.arduino_conectar, name="arduino_conectar"),
@@ -15,8 +24,12 @@ urlpatterns= [
   path("api/arduino/iniciar/", views.arduino_iniciar_ciclo, name="arduino_iniciar"),
   path("api/arduino/regiao/", views.arduino_enviar_regiao, name="arduino_regiao"),
   path("api/arduino/status/", views.arduino_status, name="arduino_status"),
+  path("api/arduino/eventos/", views.arduino_eventos, name="arduino_eventos"),
+  path("api/arduino/telemetria/", views.arduino_telemetria, name="arduino_telemetria"),
   path("api/arduino/portas/", views.arduino_listar_portas, name="arduino_portas"),
   path("api/arduino/reset/", views.arduino_reset, name="arduino_reset"),
   path("api/arduino/interromper/", views.arduino_interromper, name="arduino_interromper"),
   path("api/arduino/upload/", views.arduino_upload, name="arduino_upload"),
+  path("api/arduino/jobs/<str:job_id>/", views.arduino_job, name="arduino_job"),
+  path("api/arduino/jobs/<str:job_id>/eventos/", views.arduino_job_eventos, name="arduino_job_eventos"),
 ]
\ No newline at end of file
@@ -1,122 +1,103 @@
+import asyncio
 import json
-import serial
-import serial.tools.list_ports
+import logging
+import os
+import subprocess
 import threading
 import time
 
-from django.http import JsonResponse
+import log_estruturado
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connection, transaction
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
 from django.views.decorators.csrf import csrf_exempt
 
+from . import etiquetas
+from .arduino import ArduinoController
+from .broker import BrokerClient
+from .gravador import gravador
+from .jobs import FilaCheia, jobs
 from .models import Pacote
+from .resumo import consultar_resumo, registrar_pacotes
 
 
-# ===== CONTROLADOR ARDUINO GLOBAL =====
-# Gerencia conexão serial com Arduino
-class ArduinoController:
-    _instance = None
-    _lock = threading.Lock()
-    
-    def __new__(cls):
-        if cls._instance is None:
-            with cls._lock:
-                if cls._instance is None:
-                    cls._instance = super().__new__(cls)
-                    cls._instance._initialized = False
-        return cls._instance
-    
-    def __init__(self):
-        if self._initialized:
-            return
-        self.serial_conn = None
-        self.porta = '/dev/ttyACM0'
-        self.baudrate = 115200
-        self.aguardando_qr = False
-        self._initialized = True
-    
-    def conectar(self, porta=None):
-        """Conecta ao Arduino."""
-        if porta:
-            self.porta = porta
-        try:
-            if self.serial_conn and self.serial_conn.is_open:
-                return True
-            self.serial_conn = serial.Serial(self.porta, self.baudrate, timeout=0.1)
-            time.sleep(2)
-            print(f"[Arduino] Conectado em {self.porta}")
-            return True
-        except Exception as e:
-            print(f"[Arduino] Erro conexão: {e}")
-            return False
-    
-    def desconectar(self):
-        """Desconecta do Arduino."""
-        if self.serial_conn:
-            self.serial_conn.close()
-            self.serial_conn = None
-    
-    def enviar_comando(self, comando):
-        """Envia comando para Arduino."""
-        if not self.serial_conn or not self.serial_conn.is_open:
-            if not self.conectar():
-                return False, "Não conectado"
-        try:
-            self.serial_conn.write(f"{comando}\n".encode())
-            print(f"[Arduino] → {comando}")
-            
-            # Lê resposta
-            respostas = []
-            tempo_inicio = time.time()
-            while (time.time() - tempo_inicio) < 10:
-                if self.serial_conn.in_waiting:
-                    linha = self.serial_conn.readline().decode('utf-8', errors='ignore').strip()
-                    if linha:
-                        respostas.append(linha)
-                        print(f"[Arduino] ← {linha}")
-                        if linha == "READY_FOR_QR":
-                            self.aguardando_qr = True
-                            break
-                        elif linha in ["OK", "PRONTO", "RESET_OK", "CALIBRADO"]:
-                            self.aguardando_qr = False
-                            break
-                time.sleep(0.01)
-            
-            return True, respostas
-        except Exception as e:
-            print(f"[Arduino] Erro: {e}")
-            return False, str(e)
-    
-    def enviar_regiao(self, regiao):
-        """Envia região para o Arduino processar."""
-        # Envia mesmo se não estiver no estado correto - o Arduino vai responder com erro se necessário
-        print(f"[Arduino] Enviando região: {regiao} (aguardando_qr={self.aguardando_qr})")
-        sucesso, resposta = self.enviar_comando(f"REGIAO:{regiao}")
-        if sucesso:
-            self.aguardando_qr = False  # Reseta flag após enviar
-        return sucesso, resposta
-    
-    def is_connected(self):
-        """Verifica se está conectado."""
-        return self.serial_conn is not None and self.serial_conn.is_open
-    
-    def get_status(self):
-        """Retorna status da conexão."""
-        return {
-            "conectado": self.is_connected(),
-            "porta": self.porta,
-            "aguardando_qr": self.aguardando_qr
-        }
+log = logging.getLogger("dashlog.views")
 
 
-# Instância global do controlador
-arduino = ArduinoController()
+# Instância global do controlador. Com DASHLOG_SERIAL_BROKER definido, a
+# porta serial pertence ao broker (manage.py serial_broker) e cada worker
+# fala com ele pelo socket Unix; sem ele, este processo abre a porta.
+if settings.ARDUINO_BROKER_SOCKET:
+    arduino = BrokerClient(settings.ARDUINO_BROKER_SOCKET)
+else:
+    arduino = ArduinoController()
 
 
 # Página inicial
 def index(request):
     return render(request, 'index.html')
 
+REGIOES_VALIDAS = ['norte', 'nordeste', 'centro-oeste', 'sudeste', 'sul']
+
+
+def _normalizar_regiao(regiao):
+    """Normaliza a região; retorna None se ela não for válida."""
+    regiao = (regiao or '').lower().strip()
+    if regiao in ['centro-oeste', 'centro oeste', 'centrooeste', 'centro_oeste']:
+        regiao = 'centro-oeste'
+    return regiao if regiao in REGIOES_VALIDAS else None
+
+
+def _gravar_pacote(codigo, nome, regiao, estacao=""):
+    """
+    Persiste o pacote (ou o enfileira no write-behind) e retorna
+    (dados da resposta, status HTTP).
+    """
+    if settings.PACOTES_WRITE_BEHIND:
+        # Confirma já; a thread do gravador persiste em micro-lotes
+        criado_em = timezone.now()
+        gravador.enfileirar(codigo=codigo, nome=nome, regiao=regiao, criado_em=criado_em, estacao=estacao)
+        return {
+            "mensagem": "Pacote recebido com sucesso.",
+            "codigo": codigo,
+            "nome": nome,
+            "regiao": regiao,
+            "estacao": estacao,
+            "criado_em": timezone.localtime(criado_em).strftime("%d/%m/%Y %H:%M:%S"),
+            "novo": None,
+            "enfileirado": True
+        }, 202
+
+    with transaction.atomic():
+        pacote, created = Pacote.objects.get_or_create(
+            codigo=codigo,
+            defaults={
+                "nome": nome,
+                "regiao": regiao,
+                "estacao": estacao,
+                "criado_em": timezone.now()
+            }
+        )
+        if created:
+            registrar_pacotes([pacote])
+
+    return {
+        "mensagem": "Pacote recebido com sucesso.",
+        "codigo": pacote.codigo,
+        "nome": pacote.nome,
+        "regiao": pacote.regiao,
+        "estacao": pacote.estacao,
+        "criado_em": pacote.criado_em.strftime("%d/%m/%Y %H:%M:%S"),
+        "novo": created
+    }, 200
+
+
 # Rota para o Arduino enviar pacotes
 @csrf_exempt
 def receber_pacote_arduino(request):
@@ -127,71 +108,355 @@ def receber_pacote_arduino(request):
             codigo = dados.get("codigo")
             nome = dados.get("nome")
             regiao = dados.get("regiao")
+            estacao = dados.get("estacao") or ""
             
             if not codigo or not nome or not regiao:
                 return JsonResponse({"erro": "Campos obrigatórios ausentes."}, status=400)
+            if len(estacao) > 50:
+                return JsonResponse({"erro": "Estação inválida."}, status=400)
 
-            regiao = regiao.lower().strip()
-
-            pacote, created = Pacote.objects.get_or_create(
-                codigo=codigo,
-                defaults={
-                    "nome": nome,
-                    "regiao": regiao,
-                    "criado_em": timezone.now()
-                }
-            )
-
-            return JsonResponse({
-                "mensagem": "Pacote recebido com sucesso.",
-                "codigo": pacote.codigo,
-                "nome": pacote.nome,
-                "regiao": pacote.regiao,
-                "criado_em": pacote.criado_em.strftime("%d/%m/%Y %H:%M:%S"),
-                "novo": created
-            })
+            resposta, status = _gravar_pacote(codigo, nome, regiao.lower().strip(), estacao)
+            return JsonResponse(resposta, status=status)
 
         except json.JSONDecodeError:
             return JsonResponse({"erro": "JSON inválido."}, status=400)
         except Exception as e:
-            print("Erro ao processar POST do Arduino:", e)
+            log.exception("Erro ao processar POST do Arduino: %s", e)
             return JsonResponse({"erro": "Erro interno no servidor."}, status=500)
     else:
         return JsonResponse({"erro": "Método não permitido. Use POST."}, status=405)
 
 
+# Rota única do leitor de QR: grava o pacote e já enfileira o REGIAO:<x>
+@csrf_exempt
+def receber_pacote_e_regiao(request):
+    """
+    Caminho rápido do leitor: numa requisição só, enfileira o comando
+    REGIAO:<x> (primeiro, para o defletor não esperar o banco) e grava o
+    pacote. Com ``lido_em`` (epoch da leitura do QR) o job registra a
+    latência da leitura até o eco do comando no Arduino.
+    """
+    if request.method != 'POST':
+        return JsonResponse({"erro": "Método não permitido. Use POST."}, status=405)
+    recebido_em = time.time()
+    try:
+        dados = json.loads(request.body.decode('utf-8'))
+    except json.JSONDecodeError:
+        return JsonResponse({"erro": "JSON inválido."}, status=400)
+
+    codigo = dados.get("codigo")
+    nome = dados.get("nome")
+    regiao = _normalizar_regiao(dados.get("regiao"))
+    estacao = dados.get("estacao") or ""
+    if not codigo or not nome or not dados.get("regiao"):
+        return JsonResponse({"erro": "Campos obrigatórios ausentes."}, status=400)
+    if len(estacao) > 50:
+        return JsonResponse({"erro": "Estação inválida."}, status=400)
+    if regiao is None:
+        return JsonResponse({
+            "erro": f"Região inválida: {dados.get('regiao')}",
+            "regioes_validas": REGIOES_VALIDAS
+        }, status=400)
+
+    try:
+        lido_em = float(dados["lido_em"]) if dados.get("lido_em") else None
+    except (TypeError, ValueError):
+        lido_em = None
+
+    try:
+        job = jobs.submeter("regiao", _job_regiao, {"regiao": regiao, "lido_em": lido_em})
+    except FilaCheia as e:
+        job = None
+        log.warning("Região %s não enfileirada: %s", regiao, e)
+    enfileirado_em = time.time()
+
+    try:
+        resposta, status = _gravar_pacote(codigo, nome, regiao, estacao)
+    except Exception as e:
+        log.exception("Erro ao gravar pacote: %s", e)
+        resposta, status = {"erro": "Erro interno no servidor."}, 500
+
+    resposta["job_id"] = job.id if job else None
+    if job:
+        resposta["status_url"] = reverse("arduino_job", args=[job.id])
+    else:
+        resposta["erro_regiao"] = "Fila de jobs cheia"
+    resposta["servidor_ms"] = {
+        "ate_enfileirar": round((enfileirado_em - recebido_em) * 1000, 2),
+        "total": round((time.time() - recebido_em) * 1000, 2),
+    }
+    return JsonResponse(resposta, status=status)
+
+
 # Rota para o frontend buscar pacotes
+# Sem parâmetros: os 10 mais recentes. Com ?apos=<id>: os pacotes com id maior,
+# do mais antigo para o mais novo (cursor para quem só quer os novos).
 def listar_pacotes(request):
     if request.method == 'GET':
         try:
-            pacotes = Pacote.objects.order_by('-criado_em')[:10]
+            apos = request.GET.get('apos')
+            if apos is not None:
+                try:
+                    apos = int(apos)
+                    limite = min(max(int(request.GET.get('limite', 100)), 1), 1000)
+                except ValueError:
+                    return JsonResponse({"erro": "Parâmetros 'apos'/'limite' inválidos."}, status=400)
+                pacotes = Pacote.objects.filter(id__gt=apos).order_by('id')[:limite]
+            else:
+                pacotes = Pacote.objects.order_by('-criado_em')[:10]
             dados = [
                 {
+                    "id": p.id,
                     "codigo": p.codigo,
                     "nome": p.nome,
                     "regiao": p.regiao,
+                    "estacao": p.estacao,
                     "criado_em": p.criado_em.strftime("%d/%m/%Y %H:%M:%S"),
                 }
                 for p in pacotes
             ]
-            return JsonResponse({"pacotes": dados})
+            ultimo_id = max([p["id"] for p in dados], default=apos or 0)
+            return JsonResponse({"pacotes": dados, "ultimo_id": ultimo_id})
         except Exception as e:
-            print("Erro ao buscar pacotes:", e)
+            log.exception("Erro ao buscar pacotes: %s", e)
             return JsonResponse({"erro": "Erro ao buscar dados."}, status=500)
     else:
         return JsonResponse({"erro": "Método não permitido. Use GET."}, status=405)
+
+
+# Health check (start.py): o processo responde e o banco abre. Não depende do
+# Arduino, para um Arduino desconectado não reiniciar o Django; o status dele
+# e as profundidades das filas vêm com ?detalhes=1 (/health do start.py).
+INICIADO_EM = time.time()
+
+
+def saude(request):
+    if request.method != 'GET':
+        return JsonResponse({"erro": "Método não permitido. Use GET."}, status=405)
+    inicio = time.perf_counter()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+    except Exception as e:
+        return JsonResponse({"ok": False, "erro": f"Banco indisponível: {e}"}, status=503)
+    dados = {
+        "ok": True,
+        "pid": os.getpid(),
+        "uptime_s": round(time.time() - INICIADO_EM, 1),
+        "banco_ms": round((time.perf_counter() - inicio) * 1000, 2),
+    }
+    if request.GET.get('detalhes') in ('1', 'true'):
+        dados["arduino"] = arduino.get_status()
+        coletor = log_estruturado.coletor()
+        dados["filas"] = {
+            "jobs": jobs.pendentes(),
+            "gravacao": gravador.pendentes(),
+            "gravacao_falhas": gravador.falhas(),
+            "serial": dados["arduino"].get("comandos_pendentes"),
+            "logs_django": coletor.fila.qsize() if coletor else None,
+        }
+    return JsonResponse(dados)
+
+
+# Cauda dos logs estruturados deste processo (e do QR Reader que ele iniciou).
+# ?n=200&nivel=WARNING&origem=QR&apos=<seq> (apos: só eventos mais novos)
+def logs(request):
+    if request.method != 'GET':
+        return JsonResponse({"erro": "Método não permitido. Use GET."}, status=405)
+    coletor = log_estruturado.coletor()
+    if coletor is None:
+        return JsonResponse({"erro": "Logs estruturados não configurados."}, status=503)
+    try:
+        n = min(max(int(request.GET.get('n', 200)), 1), 2000)
+        apos = int(request.GET.get('apos', 0))
+    except ValueError:
+        return JsonResponse({"erro": "Parâmetros 'n'/'apos' inválidos."}, status=400)
+    nivel = request.GET.get('nivel', '').upper() or None
+    if nivel is not None and nivel not in log_estruturado.NIVEIS:
+        return JsonResponse({"erro": f"Nível inválido. Use {', '.join(log_estruturado.NIVEIS)}."}, status=400)
+    eventos = coletor.cauda(n, nivel=nivel, origem=request.GET.get('origem'), apos=apos)
+    return JsonResponse({
+        "eventos": eventos,
+        "ultimo_seq": eventos[-1]["seq"] if eventos else apos,
+        **coletor.estatisticas(),
+    })
+
+
+# Rota de estatísticas por região e janela de tempo (lê só o resumo)
+def estatisticas_regioes(request):
+    if request.method != 'GET':
+        return JsonResponse({"erro": "Método não permitido. Use GET."}, status=405)
+
+    granularidade = request.GET.get('granularidade', 'hora')
+    regiao = request.GET.get('regiao', '').lower().strip() or None
+    try:
+        janelas = min(max(int(request.GET.get('janelas', 60)), 1), 1440)
+    except ValueError:
+        return JsonResponse({"erro": "Parâmetro 'janelas' inválido."}, status=400)
+
+    try:
+        return JsonResponse(consultar_resumo(granularidade, janelas=janelas, regiao=regiao))
+    except ValueError as e:
+        return JsonResponse({"erro": str(e)}, status=400)
+
     
 def camera_view(request):
     url_camera = request.GET.get('url_camera', '')
     if not url_camera:
-        print("URL da câmera não fornecida.")
+        log.debug("URL da câmera não fornecida.")
     return render(request, 'index.html', {'url_camera': url_camera})
 
 
-# ===== ROTAS DE CONTROLE DO ARDUINO =====
+# ===== ETIQUETAS QR =====
+# PNG/SVG das etiquetas "regiao:nome" (dashboard.etiquetas), com cache LRU e
+# ETag: uma estação de impressão pode pedir de novo e recebe 304.
+
+MAX_ETIQUETAS_FOLHA = 500
+
+
+def _opcoes_etiqueta(request):
+    """Lê modulo/tamanho_mm/legenda da query; ValueError se inválidos."""
+    modulo = int(request.GET.get('modulo', 8))
+    tamanho_mm = float(request.GET.get('tamanho_mm', 30))
+    if not 1 <= modulo <= 40 or not 10 <= tamanho_mm <= 190:
+        raise ValueError
+    return {
+        "modulo": modulo,
+        "tamanho_mm": tamanho_mm,
+        "legenda": request.GET.get('legenda', '1') not in ('0', 'false', 'nao'),
+    }
+
+
+def _conteudo_etiqueta(regiao, nome):
+    """Conteúdo "regiao:nome" do QR, ou None se a região/o nome forem inválidos."""
+    regiao = _normalizar_regiao(regiao)
+    nome = (nome or '').strip()
+    if regiao is None or not nome or len(nome) > 100:
+        return None
+    return f"{regiao}:{nome}"
+
+
+def _resposta_etiqueta(request, conteudo, formato):
+    if formato not in ('png', 'svg'):
+        return JsonResponse({"erro": "Formato inválido. Use png ou svg."}, status=400)
+    try:
+        opcoes = _opcoes_etiqueta(request)
+    except ValueError:
+        return JsonResponse({"erro": "Parâmetros 'modulo' (1-40) ou 'tamanho_mm' (10-190) inválidos."}, status=400)
+
+    dados, etag = etiquetas.etiqueta(conteudo, formato, **opcoes)
+    nao_modificado = get_conditional_response(request, etag=etag)
+    resposta = nao_modificado or HttpResponse(
+        dados, content_type='image/png' if formato == 'png' else 'image/svg+xml'
+    )
+    resposta['ETag'] = etag
+    resposta['Cache-Control'] = 'public, max-age=3600'
+    return resposta
+
+
+# Etiqueta de um pacote gravado
+def etiqueta_pacote(request, pacote_id, formato):
+    if request.method != 'GET':
+        return JsonResponse({"erro": "Método não permitido. Use GET."}, status=405)
+    pacote = Pacote.objects.filter(id=pacote_id).only('nome', 'regiao').first()
+    if pacote is None:
+        return JsonResponse({"erro": f"Pacote {pacote_id} não encontrado."}, status=404)
+    conteudo = _conteudo_etiqueta(pacote.regiao, pacote.nome)
+    if conteudo is None:
+        return JsonResponse({"erro": f"Pacote {pacote_id} sem região/nome válidos."}, status=422)
+    return _resposta_etiqueta(request, conteudo, formato)
+
+
+# Etiqueta avulsa: ?conteudo=regiao:nome (ou ?regiao=...&nome=...)
+def etiqueta_conteudo(request, formato):
+    if request.method != 'GET':
+        return JsonResponse({"erro": "Método não permitido. Use GET."}, status=405)
+    if 'conteudo' in request.GET:
+        regiao, _, nome = request.GET['conteudo'].partition(':')
+    else:
+        regiao, nome = request.GET.get('regiao'), request.GET.get('nome')
+    conteudo = _conteudo_etiqueta(regiao, nome)
+    if conteudo is None:
+        return JsonResponse({"erro": f"Conteúdo inválido. Use regiao:nome com regiao em {', '.join(REGIOES_VALIDAS)}."},
+                            status=400)
+    return _resposta_etiqueta(request, conteudo, formato)
+
+
+# Folha SVG (largura A4) com N etiquetas, enviada em streaming. Etiquetas:
+#   ?ids=1,2,3                   pacotes, na ordem pedida
+#   ?apos=<id>&limite=N          pacotes depois do cursor (como /api/pacote/)
+#   ?conteudo=regiao:nome&copias=N
+def folha_etiquetas(request):
+    if request.method != 'GET':
+        return JsonResponse({"erro": "Método não permitido. Use GET."}, status=405)
+    try:
+        opcoes = _opcoes_etiqueta(request)
+        margem_mm = float(request.GET.get('margem_mm', 10))
+        espaco_mm = float(request.GET.get('espaco_mm', 4))
+        if not 0 <= margem_mm <= 50 or not 0 <= espaco_mm <= 50:
+            raise ValueError
+        if 'ids' in request.GET:
+            ids = [int(i) for i in request.GET['ids'].split(',') if i.strip()]
+            if len(ids) > MAX_ETIQUETAS_FOLHA:
+                raise ValueError
+            pacotes = Pacote.objects.only('nome', 'regiao').in_bulk(ids)
+            faltando = sorted(set(ids) - set(pacotes))
+            if faltando:
+                return JsonResponse({"erro": f"Pacotes não encontrados: {faltando}"}, status=404)
+            conteudos = [_conteudo_etiqueta(pacotes[i].regiao, pacotes[i].nome) for i in ids]
+        elif 'apos' in request.GET:
+            limite = min(max(int(request.GET.get('limite', 100)), 1), MAX_ETIQUETAS_FOLHA)
+            pacotes = Pacote.objects.filter(id__gt=int(request.GET['apos'])).order_by('id').only('nome', 'regiao')
+            conteudos = [_conteudo_etiqueta(p.regiao, p.nome) for p in pacotes[:limite]]
+        else:
+            regiao, _, nome = request.GET.get('conteudo', '').partition(':')
+            copias = int(request.GET.get('copias', 1))
+            if not 1 <= copias <= MAX_ETIQUETAS_FOLHA:
+                raise ValueError
+            conteudos = [_conteudo_etiqueta(regiao, nome)] * copias
+    except ValueError:
+        return JsonResponse({"erro": f"Parâmetros inválidos (no máximo {MAX_ETIQUETAS_FOLHA} etiquetas)."}, status=400)
+    conteudos = [c for c in conteudos if c is not None]
+    if not conteudos:
+        return JsonResponse({"erro": "Nenhuma etiqueta válida para a folha."}, status=400)
+
+    layout = {
+        "tamanho_mm": opcoes["tamanho_mm"],
+        "margem_mm": margem_mm,
+        "espaco_mm": espaco_mm,
+        "legenda": opcoes["legenda"],
+    }
+    etag = etiquetas.etag_folha(conteudos, **layout)
+    resposta = get_conditional_response(request, etag=etag)
+    if resposta is None:
+        try:
+            etiquetas.grade_folha(len(conteudos), tamanho_mm=layout["tamanho_mm"], margem_mm=margem_mm,
+                                  espaco_mm=espaco_mm, legenda=layout["legenda"])
+        except ValueError as e:
+            return JsonResponse({"erro": str(e)}, status=400)
+        resposta = StreamingHttpResponse(etiquetas.folha_svg(conteudos, **layout), content_type='image/svg+xml')
+    resposta['ETag'] = etag
+    resposta['Cache-Control'] = 'no-cache'
+    return resposta
 
-@csrf_exempt
-def arduino_conectar(request):
+
+# ===== ROTAS DE CONTROLE DO ARDUINO =====
+# As rotas /api/arduino/* são assíncronas: enquanto aguardam a serial elas
+# cedem o event loop (ASGI, ver dashlog/asgi.py), então status e pacotes
+# continuam respondendo durante um movimento longo.
+
+def csrf_exempt_async(view):
+    """
+    Equivalente a csrf_exempt para views async. O csrf_exempt do Django 4.2
+    embrulha a view numa função síncrona, o que esconde a corrotina do
+    handler; aqui só marcamos o atributo lido pelo CsrfViewMiddleware.
+    """
+    view.csrf_exempt = True
+    return view
+
+
+@csrf_exempt_async
+async def arduino_conectar(request):
     """Conecta ao Arduino."""
     if request.method == 'POST':
         try:
@@ -200,17 +465,17 @@ def arduino_conectar(request):
         except:
             porta = '/dev/ttyACM0'
         
-        sucesso = arduino.conectar(porta)
+        sucesso = await arduino.conectar_async(porta)
         return JsonResponse({
             "sucesso": sucesso,
             "mensagem": "Conectado" if sucesso else "Falha na conexão",
-            "status": arduino.get_status()
+            "status": await arduino.get_status_async()
         })
     return JsonResponse({"erro": "Use POST"}, status=405)
 
 
-@csrf_exempt
-def arduino_comando(request):
+@csrf_exempt_async
+async def arduino_comando(request):
     """Envia comando para o Arduino."""
     if request.method == 'POST':
         try:
@@ -220,34 +485,80 @@ def arduino_comando(request):
             if not comando:
                 return JsonResponse({"erro": "Comando não fornecido"}, status=400)
             
-            sucesso, resposta = arduino.enviar_comando(comando)
+            sucesso, resposta = await arduino.enviar_comando_async(comando)
             return JsonResponse({
                 "sucesso": sucesso,
                 "resposta": resposta,
-                "status": arduino.get_status()
+                "status": await arduino.get_status_async()
             })
         except Exception as e:
             return JsonResponse({"erro": str(e)}, status=500)
     return JsonResponse({"erro": "Use POST"}, status=405)
 
 
-@csrf_exempt  
-def arduino_iniciar_ciclo(request):
-    """Inicia ciclo de pegar objeto."""
+async def _criar_job(tipo, funcao, parametros=None):
+    """
+    Enfileira o job e responde 202 com as URLs de acompanhamento. O
+    ``submeter`` grava no armazém SQLite: roda numa thread, fora do loop.
+    """
+    try:
+        job = await asyncio.to_thread(jobs.submeter, tipo, funcao, parametros)
+    except FilaCheia as e:
+        return JsonResponse({"erro": f"Fila de jobs cheia: {e}"}, status=503)
+    return JsonResponse({
+        "job_id": job.id,
+        "tipo": job.tipo,
+        "estado": job.estado,
+        "status_url": reverse("arduino_job", args=[job.id]),
+        "eventos_url": reverse("arduino_job_eventos", args=[job.id]),
+    }, status=202)
+
+
+def _job_iniciar(job):
+    sucesso, resposta = arduino.enviar_comando("INICIAR", ao_receber=job.progresso)
+    return {
+        "sucesso": sucesso,
+        "resposta": resposta,
+        "aguardando_qr": arduino.aguardando_qr,
+        "status": arduino.get_status()
+    }
+
+
+def _job_regiao(job):
+    regiao = job.parametros["regiao"]
+    lido_em = job.parametros.get("lido_em")
+    eco = []
+
+    def ao_receber(linha):
+        if not eco:
+            eco.append(time.time())
+        job.progresso(linha)
+
+    sucesso, resposta = arduino.enviar_regiao(regiao, ao_receber=ao_receber)
+    resultado = {
+        "sucesso": sucesso,
+        "regiao": regiao,
+        "resposta": resposta,
+        "status": arduino.get_status()
+    }
+    if lido_em and eco:
+        # Leitura do QR (no leitor) até o Arduino ecoar o REGIAO
+        resultado["latencia_qr_comando_ms"] = round((eco[0] - lido_em) * 1000, 1)
+        log.info("QR → REGIAO:%s em %s ms", regiao, resultado["latencia_qr_comando_ms"])
+    return resultado
+
+
+@csrf_exempt_async
+async def arduino_iniciar_ciclo(request):
+    """Inicia ciclo de pegar objeto (responde 202 com o id do job)."""
     if request.method == 'POST':
-        sucesso, resposta = arduino.enviar_comando("INICIAR")
-        return JsonResponse({
-            "sucesso": sucesso,
-            "resposta": resposta,
-            "aguardando_qr": arduino.aguardando_qr,
-            "status": arduino.get_status()
-        })
+        return await _criar_job("iniciar", _job_iniciar)
     return JsonResponse({"erro": "Use POST"}, status=405)
 
 
-@csrf_exempt
-def arduino_enviar_regiao(request):
-    """Envia região detectada para o Arduino."""
+@csrf_exempt_async
+async def arduino_enviar_regiao(request):
+    """Envia região detectada para o Arduino (responde 202 com o id do job)."""
     if request.method == 'POST':
         try:
             dados = json.loads(request.body.decode('utf-8'))
@@ -256,39 +567,168 @@ def arduino_enviar_regiao(request):
             if not regiao:
                 return JsonResponse({"erro": "Região não fornecida"}, status=400)
             
-            # Normaliza região
-            regiao = regiao.lower().strip()
-            if regiao in ['centro-oeste', 'centro oeste', 'centrooeste', 'centro_oeste']:
-                regiao = 'centro-oeste'
-            
-            regioes_validas = ['norte', 'nordeste', 'centro-oeste', 'sudeste', 'sul']
-            if regiao not in regioes_validas:
+            regiao_normalizada = _normalizar_regiao(regiao)
+            if regiao_normalizada is None:
                 return JsonResponse({
-                    "erro": f"Região inválida: {regiao}",
-                    "regioes_validas": regioes_validas
+                    "erro": f"Região inválida: {regiao.lower().strip()}",
+                    "regioes_validas": REGIOES_VALIDAS
                 }, status=400)
             
-            sucesso, resposta = arduino.enviar_regiao(regiao)
-            return JsonResponse({
-                "sucesso": sucesso,
-                "regiao": regiao,
-                "resposta": resposta,
-                "status": arduino.get_status()
-            })
+            return await _criar_job("regiao", _job_regiao, {"regiao": regiao_normalizada})
         except Exception as e:
             return JsonResponse({"erro": str(e)}, status=500)
     return JsonResponse({"erro": "Use POST"}, status=405)
 
 
-def arduino_status(request):
+async def arduino_job(request, job_id):
+    """Estado e resultado de um job. Use ?apos=<seq> para incluir o progresso."""
+    # obter/como_dict podem ler o armazém SQLite: numa thread, fora do loop
+    job = await asyncio.to_thread(jobs.obter, job_id)
+    if job is None:
+        return JsonResponse({"erro": "Job não encontrado"}, status=404)
+    apos = request.GET.get('apos')
+    try:
+        apos = int(apos) if apos is not None else None
+    except ValueError:
+        return JsonResponse({"erro": "Parâmetro 'apos' inválido."}, status=400)
+    return JsonResponse(await asyncio.to_thread(job.como_dict, progresso_apos=apos))
+
+
+def _sse_job(job, seq):
+    """Eventos SSE do job após ``seq``: (texto, último seq, terminou)."""
+    pedacos = []
+    for p in job.progresso_desde(seq):
+        seq = p["seq"]
+        pedacos.append(f"id: {seq}\nevent: progresso\ndata: {json.dumps(p)}\n\n")
+    terminou = job.terminado
+    if terminou:
+        pedacos.append(f"event: fim\ndata: {json.dumps(job.como_dict())}\n\n")
+    return "".join(pedacos), seq, terminou
+
+
+async def arduino_job_eventos(request, job_id):
+    """
+    Fluxo SSE do job: um evento ``progresso`` por linha e um evento ``fim``
+    com o job completo. Retoma de Last-Event-ID (ou ?apos=<seq>).
+
+    Sob ASGI o fluxo é um gerador assíncrono; sob WSGI (runserver) é um
+    gerador síncrono, que o servidor envia pedaço a pedaço em vez de juntar
+    a resposta inteira antes de mandar.
+    """
+    job = await asyncio.to_thread(jobs.obter, job_id)
+    if job is None:
+        return JsonResponse({"erro": "Job não encontrado"}, status=404)
+    try:
+        apos = int(request.headers.get('Last-Event-ID') or request.GET.get('apos', 0))
+    except ValueError:
+        return JsonResponse({"erro": "Parâmetro 'apos' inválido."}, status=400)
+    # Job de outro worker não avisa: consulta o armazém a cada intervalo
+    espera = job.intervalo_consulta or 15
+
+    async def fluxo():
+        loop = asyncio.get_running_loop()
+        sinal = asyncio.Event()
+
+        def ouvinte():
+            loop.call_soon_threadsafe(sinal.set)
+
+        job.adicionar_ouvinte(ouvinte)
+        seq = apos
+        ultimo_envio = time.monotonic()
+        try:
+            while True:
+                sinal.clear()
+                texto, seq, terminou = await asyncio.to_thread(_sse_job, job, seq)
+                if texto:
+                    ultimo_envio = time.monotonic()
+                    yield texto
+                if terminou:
+                    return
+                try:
+                    await asyncio.wait_for(sinal.wait(), espera)
+                except asyncio.TimeoutError:
+                    if time.monotonic() - ultimo_envio >= 15:
+                        ultimo_envio = time.monotonic()
+                        yield ": keepalive\n\n"
+        finally:
+            job.remover_ouvinte(ouvinte)
+
+    def fluxo_wsgi():
+        sinal = threading.Event()
+        job.adicionar_ouvinte(sinal.set)
+        seq = apos
+        ultimo_envio = time.monotonic()
+        try:
+            while True:
+                sinal.clear()
+                texto, seq, terminou = _sse_job(job, seq)
+                if texto:
+                    ultimo_envio = time.monotonic()
+                    yield texto
+                if terminou:
+                    return
+                if not sinal.wait(espera) and time.monotonic() - ultimo_envio >= 15:
+                    ultimo_envio = time.monotonic()
+                    yield ": keepalive\n\n"
+        finally:
+            job.remover_ouvinte(sinal.set)
+
+    corpo = fluxo() if isinstance(request, ASGIRequest) else fluxo_wsgi()
+    resposta = StreamingHttpResponse(corpo, content_type='text/event-stream')
+    resposta['Cache-Control'] = 'no-cache'
+    resposta['X-Accel-Buffering'] = 'no'
+    return resposta
+
+
+async def arduino_status(request):
     """Retorna status do Arduino."""
-    return JsonResponse(arduino.get_status())
+    return JsonResponse(await arduino.get_status_async())
+
+
+async def arduino_eventos(request):
+    """
+    Fluxo de eventos da serial: todas as linhas recebidas, em ordem, com
+    ``comando`` nulo para as que não pertencem a nenhum comando.
+    Use ?apos=<seq> para receber só as novas.
+    """
+    try:
+        apos = int(request.GET.get('apos', 0))
+    except ValueError:
+        return JsonResponse({"erro": "Parâmetro 'apos' inválido."}, status=400)
+    eventos = await arduino.eventos_desde_async(apos)
+    return JsonResponse({
+        "eventos": eventos,
+        "ultimo": eventos[-1]["seq"] if eventos else apos
+    })
+
+
+async def arduino_telemetria(request):
+    """
+    Durações das fases do ciclo (pegar, espera_qr, girar, defletor, soltar,
+    retorno_defletor, voltar e total) em histogramas e percentis, com o
+    gargalo mecânico. Filtros: ?minutos=<n>, ?regiao=<nome>, ?linhas=<n>
+    (inclui as últimas linhas da serial).
+    """
+    regiao = request.GET.get('regiao', '').lower().strip() or None
+    try:
+        minutos = request.GET.get('minutos')
+        desde = time.time() - float(minutos) * 60 if minutos else None
+        linhas = min(max(int(request.GET.get('linhas', 0)), 0), 5000)
+    except ValueError:
+        return JsonResponse({"erro": "Parâmetros 'minutos'/'linhas' inválidos."}, status=400)
+    return JsonResponse(await arduino.get_telemetria_async(desde, regiao, linhas))
+
 
+def _listar_portas_seriais():
+    # pyserial só é importado por quem lista portas (não no import das views)
+    import serial.tools.list_ports
+    return serial.tools.list_ports.comports()
 
-def arduino_listar_portas(request):
+
+async def arduino_listar_portas(request):
     """Lista todas as portas seriais disponíveis no sistema."""
     portas = []
-    for porta in serial.tools.list_ports.comports():
+    for porta in await asyncio.to_thread(_listar_portas_seriais):
         portas.append({
             "dispositivo": porta.device,
             "descricao": porta.description,
@@ -296,86 +736,108 @@ def arduino_listar_portas(request):
         })
     return JsonResponse({
         "portas": portas,
-        "status": arduino.get_status()
+        "status": await arduino.get_status_async()
     })
 
 
-@csrf_exempt
-def arduino_reset(request):
+@csrf_exempt_async
+async def arduino_reset(request):
     """Reseta o Arduino."""
     if request.method == 'POST':
-        sucesso, resposta = arduino.enviar_comando("RESET")
+        sucesso, resposta = await arduino.enviar_comando_async("RESET")
         return JsonResponse({
             "sucesso": sucesso,
             "resposta": resposta,
-            "status": arduino.get_status()
+            "status": await arduino.get_status_async()
         })
     return JsonResponse({"erro": "Use POST"}, status=405)
 
 
-@csrf_exempt
-def arduino_interromper(request):
+@csrf_exempt_async
+async def arduino_interromper(request):
     """Interrompe o ciclo atual do Arduino."""
     if request.method == 'POST':
-        sucesso, resposta = arduino.enviar_comando("PARAR")
+        sucesso, resposta = await arduino.enviar_comando_async("PARAR")
         arduino.aguardando_qr = False
         return JsonResponse({
             "sucesso": sucesso,
             "resposta": resposta,
             "mensagem": "Ciclo interrompido" if sucesso else "Falha ao interromper",
-            "status": arduino.get_status()
+            "status": await arduino.get_status_async()
         })
     return JsonResponse({"erro": "Use POST"}, status=405)
 
 
-@csrf_exempt
-def arduino_upload(request):
-    """Faz upload do código para o Arduino via PlatformIO."""
+# Limite do upload via PlatformIO (s)
+TIMEOUT_UPLOAD = 120
+
+
+def _job_upload(job):
+    # Desconecta para liberar a porta serial e reconecta ao fim, mesmo com erro
+    arduino.desconectar()
+    try:
+        resultado = _executar_upload(job)
+    finally:
+        arduino.solicitar_conexao()
+    resultado["status"] = arduino.get_status()
+    return resultado
+
+
+def _executar_upload(job):
+    # Caminho do projeto Arduino
+    arduino_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'arduino')
+
+    try:
+        proc = subprocess.Popen(
+            ['platformio', 'run', '--target', 'upload'],
+            cwd=arduino_dir,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            errors='ignore',
+        )
+    except FileNotFoundError:
+        return {
+            "sucesso": False,
+            "erro": "PlatformIO não encontrado. Instale com: pip install platformio",
+        }
+
+    estourou = threading.Event()
+
+    def matar():
+        estourou.set()
+        proc.kill()
+
+    limite = threading.Timer(TIMEOUT_UPLOAD, matar)
+    limite.start()
+    saida = []
+    try:
+        for linha in proc.stdout:
+            linha = linha.rstrip()
+            saida.append(linha)
+            job.progresso(linha)
+        proc.wait()
+    finally:
+        limite.cancel()
+
+    if estourou.is_set():
+        return {
+            "sucesso": False,
+            "erro": "Timeout: Upload demorou mais de 2 minutos",
+        }
+
+    stdout = "\n".join(saida)
+    sucesso = proc.returncode == 0
+    return {
+        "sucesso": sucesso,
+        "mensagem": "Upload concluído!" if sucesso else "Erro no upload",
+        "stdout": stdout[-2000:],
+    }
+
+
+@csrf_exempt_async
+async def arduino_upload(request):
+    """Faz upload do código para o Arduino via PlatformIO (responde 202 com o id do job)."""
     if request.method == 'POST':
-        import subprocess
-        import os
-        
-        # Caminho do projeto Arduino
-        arduino_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'arduino')
-        
-        try:
-            # Desconecta para liberar a porta serial
-            arduino.desconectar()
-            
-            # Executa o upload via PlatformIO
-            resultado = subprocess.run(
-                ['platformio', 'run', '--target', 'upload'],
-                cwd=arduino_dir,
-                capture_output=True,
-                text=True,
-                timeout=120
-            )
-            
-            sucesso = resultado.returncode == 0
-            
-            return JsonResponse({
-                "sucesso": sucesso,
-                "mensagem": "Upload concluído!" if sucesso else "Erro no upload",
-                "stdout": resultado.stdout[-2000:] if resultado.stdout else "",
-                "stderr": resultado.stderr[-500:] if resultado.stderr else "",
-                "status": arduino.get_status()
-            })
-        except subprocess.TimeoutExpired:
-            return JsonResponse({
-                "sucesso": False,
-                "erro": "Timeout: Upload demorou mais de 2 minutos",
-                "status": arduino.get_status()
-            })
-        except FileNotFoundError:
-            return JsonResponse({
-                "sucesso": False,
-                "erro": "PlatformIO não encontrado. Instale com: pip install platformio",
-                "status": arduino.get_status()
-            })
-        except Exception as e:
-            return JsonResponse({
-                "sucesso": False,
-                "erro": str(e),
-                "status": arduino.get_status()
-            })
+        return await _criar_job("upload", _job_upload)
     return JsonResponse({"erro": "Use POST"}, status=405)
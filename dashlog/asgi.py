@@ -3,14 +3,28 @@ ASGI config for dashlog project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+As rotas /api/arduino/* são views async: servidas por aqui elas aguardam a
+serial sem ocupar uma thread do servidor. Para subir via ASGI:
+
+    uvicorn dashlog.asgi:application --host 0.0.0.0 --port 8001
+    python start.py --asgi
+
+Com DEBUG ligado /static/ é servido daqui, como faz o runserver. Em produção
+(DEBUG=False) rode ``collectstatic`` e sirva STATIC_ROOT por um servidor web.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
 import os
 
+from django.conf import settings
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'dashlog.settings')
 
 application = get_asgi_application()
+
+if settings.DEBUG:
+    application = ASGIStaticFilesHandler(application)
@@ -81,6 +81,69 @@ DATABASES = {
     }
 }
 
+# Perfil do banco. Com DASHLOG_DB_PROFILE=producao o SQLite é ajustado para
+# ingestão concorrente (vários leitores de QR + dashboard): WAL, busy timeout,
+# mmap e cache maiores. Os PRAGMAs são aplicados a cada nova conexão por
+# dashboard.db.aplicar_pragmas_sqlite. Compare com:
+#   python manage.py benchmark_sqlite
+DB_PROFILE = os.environ.get('DASHLOG_DB_PROFILE', '').lower()
+
+SQLITE_PRAGMAS_PRODUCAO = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,      # ms
+    'mmap_size': 268435456,     # 256 MiB
+    'cache_size': -65536,       # negativo = KiB (64 MiB)
+    'temp_store': 'MEMORY',
+}
+
+SQLITE_PRAGMAS = {}
+
+if DB_PROFILE == 'producao':
+    DATABASES['default']['OPTIONS'] = {'timeout': 20}  # segundos
+    SQLITE_PRAGMAS = SQLITE_PRAGMAS_PRODUCAO
+
+
+# Gravação write-behind. Com DASHLOG_WRITE_BEHIND=1 o POST de pacotes responde
+# 202 assim que valida e uma thread grava em micro-lotes (dashboard.gravador).
+PACOTES_WRITE_BEHIND = os.environ.get('DASHLOG_WRITE_BEHIND', '').lower() in ('1', 'true', 'yes')
+PACOTES_WRITE_BEHIND_LOTE = int(os.environ.get('DASHLOG_WRITE_BEHIND_LOTE', '200'))
+PACOTES_WRITE_BEHIND_INTERVALO_MS = float(os.environ.get('DASHLOG_WRITE_BEHIND_INTERVALO_MS', '5'))
+# Lotes que falham todas as tentativas vão para este arquivo (JSON por linha)
+# e voltam para a fila na próxima partida: o cliente já recebeu o 202.
+PACOTES_WRITE_BEHIND_FALHAS = os.environ.get(
+    'DASHLOG_WRITE_BEHIND_FALHAS', str(BASE_DIR / 'gravacao_falhas.jsonl')
+)
+
+# Broker serial. Com DASHLOG_SERIAL_BROKER=<caminho do socket> as views não
+# abrem a porta do Arduino: falam com o processo `manage.py serial_broker`,
+# o que permite rodar o Django com vários workers.
+ARDUINO_BROKER_SOCKET = os.environ.get('DASHLOG_SERIAL_BROKER', '')
+
+# Jobs das operações longas do Arduino (iniciar, região, upload): tamanho do
+# pool de threads e quantos jobs podem ficar esperando antes de responder 503.
+ARDUINO_JOBS_WORKERS = int(os.environ.get('DASHLOG_JOBS_WORKERS', '2'))
+ARDUINO_JOBS_MAX_PENDENTES = int(os.environ.get('DASHLOG_JOBS_MAX_PENDENTES', '20'))
+# Arquivo SQLite compartilhado com o estado dos jobs, para que o status e o SSE
+# funcionem em qualquer worker. Com o broker o padrão é jobs.sqlite3; vazio
+# deixa os jobs só na memória do processo (um único worker).
+ARDUINO_JOBS_DB = os.environ.get(
+    'DASHLOG_JOBS_DB',
+    str(BASE_DIR / 'jobs.sqlite3') if ARDUINO_BROKER_SOCKET else '',
+)
+
+# Etiquetas QR renderizadas pelo dashboard (dashboard.etiquetas): limite do
+# cache LRU dos bytes renderizados, em MB.
+ETIQUETAS_CACHE_BYTES = int(float(os.environ.get('DASHLOG_ETIQUETAS_CACHE_MB', '32')) * 1024 * 1024)
+
+# Logs estruturados (log_estruturado.py): eventos JSON por linha, escritos em
+# lote por uma thread. Arquivo rotacionado por tamanho (vazio = só console e a
+# cauda em memória de /api/logs/). Sob o start.py quem grava o arquivo é ele.
+LOG_ARQUIVO = os.environ.get('DASHLOG_LOG_FILE', '')
+LOG_MAX_BYTES = int(float(os.environ.get('DASHLOG_LOG_MAX_MB', '10')) * 1024 * 1024)
+LOG_BACKUPS = int(os.environ.get('DASHLOG_LOG_BACKUPS', '5'))
+LOG_NIVEL = os.environ.get('DASHLOG_LOG_LEVEL', 'INFO').upper()
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
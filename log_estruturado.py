@@ -0,0 +1,319 @@
+"""
+Logs estruturados do DashLog: um evento JSON por linha, escrito em lote.
+
+Quem loga (threads quentes: leitura de QR, ouvinte da serial) só faz um
+``put_nowait`` numa fila limitada (``FilaNaoBloqueante``); se a fila encher,
+o evento é descartado e contado, nunca bloqueia. Uma thread coletora esvazia
+a fila em lotes e, para cada lote, faz uma escrita no arquivo (rotacionado
+por tamanho) e uma no console, e guarda os eventos num buffer circular
+(``Coletor.cauda``), servido pelos endpoints de logs (``/logs`` do
+start.py, ``/api/logs/`` do Django).
+
+Evento:
+    {"seq": 12, "ts": 1718000000.123, "nivel": "INFO", "origem": "qr",
+     "logger": "dashlog.qr", "msg": "QR lido: sul:parana", "pid": 4242,
+     "campos": {...}}
+
+Processos filhos (QR Reader, Django sob o start.py) recebem
+``DASHLOG_LOG_JSON=1`` e escrevem os eventos em JSON no stdout; o pai usa
+``Coletor.linha_filho`` para juntá-los aos seus (linhas que não são JSON,
+como tracebacks e o log do servidor HTTP, viram eventos ``INFO``).
+
+Este módulo só usa a biblioteca padrão (não importa o Django).
+"""
+import atexit
+import itertools
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from logging.handlers import QueueHandler
+
+
+NIVEIS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+
+# Filhos que o pai lê pelo pipe: stdout em JSON
+SAIDA_JSON = os.environ.get('DASHLOG_LOG_JSON', '').lower() in ('1', 'true', 'yes')
+
+_FIM = object()
+
+
+def _nivel(nome):
+    return logging.getLevelName(str(nome).upper()) if isinstance(nome, str) else int(nome)
+
+
+def evento_do_registro(record, origem):
+    """Converte um LogRecord em evento (dict). Campos extras: ``extra={"campos": {...}}``."""
+    evento = {
+        "ts": round(record.created, 3),
+        "nivel": record.levelname,
+        "origem": getattr(record, "origem", None) or origem,
+        "logger": record.name,
+        "msg": record.getMessage(),
+        "pid": record.process,
+    }
+    campos = getattr(record, "campos", None)
+    if campos:
+        evento["campos"] = campos
+    if record.exc_info:
+        evento["exc"] = "".join(traceback.format_exception(*record.exc_info)).rstrip()
+    return evento
+
+
+def rotulo(evento):
+    """Parte do logger depois de ``dashlog.`` (ex.: "arduino"), ou None."""
+    logger = evento.get("logger") or ""
+    return logger.split(".", 1)[1] if logger.startswith("dashlog.") else None
+
+
+def mensagem(evento):
+    """``[rotulo] msg``, com o nível a partir de WARNING e o traceback, se houver."""
+    nivel = evento.get("nivel", "INFO")
+    partes = []
+    if rotulo(evento):
+        partes.append(f"[{rotulo(evento)}]")
+    if nivel not in ("DEBUG", "INFO"):
+        partes.append(f"{nivel}:")
+    partes.append(str(evento.get("msg", "")))
+    linha = " ".join(partes)
+    if evento.get("exc"):
+        linha += "\n" + evento["exc"]
+    return linha
+
+
+def formatar_console(evento):
+    """Linha legível de um processo só: ``[rotulo] msg`` (sem rótulo, a origem)."""
+    if rotulo(evento):
+        return mensagem(evento)
+    return f"[{evento.get('origem')}] {mensagem(evento)}"
+
+
+class ArquivoRotativo:
+    """Arquivo de eventos (JSON por linha) rotacionado por tamanho: x.jsonl, x.jsonl.1, ..."""
+
+    def __init__(self, caminho, max_bytes=10 * 1024 * 1024, backups=5):
+        self.caminho = caminho
+        self.max_bytes = max_bytes
+        self.backups = backups
+        pasta = os.path.dirname(os.path.abspath(caminho))
+        os.makedirs(pasta, exist_ok=True)
+        self._arquivo = open(caminho, 'a', encoding='utf-8')
+        self.tamanho = self._arquivo.tell()
+
+    def escrever(self, texto):
+        """Uma escrita (e um flush) por lote."""
+        dados = len(texto.encode('utf-8'))
+        if self.tamanho and self.tamanho + dados > self.max_bytes:
+            self._rotacionar()
+        self._arquivo.write(texto)
+        self._arquivo.flush()
+        self.tamanho += dados
+
+    def _rotacionar(self):
+        self._arquivo.close()
+        for i in range(self.backups - 1, 0, -1):
+            origem = f"{self.caminho}.{i}"
+            if os.path.exists(origem):
+                os.replace(origem, f"{self.caminho}.{i + 1}")
+        if self.backups:
+            os.replace(self.caminho, f"{self.caminho}.1")
+        else:
+            os.remove(self.caminho)
+        self._arquivo = open(self.caminho, 'a', encoding='utf-8')
+        self.tamanho = 0
+
+    def fechar(self):
+        self._arquivo.close()
+
+
+class FilaNaoBloqueante(QueueHandler):
+    """QueueHandler que descarta (e conta) em vez de bloquear quando a fila enche."""
+
+    def __init__(self, coletor):
+        super().__init__(coletor.fila)
+        self.coletor = coletor
+
+    def prepare(self, record):
+        # O coletor formata; aqui só congela a mensagem (args podem mudar depois)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.coletor.descartados += 1
+
+
+class Coletor(threading.Thread):
+    """
+    Thread que esvazia a fila em lotes e escreve arquivo, console e cauda.
+    Cada lote é tudo o que já estiver na fila (até ``lote`` eventos): com
+    pouco movimento sai um evento por vez, sem atraso; sob carga, as
+    escritas se juntam sozinhas.
+    """
+
+    def __init__(self, origem, arquivo=None, console=True, nivel_console=logging.INFO,
+                 formatar=formatar_console, tamanho_cauda=2000, tamanho_fila=10000,
+                 lote=500, intervalo=0.2, saida_json=SAIDA_JSON):
+        super().__init__(name=f"logs-{origem}", daemon=True)
+        self.origem = origem
+        self.fila = queue.Queue(maxsize=tamanho_fila)
+        self.arquivo = arquivo
+        self.console = console
+        self.nivel_console = _nivel(nivel_console)
+        self.formatar = formatar
+        self.saida_json = saida_json
+        self.lote = lote
+        self.intervalo = intervalo
+        self.descartados = 0
+        self.escritos = 0
+        self._cauda = deque(maxlen=tamanho_cauda)
+        self._lock_cauda = threading.Lock()
+        self._seq = itertools.count(1)
+
+    # ----- entrada -----
+
+    def linha_filho(self, origem, linha):
+        """
+        Linha do stdout de um processo filho (chamado pela thread que lê o
+        pipe). JSON de outro coletor vira evento com ``origem``; o resto
+        vira evento INFO com a linha como mensagem.
+        """
+        evento = None
+        if linha.startswith('{"'):
+            try:
+                evento = json.loads(linha)
+            except ValueError:
+                evento = None
+        if isinstance(evento, dict):
+            evento.pop("seq", None)
+        else:
+            evento = {"ts": round(time.time(), 3), "nivel": "INFO", "msg": linha}
+        evento["origem"] = origem  # a origem do filho já aparece no "logger"
+        try:
+            self.fila.put_nowait(evento)
+        except queue.Full:
+            self.descartados += 1
+
+    # ----- saída -----
+
+    def run(self):
+        while True:
+            try:
+                primeiro = self.fila.get(timeout=self.intervalo)
+            except queue.Empty:
+                continue
+            lote = [primeiro]
+            while len(lote) < self.lote:
+                try:
+                    lote.append(self.fila.get_nowait())
+                except queue.Empty:
+                    break
+            fim = any(item is _FIM for item in lote)
+            self._escrever([item for item in lote if item is not _FIM])
+            if fim:
+                return
+
+    def _escrever(self, itens):
+        if not itens:
+            return
+        eventos = []
+        for item in itens:
+            evento = item if isinstance(item, dict) else evento_do_registro(item, self.origem)
+            evento["seq"] = next(self._seq)
+            eventos.append(evento)
+        with self._lock_cauda:
+            self._cauda.extend(eventos)
+
+        try:
+            if self.arquivo is not None:
+                self.arquivo.escrever("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in eventos))
+            if self.console:
+                visiveis = [e for e in eventos if _nivel(e.get("nivel", "INFO")) >= self.nivel_console]
+                if visiveis:
+                    if self.saida_json:
+                        texto = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in visiveis)
+                    else:
+                        texto = "".join(self.formatar(e) + "\n" for e in visiveis)
+                    sys.stdout.write(texto)
+                    sys.stdout.flush()
+            self.escritos += len(eventos)
+        except Exception as e:
+            # Log não pode derrubar o processo (disco cheio, pipe fechado)
+            try:
+                sys.stderr.write(f"[Logs] Falha ao escrever {len(eventos)} eventos: {e}\n")
+            except Exception:
+                pass
+
+    def parar(self, timeout=2.0):
+        """Escreve o que falta na fila e encerra a thread."""
+        if not self.is_alive():
+            return
+        try:
+            self.fila.put(_FIM, timeout=timeout)
+        except queue.Full:
+            return
+        self.join(timeout)
+        if self.arquivo is not None:
+            self.arquivo.fechar()
+
+    # ----- consulta -----
+
+    def cauda(self, n=200, nivel=None, origem=None, apos=0):
+        """Últimos ``n`` eventos (opcionalmente a partir de um nível, de uma origem ou depois de ``apos``)."""
+        minimo = _nivel(nivel) if nivel else None
+        with self._lock_cauda:
+            eventos = list(self._cauda)
+        if apos:
+            eventos = [e for e in eventos if e["seq"] > apos]
+        if minimo is not None:
+            eventos = [e for e in eventos if _nivel(e.get("nivel", "INFO")) >= minimo]
+        if origem:
+            eventos = [e for e in eventos if str(e.get("origem", "")).lower().startswith(origem.lower())]
+        return eventos[-n:] if n else eventos
+
+    def estatisticas(self):
+        return {
+            "fila": self.fila.qsize(),
+            "escritos": self.escritos,
+            "descartados": self.descartados,
+            "arquivo": self.arquivo.caminho if self.arquivo is not None else None,
+        }
+
+
+_coletor = None
+_lock_config = threading.Lock()
+
+
+def configurar(origem, caminho=None, max_bytes=10 * 1024 * 1024, backups=5, nivel=logging.INFO,
+               logger="dashlog", **opcoes):
+    """
+    Liga o logger ``logger`` (e os filhos, ex.: dashlog.qr) à fila de um
+    coletor e inicia a thread. Idempotente: chamadas seguintes devolvem o
+    mesmo coletor.
+    """
+    global _coletor
+    with _lock_config:
+        if _coletor is not None:
+            return _coletor
+        arquivo = ArquivoRotativo(caminho, max_bytes, backups) if caminho else None
+        _coletor = Coletor(origem, arquivo=arquivo, **opcoes)
+        alvo = logging.getLogger(logger)
+        alvo.addHandler(FilaNaoBloqueante(_coletor))
+        alvo.setLevel(_nivel(nivel))
+        alvo.propagate = False
+        _coletor.start()
+        atexit.register(_coletor.parar)
+        return _coletor
+
+
+def coletor():
+    """Coletor configurado neste processo (ou None)."""
+    return _coletor
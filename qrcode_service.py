@@ -2,11 +2,15 @@
 Serviço para iniciar o script de leitura de QR code em background.
 Este módulo é importado pelo Django AppConfig para auto-start.
 """
+import json
 import os
 import subprocess
 import sys
 import threading
-import time
+import urllib.error
+import urllib.request
+
+import log_estruturado
 
 
 _qr_process = None
@@ -55,21 +59,33 @@ def start_qr_reader_service(
         try:
             print(f"[QR Service] Iniciando: {' '.join(args)}", flush=True)
             
+            # O leitor escreve eventos JSON; o coletor deste processo os junta
+            # aos do Django (arquivo, console e /api/logs/) em lote
+            env = os.environ.copy()
+            env["DASHLOG_LOG_JSON"] = "1"
+            env.pop("DASHLOG_LOG_FILE", None)
+
             # Inicia o processo em background
             _qr_process = subprocess.Popen(
                 args,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
                 text=True,
-                bufsize=1
+                bufsize=1,
+                env=env
             )
             
             # Thread para monitorar o output do processo
             def _monitor_output():
+                coletor = log_estruturado.coletor()
                 try:
                     for line in _qr_process.stdout:
                         line = line.strip()
-                        if line:
+                        if not line:
+                            continue
+                        if coletor is not None:
+                            coletor.linha_filho("QR Reader", line)
+                        else:
                             print(f"[QR Reader] {line}", flush=True)
                 except Exception as e:
                     print(f"[QR Service] Erro ao ler output: {e}", flush=True)
@@ -77,8 +93,12 @@ def start_qr_reader_service(
             monitor_thread = threading.Thread(target=_monitor_output, daemon=True)
             monitor_thread.start()
             
-            # Aguarda um pouco para ver se o processo inicia corretamente
-            time.sleep(1)
+            # Aguarda até 1s para ver se o processo inicia corretamente (um
+            # erro de argumento aparece logo, sem esperar o segundo inteiro)
+            try:
+                _qr_process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                pass
             
             if _qr_process.poll() is not None:
                 print(f"[QR Service] ERRO: processo terminou imediatamente com código {_qr_process.returncode}", flush=True)
@@ -133,3 +153,29 @@ def get_qr_reader_status():
             return {"running": True, "pid": _qr_process.pid}
         else:
             return {"running": False, "pid": None, "exit_code": poll}
+
+
+def qr_reader_config(changes=None, port=5001, host="127.0.0.1", token=None, timeout=5):
+    """
+    Lê (changes=None) ou altera a configuração do leitor em execução pelo
+    /admin/config dele, sem reiniciar o processo. Funciona com qualquer
+    leitor (start.py, auto-start do Django ou manual), não só o deste módulo.
+    Retorna (status HTTP, dict da resposta); lança OSError se o leitor não responde.
+    """
+    token = token or os.environ.get("QR_ADMIN_TOKEN", "")
+    url = f"http://{host}:{port}/admin/config"
+    dados = None if changes is None else json.dumps(changes).encode("utf-8")
+    pedido = urllib.request.Request(url, data=dados, method="GET" if changes is None else "POST")
+    pedido.add_header("Authorization", f"Bearer {token}")
+    if dados is not None:
+        pedido.add_header("Content-Type", "application/json")
+    # Sem proxy: o leitor é local
+    opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+    try:
+        with opener.open(pedido, timeout=timeout) as resp:
+            return resp.status, json.loads(resp.read() or b"{}")
+    except urllib.error.HTTPError as e:
+        try:
+            return e.code, json.loads(e.read() or b"{}")
+        except ValueError:
+            return e.code, {"erro": e.reason}
@@ -1,5 +1,15 @@
+"""
+Leitor de QR: MJPEG da câmera, leitura de QR "regiao:nome" e envio ao backend.
+
+A partida é feita para responder logo: os módulos pesados (cv2, Flask,
+requests) só são importados depois do argparse, e a câmera é aberta na
+thread de captura, com o servidor HTTP já no ar (/saude dá 503 até o
+primeiro frame). /stats mostra os marcos da partida.
+"""
 import argparse
+import hmac
 import json
+import logging
 import os
 import re
 import shutil
@@ -11,9 +21,21 @@ from datetime import datetime, timezone
 from threading import Event, Lock, Thread
 from urllib.parse import urlparse, urlunparse
 
-import cv2
-import requests
-from flask import Flask, Response, abort, jsonify, request
+import log_estruturado
+
+# Marcos da partida (s desde o import do script), servidos em /stats
+INICIO = time.monotonic()
+MARCOS = {}
+
+
+def _marcar(nome):
+    MARCOS.setdefault(nome, round(time.monotonic() - INICIO, 3))
+
+
+# Eventos vão para a fila do coletor (log_estruturado): a thread de leitura
+# não espera o terminal nem o pipe do processo pai
+log_qr = logging.getLogger("dashlog.qr")
+log_backend = logging.getLogger("dashlog.backend")
 
 # =========================================================
 # URLs públicas (strings para reuso em memória)
@@ -32,6 +54,12 @@ BACKEND_URL_DEFAULT = os.environ.get(
     "http://127.0.0.1:8001/api/arduino/pacote/"
 )
 
+# Rota única: grava o pacote e enfileira o REGIAO numa requisição só
+SINGLE_HOP_DEFAULT = os.environ.get("QR_SINGLE_HOP", "").lower() in ("1", "true", "yes")
+
+# Estação (braço + câmera) deste leitor, para a linha com várias estações
+ESTACAO_DEFAULT = os.environ.get("QR_ESTACAO", "")
+
 # =========================
 # Helpers IP Webcam
 # =========================
@@ -90,6 +118,8 @@ def open_capture(source):
     - macOS: usa CAP_AVFOUNDATION
     - Linux/outros: backend padrão
     """
+    import cv2
+
     if isinstance(source, int):
         if sys.platform.startswith("win"):
             # Windows
@@ -130,31 +160,160 @@ def open_stream_with_fallback(url: str):
 # Captura em thread
 # =========================
 class Camera:
-    def __init__(self, source, fps=12, width=None, height=None):
-        self.cap = open_capture(source) if isinstance(source, int) else open_stream_with_fallback(source)
-        if self.cap is None or not self.cap.isOpened():
-            raise RuntimeError("Não foi possível abrir a câmera/stream.")
+    """
+    Captura em thread. A câmera é aberta pela própria thread (webcam e sondagem
+    das URLs de IP Webcam levam segundos); enquanto não abre, tenta de novo
+    com espera dobrando até ``retry_max`` s e ``state`` fica "opening" ou
+    "error".
+
+    Reconfiguração sem reiniciar o processo: ``fps`` vale no próximo frame,
+    ``resize()`` ajusta a captura atual e ``swap()`` troca a fonte com buffer
+    duplo (a nova abre em paralelo e só substitui a atual depois de entregar
+    um frame; até lá a atual continua servindo).
+    """
 
-        if width:
-            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, int(width))
-        if height:
-            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, int(height))
+    def __init__(self, source, fps=12, width=None, height=None, retry_max=5.0):
+        self.source = source
+        self.width = width
+        self.height = height
+        self.retry_max = retry_max
+        self.cap = None
+        self.state = "opening"
+        self.error = None
+        self.frames = 0
+        self.swap_state = None  # None | "opening" | "done" | "error"
+        self.swap_source = None
+        self.swap_error = None
+        self.on_swap = None  # on_swap(source) depois de uma troca bem-sucedida
 
         self.fps = max(1, int(fps))
         self._ret = False
+        self._last_frame_at = None  # monotonic do último frame (health check)
         self._frame = None
+        self._pending = None      # captura nova pronta para entrar (swap)
+        self._pending_size = None  # (width, height) a aplicar na captura atual
         self._lock = Lock()
         self._stop = Event()
         self._t = Thread(target=self._reader, daemon=True)
         self._t.start()
 
+    @staticmethod
+    def _open(source, width, height):
+        import cv2
+
+        cap = open_capture(source) if isinstance(source, int) else open_stream_with_fallback(source)
+        if cap is None or not cap.isOpened():
+            raise RuntimeError("Não foi possível abrir a câmera/stream.")
+        if width:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, int(width))
+        if height:
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, int(height))
+        return cap
+
+    # ----- reconfiguração -----
+
+    def resize(self, width, height):
+        """Nova resolução na captura atual (aplicada pela thread de captura)."""
+        with self._lock:
+            self.width, self.height = width, height
+            self._pending_size = (width, height)
+
+    def swap(self, source, timeout=10.0):
+        """
+        Abre ``source`` em background e troca quando ela entregar um frame.
+        Retorna False se já há uma troca em andamento.
+        """
+        with self._lock:
+            if self.swap_state == "opening":
+                return False
+            self.swap_state, self.swap_source, self.swap_error = "opening", source, None
+            width, height = self.width, self.height
+        Thread(target=self._prepare_swap, args=(source, width, height, timeout), daemon=True).start()
+        return True
+
+    def _prepare_swap(self, source, width, height, timeout):
+        cap = None
+        try:
+            cap = self._open(source, width, height)
+            deadline = time.monotonic() + timeout
+            ret, frame = cap.read()
+            while not ret:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"A nova fonte não entregou frames em {timeout:.0f}s.")
+                time.sleep(0.1)
+                ret, frame = cap.read()
+        except Exception as e:
+            if cap is not None:
+                cap.release()
+            with self._lock:
+                self.swap_state, self.swap_error = "error", str(e)
+            log_qr.error("Troca de câmera para %s falhou, mantendo %s: %s", source, self.source, e)
+            return
+        with self._lock:
+            self._pending = (cap, source, frame)
+
+    def _apply_pending(self):
+        """Chamado pela thread de captura: entra a captura nova e/ou a resolução nova."""
+        import cv2
+
+        with self._lock:
+            pending, self._pending = self._pending, None
+            size, self._pending_size = self._pending_size, None
+        if pending is not None:
+            cap, source, frame = pending
+            old, self.cap = self.cap, cap
+            with self._lock:
+                self.source = source
+                self.state, self.error = "open", None
+                self.swap_state = "done"
+                self._ret, self._frame = True, frame
+                self._last_frame_at = time.monotonic()
+            if old is not None:
+                old.release()
+            _marcar("camera_aberta")
+            log_qr.info("Câmera trocada: %s", source)
+            if self.on_swap is not None:
+                self.on_swap(source)
+        elif size is not None and self.cap is not None:
+            width, height = size
+            if width:
+                self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, int(width))
+            if height:
+                self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, int(height))
+            log_qr.info("Resolução pedida: %sx%s", width, height)
+
+    # ----- captura -----
+
     def _reader(self):
+        delay = 1.0
+        while self.cap is None and not self._stop.is_set():
+            if self._pending is not None:  # uma troca chegou antes de a fonte inicial abrir
+                self._apply_pending()
+                break
+            try:
+                cap = self._open(self.source, self.width, self.height)
+            except Exception as e:
+                self.state, self.error = "error", str(e)
+                log_qr.warning("%s Nova tentativa em %.0fs.", e, delay)
+                self._stop.wait(delay)
+                delay = min(delay * 2, self.retry_max)
+                continue
+            self.cap = cap
+            self.state, self.error = "open", None
+            _marcar("camera_aberta")
+            log_qr.info("Câmera aberta: %s", self.source)
+
         while not self._stop.is_set():
+            if self._pending is not None or self._pending_size is not None:
+                self._apply_pending()
             ret, frame = self.cap.read()
             if ret:
                 with self._lock:
                     self._ret = True
                     self._frame = frame
+                    self._last_frame_at = time.monotonic()
+                    self.frames += 1
+                _marcar("primeiro_frame")
             else:
                 time.sleep(0.25)
             time.sleep(1.0 / self.fps)
@@ -165,6 +324,11 @@ class Camera:
                 return None
             return self._frame.copy()
 
+    def frame_age(self):
+        """Segundos desde o último frame, ou None se nenhum chegou ainda."""
+        with self._lock:
+            return None if self._last_frame_at is None else time.monotonic() - self._last_frame_at
+
     def release(self):
         self._stop.set()
         try:
@@ -172,7 +336,10 @@ class Camera:
         except Exception:
             pass
         try:
-            self.cap.release()
+            if self.cap is not None:
+                self.cap.release()
+            if self._pending is not None:
+                self._pending[0].release()
         except Exception:
             pass
 
@@ -181,12 +348,18 @@ class Camera:
 # Leitor de QR (thread) — QR "regiao:nome" (com fallback p/ "regiao-nome")
 # =========================
 class QRReader:
-    def __init__(self, cam: Camera, min_log_interval=2.0, backend_url: str | None = None):
+    def __init__(self, cam: Camera, min_log_interval=2.0, backend_url: str | None = None,
+                 single_hop: bool = False, estacao: str = ""):
         self.cam = cam
-        self.detector = cv2.QRCodeDetector()
+        self.detector = None  # cv2.QRCodeDetector, criado pela thread
         self.min_log_interval = float(min_log_interval)
 
         self.backend_url = backend_url
+        self.single_hop = single_hop
+        self.estacao = estacao
+        self._session = None
+        self.reads = 0
+        self.decoded = 0  # frames passados pelo detector (taxa de decodificação)
 
         self.last_raw = None            # string inteira do QR (ex.: "sul:paraiba")
         self.last_regiao = None         # parte antes do separador
@@ -225,27 +398,39 @@ class QRReader:
         nome = (nome or "").strip() or None
         return regiao, nome
 
+    @property
+    def _http(self):
+        # requests só é importado no primeiro envio ao backend
+        if self._session is None:
+            import requests
+            self._session = requests.Session()  # keep-alive: sem handshake TCP por leitura
+        return self._session
+
     def _send_to_backend(self, payload: dict):
         """
         Envia o objeto lido para o backend Django (POST JSON).
         Também envia a região para o Arduino via API.
         """
         if not self.backend_url:
-            print("[BACKEND] URL não configurada, não enviando.", flush=True)
+            log_backend.warning("URL não configurada, não enviando.")
             return
 
         url = str(self.backend_url).strip()
         if not url:
-            print("[BACKEND] URL vazia após strip(), não enviando.", flush=True)
+            log_backend.warning("URL vazia após strip(), não enviando.")
             return
         if not url.endswith("/"):
             url += "/"
 
+        if self.single_hop:
+            self._send_single_hop(url, payload)
+            return
+
         try:
             # 1. Envia pacote para o backend Django
-            print(f"[BACKEND] Enviando para {url}: {payload}", flush=True)
-            resp = requests.post(url, json=payload, timeout=5)
-            print(f"[BACKEND] Resposta {resp.status_code}: {resp.text[:200]!r}", flush=True)
+            log_backend.info("Enviando para %s: %s", url, payload)
+            resp = self._http.post(url, json=payload, timeout=5)
+            log_backend.info("Resposta %s: %r", resp.status_code, resp.text[:200], extra={"campos": {"status": resp.status_code}})
             resp.raise_for_status()
             
             # 2. Envia região para o Arduino via API
@@ -254,7 +439,29 @@ class QRReader:
                 self._send_regiao_to_arduino(regiao)
                 
         except Exception as e:
-            print(f"[BACKEND ERRO] {e}", flush=True)
+            log_backend.error("%s", e)
+
+    def _send_single_hop(self, url: str, payload: dict):
+        """
+        Caminho rápido: POST único em /api/arduino/pacote-regiao/, que grava o
+        pacote e enfileira o REGIAO:<x>. Loga o tempo da leitura até a
+        resposta; a latência até o eco no Arduino fica no job (status_url).
+        """
+        if not payload.get("regiao"):
+            return
+        fast_url = f"{url.rsplit('/api/', 1)[0]}/api/arduino/pacote-regiao/"
+        try:
+            resp = self._http.post(fast_url, json=payload, timeout=5)
+            data = resp.json()
+            decorrido = (time.time() - payload["lido_em"]) * 1000
+            log_backend.info(
+                "%s pacote+região em %.1f ms (job %s, servidor %s)",
+                resp.status_code, decorrido, data.get('job_id'), data.get('servidor_ms'),
+                extra={"campos": {"status": resp.status_code, "latencia_ms": round(decorrido, 1)}},
+            )
+            resp.raise_for_status()
+        except Exception as e:
+            log_backend.error("%s", e)
 
     def _send_regiao_to_arduino(self, regiao: str):
         """
@@ -269,20 +476,28 @@ class QRReader:
             arduino_url = f"{base_url}/api/arduino/regiao/"
             
             payload = {"regiao": regiao}
-            print(f"[ARDUINO] Enviando região para {arduino_url}: {regiao}", flush=True)
+            log_backend.info("Enviando região para %s: %s", arduino_url, regiao)
             
-            resp = requests.post(arduino_url, json=payload, timeout=10)
+            resp = self._http.post(arduino_url, json=payload, timeout=10)
             data = resp.json()
             
-            if data.get("sucesso"):
-                print(f"[ARDUINO] Região enviada com sucesso!", flush=True)
+            if resp.status_code == 202:
+                # O movimento roda num job; acompanhe em data["status_url"]
+                log_backend.info("Região enfileirada (job %s)", data.get('job_id'))
+            elif data.get("sucesso"):
+                log_backend.info("Região enviada com sucesso!")
             else:
-                print(f"[ARDUINO] Resposta: {data}", flush=True)
+                log_backend.info("Resposta do Arduino: %s", data)
                 
         except Exception as e:
-            print(f"[ARDUINO ERRO] {e}", flush=True)
+            log_backend.error("Arduino: %s", e)
 
     def _loop(self):
+        # cv2 fora da thread principal: o servidor HTTP não espera
+        import cv2
+
+        self.detector = cv2.QRCodeDetector()
+
         while not self._stop.is_set():
             frame = self.cam.get_frame()
             if frame is None:
@@ -290,6 +505,7 @@ class QRReader:
                 continue
 
             data, points, _ = self.detector.detectAndDecode(frame)
+            self.decoded += 1
 
             with self._lock:
                 self.last_pts = points.reshape(-1, 2).astype(int) if points is not None and len(points) > 0 else None
@@ -303,8 +519,10 @@ class QRReader:
                     self.last_nome = nome
                     self.last_codigo = ts_iso
                     self.last_time = now
+                    self.reads += 1
+                    _marcar("primeira_leitura")
 
-                    print(f"[QR LIDO] {data}", flush=True)  # único log de QR
+                    log_qr.info("QR lido: %s", data, extra={"campos": {"regiao": regiao, "nome": nome}})  # único log de QR
 
                     # monta o objeto e envia para o backend
                     payload = {
@@ -312,6 +530,10 @@ class QRReader:
                         "nome": nome,
                         "codigo": ts_iso,
                     }
+                    if self.estacao:
+                        payload["estacao"] = self.estacao
+                    if self.single_hop:
+                        payload["lido_em"] = now  # epoch da leitura, p/ medir latência
                     self._send_to_backend(payload)
 
             time.sleep(0.02)
@@ -328,6 +550,9 @@ class QRReader:
                 "codigo": self.last_codigo,
             }
 
+    def is_alive(self):
+        return self._t.is_alive()
+
     def stop(self):
         self._stop.set()
         try:
@@ -339,15 +564,12 @@ class QRReader:
 # =========================
 # Flask (MJPEG)
 # =========================
-app = Flask(__name__)
-
+app = None  # criado por create_app(), depois do argparse
 
-def _check_token():
-    token = app.config.get("STREAM_TOKEN")
-    return True if not token else (request.args.get("token") == token)
 
+def mjpeg_generator(cam: Camera):
+    import cv2
 
-def mjpeg_generator(cam: Camera, jpeg_quality=80):
     boundary = b"--frame"
     while True:
         frame = cam.get_frame()
@@ -375,6 +597,8 @@ def mjpeg_generator(cam: Camera, jpeg_quality=80):
                     2,
                 )
 
+        # Lida a cada frame: /admin/config muda a qualidade sem reabrir o stream
+        jpeg_quality = app.config.get("JPEG_QUALITY", 80)
         ok, jpg = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), int(jpeg_quality)])
         if not ok:
             continue
@@ -386,35 +610,299 @@ def mjpeg_generator(cam: Camera, jpeg_quality=80):
         )
 
 
-@app.route("/")
-def index():
-    token = app.config.get("STREAM_TOKEN")
-    tip = "/video.mjpg" + (f"?token={token}" if token else "")
-    return f"OK: acesse {tip}"
+# =========================
+# Reconfiguração em tempo de execução (/admin/config)
+# =========================
+CONFIG_KEYS = ("source", "fps", "width", "height", "jpeg_quality", "backend_url")
+
+# Mudanças feitas por /admin/config ficam neste arquivo e valem de novo na
+# próxima partida (inclusive quando o start.py reinicia o leitor)
+CONFIG_FILE_DEFAULT = os.environ.get("QR_CONFIG_FILE") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "qr_config.json"
+)
+
 
+def normalize_backend_url(url):
+    """Sem espaços e com / no final (vazio = não envia)."""
+    url = (url or "").strip()
+    if url and not url.endswith("/"):
+        url += "/"
+    return url
 
-@app.route("/video.mjpg")
-def video_mjpg():
-    if not _check_token():
-        abort(401)
-    cam: Camera = app.config["CAMERA"]
-    resp = Response(
-        mjpeg_generator(cam, jpeg_quality=app.config.get("JPEG_QUALITY", 80)),
-        mimetype="multipart/x-mixed-replace; boundary=frame",
-    )
-    resp.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
-    resp.headers["Pragma"] = "no-cache"
-    resp.headers["Connection"] = "keep-alive"
-    return resp
 
+def _parse_source(value):
+    value = str(value).strip()
+    if not value:
+        raise ValueError("source vazio")
+    return int(value) if value.isdigit() else value
 
-@app.route("/last_code")
-def last_code():
-    """Retorna {regiao, nome, codigo} do último QR lido (em memória)."""
+
+def _parse_int(name, value, low, high, allow_none=False):
+    if value is None or value == "":
+        if allow_none:
+            return None
+        raise ValueError(f"{name} é obrigatório")
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} deve ser inteiro") from None
+    if not low <= number <= high:
+        raise ValueError(f"{name} deve estar entre {low} e {high}")
+    return number
+
+
+def parse_config(body):
+    """Valida um pedido de /admin/config; retorna as mudanças ou lança ValueError."""
+    if not isinstance(body, dict) or not body:
+        raise ValueError(f"Envie um objeto JSON com alguma de: {', '.join(CONFIG_KEYS)}")
+    unknown = sorted(set(body) - set(CONFIG_KEYS))
+    if unknown:
+        raise ValueError(f"Chaves desconhecidas: {', '.join(unknown)}")
+    changes = {}
+    if "source" in body:
+        changes["source"] = _parse_source(body["source"])
+    if "fps" in body:
+        changes["fps"] = _parse_int("fps", body["fps"], 1, 60)
+    for name in ("width", "height"):
+        if name in body:
+            changes[name] = _parse_int(name, body[name], 16, 8192, allow_none=True)
+    if "jpeg_quality" in body:
+        changes["jpeg_quality"] = _parse_int("jpeg_quality", body["jpeg_quality"], 1, 100)
+    if "backend_url" in body:
+        url = normalize_backend_url(body["backend_url"])
+        if url and urlparse(url).scheme not in ("http", "https"):
+            raise ValueError("backend_url deve ser http(s)")
+        changes["backend_url"] = url
+    return changes
+
+
+def current_config():
+    cam: Camera = app.config["CAMERA"]
     qr = app.config.get("QR_READER")
-    if not qr:
-        return jsonify({"regiao": None, "nome": None, "codigo": None})
-    return jsonify(qr.get_last_obj())
+    return {
+        "source": cam.source,
+        "fps": cam.fps,
+        "width": cam.width,
+        "height": cam.height,
+        "jpeg_quality": app.config.get("JPEG_QUALITY", 80),
+        "backend_url": qr.backend_url if qr else None,
+        "swap": {"state": cam.swap_state, "source": cam.swap_source, "error": cam.swap_error},
+    }
+
+
+def apply_config(changes):
+    """
+    Aplica as mudanças validadas. Retorna True se uma troca de câmera foi
+    iniciada (ela termina em background; acompanhe em GET /admin/config).
+    """
+    cam: Camera = app.config["CAMERA"]
+    qr = app.config.get("QR_READER")
+    swapping = False
+    if "source" in changes and changes["source"] != cam.source:
+        if "width" in changes or "height" in changes:
+            cam.width = changes.get("width", cam.width)
+            cam.height = changes.get("height", cam.height)
+        if not cam.swap(changes["source"]):
+            raise RuntimeError("Já há uma troca de câmera em andamento")
+        swapping = True
+    elif "width" in changes or "height" in changes:
+        cam.resize(changes.get("width", cam.width), changes.get("height", cam.height))
+    if "fps" in changes:
+        cam.fps = changes["fps"]
+    if "jpeg_quality" in changes:
+        app.config["JPEG_QUALITY"] = changes["jpeg_quality"]
+    if "backend_url" in changes and qr is not None:
+        qr.backend_url = changes["backend_url"] or None
+    log_qr.info("Configuração alterada: %s", changes)
+    return swapping
+
+
+# save_config roda nas threads do Flask e na de captura (Camera.on_swap)
+_CONFIG_LOCK = Lock()
+
+
+def _read_config_file(path):
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError("o arquivo deve conter um objeto JSON")
+    return {"valores": data.get("valores") or {}, "argumentos": data.get("argumentos") or {}}
+
+
+def _write_config_file(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def load_saved_config(path, cli):
+    """
+    Valores gravados por /admin/config que ainda valem com os argumentos
+    ``cli`` desta partida. Cada valor guarda o argumento que substituiu: se
+    o argumento mudou desde então (outra --source, outro --django-port no
+    start.py), vale o argumento e o valor salvo sai do arquivo.
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    with _CONFIG_LOCK:
+        try:
+            data = _read_config_file(path)
+            values = parse_config(data["valores"]) if data["valores"] else {}
+        except (OSError, ValueError) as e:
+            log_qr.warning("Ignorando a configuração salva em %s: %s", path, e)
+            return {}
+        base = data["argumentos"]
+        stale = [key for key in values if key not in base or base[key] != cli[key]]
+        for key in stale:
+            log_qr.warning(
+                "Configuração salva %s=%r ignorada: o argumento mudou (%r → %r)",
+                key, values[key], base.get(key), cli[key],
+            )
+            del values[key]
+            data["valores"].pop(key, None)
+            base.pop(key, None)
+        if stale:
+            try:
+                _write_config_file(path, data)
+            except OSError as e:
+                log_qr.error("Não foi possível atualizar %s: %s", path, e)
+        return values
+
+
+def save_config(changes):
+    """
+    Junta ``changes`` ao arquivo de configuração (escrita atômica), com o
+    valor dos argumentos desta partida que elas substituem.
+    """
+    path = app.config.get("CONFIG_FILE")
+    if not path or not changes:
+        return
+    cli = app.config.get("CONFIG_ARGS", {})
+    with _CONFIG_LOCK:
+        data = {"valores": {}, "argumentos": {}}
+        if os.path.exists(path):
+            try:
+                data = _read_config_file(path)
+            except (OSError, ValueError):
+                pass
+        data["valores"].update(changes)
+        data["argumentos"].update({key: cli.get(key) for key in changes})
+        try:
+            _write_config_file(path, data)
+        except OSError as e:
+            log_qr.error("Não foi possível salvar a configuração em %s: %s", path, e)
+
+
+def create_app():
+    """Cria o app Flask e as rotas (o import do Flask fica para depois do argparse)."""
+    global app
+    from flask import Flask, Response, abort, jsonify, request
+
+    app = Flask(__name__)
+
+    def _check_token():
+        token = app.config.get("STREAM_TOKEN")
+        return True if not token else (request.args.get("token") == token)
+
+    def _check_admin_token():
+        # Sem QR_ADMIN_TOKEN o admin fica desligado (o leitor escuta em 0.0.0.0)
+        token = app.config.get("ADMIN_TOKEN")
+        sent = request.headers.get("Authorization", "")
+        return bool(token) and hmac.compare_digest(sent.encode(), f"Bearer {token}".encode())
+
+    @app.route("/")
+    def index():
+        token = app.config.get("STREAM_TOKEN")
+        tip = "/video.mjpg" + (f"?token={token}" if token else "")
+        return f"OK: acesse {tip}"
+
+    @app.route("/video.mjpg")
+    def video_mjpg():
+        if not _check_token():
+            abort(401)
+        cam: Camera = app.config["CAMERA"]
+        resp = Response(
+            mjpeg_generator(cam),
+            mimetype="multipart/x-mixed-replace; boundary=frame",
+        )
+        resp.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
+        resp.headers["Pragma"] = "no-cache"
+        resp.headers["Connection"] = "keep-alive"
+        return resp
+
+    @app.route("/saude")
+    def saude():
+        """
+        Health check (start.py). 503 se a câmera parou de entregar frames (stream
+        caiu, webcam travou), ainda não abriu ou a thread do leitor morreu: o
+        processo continua vivo, mas a estação está cega.
+        """
+        cam: Camera = app.config["CAMERA"]
+        qr = app.config.get("QR_READER")
+        age = cam.frame_age()
+        max_age = app.config.get("MAX_FRAME_AGE", 5.0)
+        ok = age is not None and age <= max_age and qr is not None and qr.is_alive()
+        body = {
+            "ok": ok,
+            "pid": os.getpid(),
+            "camera": cam.state,
+            "camera_error": cam.error,
+            "frame_age_s": None if age is None else round(age, 2),
+            "max_frame_age_s": max_age,
+            "reader_alive": bool(qr and qr.is_alive()),
+        }
+        return jsonify(body), (200 if ok else 503)
+
+    @app.route("/stats")
+    def stats():
+        """Marcos da partida (s desde o import do script) e contadores."""
+        cam: Camera = app.config["CAMERA"]
+        qr = app.config.get("QR_READER")
+        return jsonify({
+            "pid": os.getpid(),
+            "uptime_s": round(time.monotonic() - INICIO, 1),
+            "startup": dict(MARCOS),
+            "camera": cam.state,
+            "camera_error": cam.error,
+            "frames": cam.frames,
+            "decoded": qr.decoded if qr else 0,
+            "reads": qr.reads if qr else 0,
+        })
+
+    @app.route("/admin/config", methods=["GET", "POST"])
+    def admin_config():
+        """
+        Lê (GET) ou altera (POST JSON) source, fps, width, height, jpeg_quality
+        e backend_url sem reiniciar o processo. Autenticação:
+        ``Authorization: Bearer <QR_ADMIN_TOKEN>``.
+        """
+        if not app.config.get("ADMIN_TOKEN"):
+            return jsonify({"erro": "Admin desligado: defina QR_ADMIN_TOKEN (ou --admin-token)."}), 403
+        if not _check_admin_token():
+            return jsonify({"erro": "Token inválido."}), 401
+        if request.method == "GET":
+            return jsonify(current_config())
+        try:
+            changes = parse_config(request.get_json(silent=True))
+            swapping = apply_config(changes)
+            # A fonte só é salva quando a troca termina bem (Camera.on_swap)
+            save_config({k: v for k, v in changes.items() if k != "source"})
+        except ValueError as e:
+            return jsonify({"erro": str(e)}), 400
+        except RuntimeError as e:
+            return jsonify({"erro": str(e)}), 409
+        return jsonify({"aplicado": changes, "config": current_config()}), (202 if swapping else 200)
+
+    @app.route("/last_code")
+    def last_code():
+        """Retorna {regiao, nome, codigo} do último QR lido (em memória)."""
+        qr = app.config.get("QR_READER")
+        if not qr:
+            return jsonify({"regiao": None, "nome": None, "codigo": None})
+        return jsonify(qr.get_last_obj())
+
+    return app
 
 
 # =========================
@@ -524,7 +1012,27 @@ def main():
     parser.add_argument("--width", type=int, default=None)
     parser.add_argument("--height", type=int, default=None)
     parser.add_argument("--jpeg-quality", type=int, default=80)
+    parser.add_argument(
+        "--max-frame-age",
+        type=float,
+        default=5.0,
+        help="/saude responde 503 se o último frame for mais velho que isso (s).",
+    )
     parser.add_argument("--token", default=os.environ.get("STREAM_TOKEN"))
+    parser.add_argument(
+        "--admin-token",
+        default=os.environ.get("QR_ADMIN_TOKEN"),
+        help="Token do POST /admin/config (reconfiguração sem reiniciar). Env: QR_ADMIN_TOKEN",
+    )
+    parser.add_argument(
+        "--config-file",
+        default=CONFIG_FILE_DEFAULT,
+        help=(
+            "Arquivo onde /admin/config guarda as mudanças; na próxima partida elas "
+            "valem enquanto o argumento que substituíram não mudar (vazio = não "
+            "guarda). Env: QR_CONFIG_FILE"
+        ),
+    )
     parser.add_argument("--tunnel", action="store_true")
     parser.add_argument("--cloudflared", default=None)
     parser.add_argument("--tunnel-protocol", default="http2", choices=["quic", "http2"])
@@ -534,26 +1042,67 @@ def main():
         default=BACKEND_URL_DEFAULT,
         help="URL para enviar o objeto lido do QR (POST JSON).",
     )
+    parser.add_argument(
+        "--single-hop",
+        action="store_true",
+        default=SINGLE_HOP_DEFAULT,
+        help="Usa /api/arduino/pacote-regiao/ (grava e enfileira a região num POST só). Env: QR_SINGLE_HOP",
+    )
+    parser.add_argument(
+        "--estacao",
+        default=ESTACAO_DEFAULT,
+        help="Nome da estação desta câmera (arduino/multi_estacao.py). Env: QR_ESTACAO",
+    )
+
+    parser.add_argument(
+        "--log-file",
+        default=os.environ.get("DASHLOG_LOG_FILE") or None,
+        help="Arquivo de eventos JSON (rotacionado por tamanho). Env: DASHLOG_LOG_FILE",
+    )
 
     args = parser.parse_args()
 
+    log_estruturado.configurar("qr", caminho=args.log_file)
+
     # Normaliza a backend-url (evita problemas com espaços e falta de /)
-    if args.backend_url:
-        args.backend_url = args.backend_url.strip()
-        if args.backend_url and not args.backend_url.endswith("/"):
-            args.backend_url += "/"
+    args.backend_url = normalize_backend_url(args.backend_url)
 
     source = int(args.source) if args.source.isdigit() else args.source
 
+    cli = {
+        "source": source,
+        "fps": args.fps,
+        "width": args.width,
+        "height": args.height,
+        "jpeg_quality": args.jpeg_quality,
+        "backend_url": args.backend_url,
+    }
+    saved = load_saved_config(args.config_file, cli)
+    if saved:
+        log_qr.info("Configuração salva em %s aplicada: %s", args.config_file, saved)
+        source = saved.pop("source", source)
+        for key, value in saved.items():
+            setattr(args, key, value)
+
+    # O Flask é importado antes de a captura começar a disputar a CPU; a
+    # câmera abre em background (pode levar segundos) com o servidor no ar
+    create_app()
     camera = Camera(source, fps=args.fps, width=args.width, height=args.height)
     app.config["CAMERA"] = camera
+    app.config["CONFIG_FILE"] = args.config_file
+    app.config["CONFIG_ARGS"] = cli
+    camera.on_swap = lambda new_source: save_config({"source": new_source})
     app.config["STREAM_TOKEN"] = args.token
+    app.config["ADMIN_TOKEN"] = args.admin_token
     app.config["JPEG_QUALITY"] = args.jpeg_quality
+    app.config["MAX_FRAME_AGE"] = args.max_frame_age
 
     qr_reader = QRReader(
         camera,
         min_log_interval=2.0,
         backend_url=args.backend_url,
+        single_hop=args.single_hop,
+        estacao=args.estacao,
     )
     app.config["QR_READER"] = qr_reader
 
@@ -573,6 +1122,7 @@ def main():
             # se der erro no túnel, apenas segue com o server local
             pass
 
+    _marcar("servidor")
     try:
         app.run(host=args.host, port=args.port, debug=False, threaded=True)
     finally:
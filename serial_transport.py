@@ -0,0 +1,333 @@
+"""
+Transporte serial compartilhado para o Arduino.
+
+Uma única thread por porta fica bloqueada em ``read()``, separa as linhas e as
+entrega a quem está esperando: assinaturas (filas com condition variable,
+para quem lê respostas) e ouvintes (callbacks, para monitores). Não há
+polling de ``in_waiting``: a latência de uma resposta é a do fio e, parada,
+a thread não consome CPU.
+
+Usado pelo ``dashboard.arduino.ArduinoController`` e pelos scripts em
+``arduino/`` (que colocam a raiz do projeto no ``sys.path``).
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+
+
+log = logging.getLogger("dashlog.serial")
+
+
+# Última linha do boot do firmware (setup() em arduino/src/main.cpp)
+BANNER = "READY"
+
+# O boot (reset ao abrir a porta + calibração) leva uns 7 s
+TIMEOUT_BANNER = 15
+
+# Sem nenhuma linha neste intervalo a placa não reiniciou ao abrir a porta
+# (já estava rodando): em vez do banner, sonda com STATUS
+SILENCIO_SONDA = 2.5
+
+
+class Assinatura:
+    """
+    Fila das linhas recebidas desde que a assinatura foi criada.
+    Se a porta fechar, ``proxima`` passa a retornar None.
+    """
+
+    def __init__(self, transporte, limite=1000):
+        self._transporte = transporte
+        self._linhas = deque(maxlen=limite)
+        self.fechada = False
+
+    def _receber(self, linha):
+        # Chamado pela thread leitora com o lock da condition já adquirido
+        if linha is None:
+            self.fechada = True
+        else:
+            self._linhas.append(linha)
+
+    def proxima(self, timeout=None):
+        """Aguarda a próxima linha. Retorna None em timeout ou porta fechada."""
+        cond = self._transporte._cond
+        with cond:
+            cond.wait_for(lambda: self._linhas or self.fechada, timeout)
+            return self._linhas.popleft() if self._linhas else None
+
+    def drenar(self):
+        """Retorna (sem esperar) todas as linhas pendentes."""
+        with self._transporte._cond:
+            linhas = list(self._linhas)
+            self._linhas.clear()
+            return linhas
+
+    def coletar(self, segundos):
+        """Retorna todas as linhas que chegarem nos próximos ``segundos``."""
+        linhas = []
+        prazo = time.monotonic() + segundos
+        while True:
+            restante = prazo - time.monotonic()
+            if restante <= 0:
+                return linhas
+            linha = self.proxima(restante)
+            if linha is None:
+                if self.fechada:
+                    return linhas
+                continue
+            linhas.append(linha)
+
+    def aguardar(self, fim, timeout):
+        """
+        Lê linhas até ``fim(linha)`` ser verdadeiro ou o timeout expirar.
+        Retorna (linhas, concluido).
+        """
+        linhas = []
+        prazo = time.monotonic() + timeout
+        while True:
+            restante = prazo - time.monotonic()
+            if restante <= 0:
+                return linhas, False
+            linha = self.proxima(restante)
+            if linha is None:
+                if self.fechada:
+                    return linhas, False
+                continue
+            linhas.append(linha)
+            if fim(linha):
+                return linhas, True
+
+    def cancelar(self):
+        self._transporte._remover_assinatura(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cancelar()
+
+
+class SerialTransport:
+    """Porta serial com uma thread leitora dedicada."""
+
+    def __init__(self, porta, baudrate=115200):
+        self.porta = porta
+        self.baudrate = baudrate
+        self._serial = None
+        self._thread = None
+        self._ativo = False
+        self._cond = threading.Condition()
+        self._escrita_lock = threading.Lock()
+        self._assinaturas = []
+        self._ouvintes = []
+
+    # ----- ciclo de vida -----
+
+    def abrir(self, assinatura=None):
+        """
+        Abre a porta e inicia a thread leitora. Lança serial.SerialException.
+        Retorna uma Assinatura criada antes da primeira leitura se
+        ``assinatura`` for verdadeiro (nenhuma linha do boot se perde).
+        """
+        if self.aberta:
+            return self.assinar() if assinatura else None
+        # pyserial só é importado ao abrir a porta: importar o módulo (views
+        # do Django, scripts com --help) não paga o import
+        import serial
+
+        # timeout=None: read() bloqueia até chegar dado (sem polling)
+        self._serial = serial.Serial(self.porta, self.baudrate, timeout=None)
+        self._ativo = True
+        inicial = self.assinar() if assinatura else None
+        self._thread = threading.Thread(
+            target=self._ler, name=f"serial-{self.porta}", daemon=True
+        )
+        self._thread.start()
+        return inicial
+
+    def conectar(self, timeout=TIMEOUT_BANNER, ao_receber=None):
+        """
+        Abre a porta e espera o firmware ficar pronto, em vez de um sleep
+        fixo: termina no banner READY do boot ou, se a serial ficar
+        SILENCIO_SONDA s calada (a placa não reiniciou ao abrir a porta), no
+        OK da resposta a um STATUS (ou num READY que chegue depois da sonda).
+        ``ao_receber(linha)`` recebe as linhas do boot à medida que chegam.
+        Retorna (linhas, pronto); pronto é False se o timeout expirou.
+        """
+        linhas = []
+        sondou = False
+        with self.abrir(assinatura=True) as assinatura:
+            prazo = time.monotonic() + timeout
+            while True:
+                restante = prazo - time.monotonic()
+                if restante <= 0:
+                    return linhas, False
+                linha = assinatura.proxima(restante if sondou else min(restante, SILENCIO_SONDA))
+                if linha is None:
+                    if assinatura.fechada:
+                        import serial
+                        raise serial.SerialException(f"Porta {self.porta} fechou durante a conexão")
+                    if not sondou:
+                        self.escrever("STATUS")
+                        sondou = True
+                    continue
+                linhas.append(linha)
+                if ao_receber:
+                    ao_receber(linha)
+                # Com a sonda enviada, espera o fim da resposta dela: nenhuma
+                # linha sobra para o próximo comando
+                if linha == ("OK" if sondou else BANNER):
+                    return linhas, True
+                if sondou and linha == BANNER:
+                    # A placa ainda estava no boot/bootloader e pode ter engolido
+                    # a sonda: o READY basta. Espera um pouco pelo OK dela (se
+                    # veio depois do boot) para ele não sobrar
+                    fim_sonda = time.monotonic() + SILENCIO_SONDA
+                    while (restante := fim_sonda - time.monotonic()) > 0:
+                        linha = assinatura.proxima(restante)
+                        if linha is None:
+                            break
+                        linhas.append(linha)
+                        if ao_receber:
+                            ao_receber(linha)
+                        if linha == "OK":
+                            break
+                    return linhas, True
+
+    def fechar(self):
+        self._ativo = False
+        conn = self._serial
+        if conn is not None:
+            try:
+                conn.cancel_read()
+            except Exception:
+                pass
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self._serial = None
+
+    @property
+    def aberta(self):
+        return self._ativo and self._serial is not None and self._serial.is_open
+
+    # ----- leitura -----
+
+    def _ler(self):
+        import serial
+
+        buffer = b""
+        try:
+            while self._ativo:
+                dados = self._serial.read(max(1, self._serial.in_waiting))
+                if not dados:
+                    continue  # cancel_read()
+                buffer += dados
+                *linhas, buffer = buffer.split(b"\n")
+                for bruta in linhas:
+                    linha = bruta.decode("utf-8", errors="ignore").strip()
+                    if linha:
+                        self._publicar(linha)
+        except (serial.SerialException, OSError, TypeError, AttributeError) as e:
+            if self._ativo:
+                log.warning("Conexão perdida em %s: %s", self.porta, e)
+        finally:
+            self._ativo = False
+            self._publicar(None)
+
+    def _publicar(self, linha):
+        """Entrega a linha (ou None = porta fechada) a assinaturas e ouvintes."""
+        with self._cond:
+            for assinatura in self._assinaturas:
+                assinatura._receber(linha)
+            ouvintes = list(self._ouvintes)
+            self._cond.notify_all()
+        for ouvinte in ouvintes:
+            try:
+                ouvinte(linha)
+            except Exception as e:
+                log.exception("Erro no ouvinte: %s", e)
+
+    def assinar(self, limite=1000):
+        """Cria uma Assinatura que recebe toda linha a partir de agora."""
+        assinatura = Assinatura(self, limite)
+        with self._cond:
+            assinatura.fechada = not self._ativo
+            self._assinaturas.append(assinatura)
+        return assinatura
+
+    def _remover_assinatura(self, assinatura):
+        with self._cond:
+            if assinatura in self._assinaturas:
+                self._assinaturas.remove(assinatura)
+
+    def adicionar_ouvinte(self, ouvinte):
+        """
+        Registra ``ouvinte(linha)``, chamado na thread leitora a cada linha
+        (e com None quando a porta fecha). Deve ser rápido e não bloquear.
+        """
+        with self._cond:
+            self._ouvintes.append(ouvinte)
+
+    def remover_ouvinte(self, ouvinte):
+        with self._cond:
+            if ouvinte in self._ouvintes:
+                self._ouvintes.remove(ouvinte)
+
+    # ----- escrita / comandos -----
+
+    def escrever(self, comando):
+        with self._escrita_lock:
+            if not self.aberta:
+                import serial
+                raise serial.SerialException(f"Porta {self.porta} não está aberta")
+            self._serial.write(f"{comando}\n".encode())
+
+    def ler_durante(self, segundos):
+        """Linhas recebidas nos próximos ``segundos`` (mensagens de boot, etc.)."""
+        with self.assinar() as assinatura:
+            return assinatura.coletar(segundos)
+
+    def comando(self, comando, fim, timeout=10):
+        """
+        Envia ``comando`` e lê até ``fim(linha)``. A assinatura é criada antes
+        da escrita, então nenhuma linha da resposta se perde.
+        Retorna (linhas, concluido).
+        """
+        with self.assinar() as assinatura:
+            self.escrever(comando)
+            return assinatura.aguardar(fim, timeout)
+
+    async def comando_async(self, comando, fim, timeout=10):
+        """Versão async de comando(): as linhas chegam ao event loop via callback."""
+        loop = asyncio.get_running_loop()
+        fila = asyncio.Queue()
+
+        def ouvinte(linha):
+            loop.call_soon_threadsafe(fila.put_nowait, linha)
+
+        self.adicionar_ouvinte(ouvinte)
+        try:
+            self.escrever(comando)
+            linhas = []
+            prazo = loop.time() + timeout
+            while True:
+                restante = prazo - loop.time()
+                if restante <= 0:
+                    return linhas, False
+                try:
+                    linha = await asyncio.wait_for(fila.get(), restante)
+                except asyncio.TimeoutError:
+                    return linhas, False
+                if linha is None:
+                    return linhas, False
+                linhas.append(linha)
+                if fim(linha):
+                    return linhas, True
+        finally:
+            self.remover_ouvinte(ouvinte)
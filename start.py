@@ -1,21 +1,40 @@
 #!/usr/bin/env python3
 """
 Script central para iniciar o DashLog.
-Inicia o Django e o QR Reader juntos.
+Inicia o Django e o QR Reader juntos e os mantém de pé.
 Ctrl+C para parar tudo.
 
+Supervisão: cada serviço só conta como pronto quando o health check HTTP
+responde 200 (Django: /api/saude/, QR Reader: /saude, que falha se a câmera
+parar de entregar frames). O QR Reader só sobe depois do Django estar pronto.
+Um filho que morre, não fica pronto a tempo ou falha o health check várias
+vezes seguidas é reiniciado com backoff exponencial; reinícios demais numa
+janela curta (crash loop) pausam o serviço por um tempo. `kill -USR1 <pid>`
+imprime uptime e reinícios de cada serviço.
+
 Uso:
     python start.py
     python start.py --qr-source=0 --qr-port=5001
     python start.py --django-port=8001 --tunnel
+    python start.py --asgi          # Django via uvicorn (views async do Arduino)
+    python start.py --backoff-max=30 --crash-loop=5 --crash-window=300
 """
 import argparse
+import json
+import logging
 import os
 import signal
 import subprocess
 import sys
 import time
-from threading import Thread
+import urllib.error
+import urllib.request
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from urllib.parse import parse_qs, urlparse
+
+import log_estruturado
 
 # Cores para o terminal
 class Colors:
@@ -29,57 +48,506 @@ class Colors:
 def colored(text, color):
     return f"{color}{text}{Colors.RESET}"
 
-# Processos globais para cleanup
-django_proc = None
-qr_proc = None
+ORIGIN_COLORS = {'DJANGO': Colors.DJANGO, 'QR': Colors.QR}
+
+logger = logging.getLogger('dashlog.start')
+
+def log(message, level=logging.INFO, origin='DASHLOG'):
+    """Evento do próprio start.py (vai para a fila do coletor, como os dos filhos)."""
+    logger.log(level, message, extra={'origem': origin})
+
+def format_event(event):
+    """Linha do console: [DJANGO]/[QR] para os filhos, [DASHLOG]/[WARN]/[ERRO] para o supervisor."""
+    origin = event.get('origem') or 'DASHLOG'
+    level = event.get('nivel', 'INFO')
+    if origin == 'DASHLOG':
+        if level in ('ERROR', 'CRITICAL'):
+            tag, color = '[ERRO]', Colors.ERROR
+        elif level == 'WARNING':
+            tag, color = '[WARN]', Colors.WARN
+        else:
+            tag, color = '[DASHLOG]', Colors.BOLD
+        return f"{colored(tag, color)} {event.get('msg', '')}"
+    text = event.get('msg', '') if event.get('logger') == logger.name else log_estruturado.mensagem(event)
+    return f"{colored(f'[{origin}]', ORIGIN_COLORS.get(origin, Colors.BOLD))} {text}"
+
+# Serviços globais para cleanup
+services = []
 stopping = False
+collector = None
+sampler = None
+started_wall = time.time()
 
+# Health checks falam direto com 127.0.0.1: ignora http_proxy do ambiente
+_probe_opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
 
-def stream_output(proc, prefix, color):
-    """Lê stdout/stderr do processo e imprime com prefixo colorido."""
+
+def stream_output(proc, prefix):
+    """
+    Lê stdout/stderr do processo e entrega cada linha ao coletor (eventos
+    JSON dos filhos ou texto solto); quem escreve no terminal e no arquivo,
+    em lote, é a thread do coletor.
+    """
     try:
         for line in iter(proc.stdout.readline, ''):
             if stopping:
                 break
             line = line.rstrip()
             if line:
-                print(f"{colored(f'[{prefix}]', color)} {line}", flush=True)
+                collector.linha_filho(prefix, line)
     except Exception:
         pass
 
 
-def cleanup(*args):
-    """Para todos os processos graciosamente."""
-    global stopping, django_proc, qr_proc
-    
-    if stopping:
-        return
-    stopping = True
-    
-    print(f"\n{colored('[DASHLOG]', Colors.WARN)} Parando serviços...", flush=True)
-    
-    for name, proc in [("QR Reader", qr_proc), ("Django", django_proc)]:
+def format_duration(seconds):
+    if seconds is None:
+        return '-'
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
+
+
+class Service:
+    """
+    Processo filho supervisionado.
+
+    Estados: waiting (aguarda dependência) → starting (aguarda health check)
+    → ready; quando falha vai para backoff (ou crash-loop) e volta a
+    starting. A thread de probe só registra o resultado do health check; as
+    transições acontecem em supervise(), chamado pelo loop principal.
+    """
+
+    def __init__(self, name, prefix, argv, health_url, stats_url=None, env=None, cwd=None, depends_on=None,
+                 critical=False, probe_interval=2.0, probe_timeout=2.0, probe_failures=3,
+                 startup_timeout=60.0, backoff_base=1.0, backoff_max=60.0, stable_after=30.0,
+                 crash_loop=5, crash_window=300.0, crash_cooldown=300.0):
+        self.name = name
+        self.prefix = prefix
+        self.argv = argv
+        self.health_url = health_url
+        self.stats_url = stats_url    # JSON com métricas do processo (HealthSampler)
+        self.env = env
+        self.cwd = cwd
+        self.depends_on = depends_on
+        self.critical = critical  # desistir deste serviço para o DashLog inteiro
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.probe_failures_limit = probe_failures
+        self.startup_timeout = startup_timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stable_after = stable_after
+        self.crash_loop = crash_loop
+        self.crash_window = crash_window
+        self.crash_cooldown = crash_cooldown
+
+        self.proc = None
+        self.state = 'waiting' if depends_on else 'stopped'
+        self.started_at = None        # monotonic do processo atual
+        self.ready_at = None
+        self.first_ready_at = None
+        self.restarts = 0
+        self.consecutive_failures = 0
+        self.recent_failures = deque()
+        self.next_start = None
+        self.last_failure = None
+        self._lock = Lock()
+        self._generation = 0          # descarta probes de um processo anterior
+        self._healthy = False
+        self._probe_failures = 0
+        self._last_probe = None
+        Thread(target=self._probe_loop, name=f"probe-{prefix}", daemon=True).start()
+
+    # ----- processo -----
+
+    def start(self):
+        self.proc = subprocess.Popen(
+            self.argv,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+            cwd=self.cwd,
+            env=self.env,
+        )
+        Thread(target=stream_output, args=(self.proc, self.prefix), daemon=True).start()
+        with self._lock:
+            self._generation += 1
+            self._healthy = False
+            self._probe_failures = 0
+        self.state = 'starting'
+        self.started_at = time.monotonic()
+        self.ready_at = None
+        self.next_start = None
+
+    def stop(self, timeout=3):
+        proc, self.proc = self.proc, None
         if proc and proc.poll() is None:
             try:
-                print(f"{colored('[DASHLOG]', Colors.WARN)} Parando {name}...", flush=True)
+                log(f"Parando {self.name}...")
                 proc.terminate()
                 try:
-                    proc.wait(timeout=3)
+                    proc.wait(timeout=timeout)
                 except subprocess.TimeoutExpired:
                     proc.kill()
                     proc.wait(timeout=2)
             except Exception as e:
-                print(f"{colored('[ERRO]', Colors.ERROR)} Erro ao parar {name}: {e}", flush=True)
-    
-    print(f"{colored('[DASHLOG]', Colors.BOLD)} Todos os serviços parados.", flush=True)
+                log(f"Erro ao parar {self.name}: {e}", logging.ERROR)
+
+    # ----- health check -----
+
+    def _probe(self):
+        try:
+            with _probe_opener.open(self.health_url, timeout=self.probe_timeout) as resp:
+                return resp.status == 200, resp.status
+        except urllib.error.HTTPError as e:
+            return False, e.code
+        except Exception as e:
+            return False, type(e).__name__
+
+    def _probe_loop(self):
+        while not stopping:
+            with self._lock:
+                generation = self._generation
+            proc = self.proc
+            if proc is not None and proc.poll() is None:
+                ok, detail = self._probe()
+                with self._lock:
+                    if generation == self._generation:
+                        self._healthy = ok
+                        self._probe_failures = 0 if ok else self._probe_failures + 1
+                        self._last_probe = detail
+            time.sleep(self.probe_interval)
+
+    # ----- supervisão -----
+
+    def supervise(self, now):
+        """Avança a máquina de estados. Retorna False se o serviço desistiu."""
+        if self.state in ('backoff', 'crash-loop'):
+            if now >= self.next_start:
+                self.restarts += 1
+                log(f"Reiniciando {self.name} (reinício #{self.restarts})...")
+                self.start()
+            return True
+        if self.state in ('waiting', 'stopped', 'failed'):
+            return self.state != 'failed'
+
+        code = self.proc.poll()
+        if code is not None:
+            self.proc = None
+            return self._failed(now, f"saiu com código {code}")
+
+        with self._lock:
+            healthy, probe_failures, detail = self._healthy, self._probe_failures, self._last_probe
+        if self.state == 'starting':
+            if healthy:
+                self.state = 'ready'
+                self.ready_at = now
+                if self.first_ready_at is None:
+                    self.first_ready_at = now
+                log(f"✓ {self.name} pronto em {now - self.started_at:.1f}s")
+            elif now - self.started_at > self.startup_timeout:
+                return self._failed(now, f"não ficou pronto em {self.startup_timeout:.0f}s (health: {detail})")
+        elif self.state == 'ready':
+            if probe_failures >= self.probe_failures_limit:
+                return self._failed(now, f"health check falhou {probe_failures}x seguidas ({detail})")
+            if self.consecutive_failures and now - self.ready_at >= self.stable_after:
+                self.consecutive_failures = 0  # estável de novo: backoff volta ao início
+        return True
+
+    def _failed(self, now, reason):
+        self.last_failure = reason
+        self.consecutive_failures += 1
+        self.recent_failures.append(now)
+        while self.recent_failures and now - self.recent_failures[0] > self.crash_window:
+            self.recent_failures.popleft()
+
+        if len(self.recent_failures) >= self.crash_loop:
+            if not self.crash_cooldown:
+                self.state = 'failed'
+                log(f"✗ {self.name} {reason}; {len(self.recent_failures)} falhas em "
+                    f"{self.crash_window:.0f}s (crash loop), desistindo.", logging.ERROR)
+                self.stop()
+                return False
+            self.state = 'crash-loop'
+            delay = self.crash_cooldown
+            log(f"✗ {self.name} {reason}; {len(self.recent_failures)} falhas em {self.crash_window:.0f}s "
+                f"(crash loop), nova tentativa em {delay:.0f}s.", logging.ERROR)
+            self.recent_failures.clear()
+            self.consecutive_failures = 0
+        else:
+            self.state = 'backoff'
+            delay = min(self.backoff_base * 2 ** (self.consecutive_failures - 1), self.backoff_max)
+            log(f"{self.name} {reason}; reiniciando em {delay:.1f}s.", logging.WARNING)
+        self.next_start = now + delay
+        self.stop()  # vivo mas sem saúde (sem frames, travado): derruba antes de reiniciar
+        return True
+
+    def status(self, now=None):
+        now = time.monotonic() if now is None else now
+        running = self.proc is not None and self.proc.poll() is None
+        return {
+            "name": self.name,
+            "state": self.state,
+            "pid": self.proc.pid if running else None,
+            "uptime_s": round(now - self.started_at, 1) if running else None,
+            "restarts": self.restarts,
+            "last_failure": self.last_failure,
+            "next_start_in_s": round(self.next_start - now, 1) if self.next_start else None,
+        }
+
+
+def print_status():
+    now = time.monotonic()
+    log("Status dos serviços:")
+    for service in services:
+        s = service.status(now)
+        line = (f"  {s['name']:<10} {s['state']:<10} pid={s['pid'] or '-':<7} "
+                f"uptime={format_duration(s['uptime_s']):<10} reinícios={s['restarts']}")
+        if s['next_start_in_s'] is not None:
+            line += f" (próxima tentativa em {s['next_start_in_s']:.0f}s)"
+        if s['last_failure']:
+            line += f" | última falha: {s['last_failure']}"
+        log(line)
+
+
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def read_proc(pid):
+    """(segundos de CPU, RSS em bytes, threads) de /proc/<pid>/stat, ou None (saiu, sem /proc)."""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # O nome (2º campo) pode ter espaços; os campos seguem o último ')'
+    fields = stat[stat.rindex(')') + 2:].split()
+    utime, stime = int(fields[11]), int(fields[12])
+    return (utime + stime) / CLOCK_TICKS, int(fields[21]) * PAGE_SIZE, int(fields[17])
+
+
+def fetch_json(url, timeout=2.0):
+    try:
+        with _probe_opener.open(url, timeout=timeout) as resp:
+            return json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        try:
+            return json.loads(e.read())  # /saude do leitor dá 503 com corpo útil
+        except ValueError:
+            return None
+    except Exception:
+        return None
+
+
+class HealthSampler(Thread):
+    """
+    Amostra a estação inteira a cada ``interval`` s: CPU e RSS de cada
+    processo (/proc), FPS e taxa de decodificação do QR Reader (/stats dele),
+    status do Arduino e filas do Django (/api/saude/?detalhes=1) e a fila de
+    logs do start.py. As amostras ficam num anel de tamanho fixo (``window``
+    s), servido em colunas por /health/history para gráficos baratos.
+    """
+
+    def __init__(self, interval=10.0, window=3600.0):
+        super().__init__(name='health', daemon=True)
+        self.interval = interval
+        self.samples = deque(maxlen=max(1, int(window / interval)))
+        self._lock = Lock()
+        self._cpu = {}      # pid → (monotonic, segundos de CPU)
+        self._reader = None  # (monotonic, pid, frames, decoded, reads)
+
+    def _process(self, pid, now):
+        info = read_proc(pid)
+        if info is None:
+            return {'pid': pid, 'cpu_pct': None, 'rss_mb': None, 'threads': None}
+        cpu_s, rss, threads = info
+        previous = self._cpu.get(pid)
+        self._cpu[pid] = (now, cpu_s)
+        cpu_pct = None
+        if previous and now > previous[0]:
+            cpu_pct = round(100 * (cpu_s - previous[1]) / (now - previous[0]), 1)
+        return {'pid': pid, 'cpu_pct': cpu_pct, 'rss_mb': round(rss / 2 ** 20, 1), 'threads': threads}
+
+    def _reader_rates(self, stats, now):
+        current = (now, stats.get('pid'), stats.get('frames', 0), stats.get('decoded', 0), stats.get('reads', 0))
+        previous, self._reader = self._reader, current
+        rates = {'camera': stats.get('camera'), 'fps': None, 'decode_rate': None, 'reads_per_min': None}
+        if previous and previous[1] == current[1] and now > previous[0]:
+            elapsed = now - previous[0]
+            rates['fps'] = round((current[2] - previous[2]) / elapsed, 1)
+            rates['decode_rate'] = round((current[3] - previous[3]) / elapsed, 1)
+            rates['reads_per_min'] = round(60 * (current[4] - previous[4]) / elapsed, 1)
+        return rates
+
+    def sample(self):
+        now = time.monotonic()
+        sample = {
+            'ts': round(time.time(), 1),
+            'processes': {'start': self._process(os.getpid(), now)},
+            'queues': {'logs_start': collector.fila.qsize() if collector else None},
+        }
+        for service in services:
+            key = service.prefix.lower()
+            proc = service.proc
+            running = proc is not None and proc.poll() is None
+            sample['processes'][key] = self._process(proc.pid, now) if running else {'pid': None}
+            sample['processes'][key]['state'] = service.state
+            data = fetch_json(service.stats_url) if running and service.stats_url else None
+            if key == 'qr' and data:
+                sample['reader'] = self._reader_rates(data, now)
+            elif key == 'django' and data:
+                sample['arduino'] = data.get('arduino')
+                sample['queues'].update(data.get('filas') or {})
+        # Descarta CPU de pids que já saíram (reinícios)
+        alive = {p['pid'] for p in sample['processes'].values()}
+        self._cpu = {pid: v for pid, v in self._cpu.items() if pid in alive}
+        with self._lock:
+            self.samples.append(sample)
+        return sample
+
+    def latest(self):
+        with self._lock:
+            return self.samples[-1] if self.samples else None
+
+    def history(self, minutes=60, since=None):
+        """Amostras da janela em colunas: {'ts': [...], 'series': {'processes.django.cpu_pct': [...]}}."""
+        start = time.time() - minutes * 60
+        if since is not None:
+            start = max(start, since + 0.05)
+        with self._lock:
+            samples = [x for x in self.samples if x['ts'] >= start]
+        series = {}
+        for i, sample in enumerate(samples):
+            for key, value in _flatten(sample):
+                if key != 'ts':
+                    series.setdefault(key, [None] * i).append(value)
+            for values in series.values():
+                if len(values) < i + 1:
+                    values.append(None)
+        return {'interval_s': self.interval, 'ts': [x['ts'] for x in samples], 'series': series}
+
+    def run(self):
+        while not stopping:
+            try:
+                self.sample()
+            except Exception as e:
+                log(f"Falha ao amostrar a saúde da estação: {e}", logging.WARNING)
+            time.sleep(self.interval)
+
+
+def _flatten(data, prefix=''):
+    """Folhas numéricas (e None) de um dict aninhado, com chaves pontuadas."""
+    for key, value in data.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            yield from _flatten(value, f'{name}.')
+        elif value is None or (isinstance(value, (int, float)) and not isinstance(value, bool)):
+            yield name, value
+
+
+class AdminHandler(BaseHTTPRequestHandler):
+    """GET /logs (cauda dos eventos), /status, /health e /health/history."""
+
+    def _json(self, payload, status=200):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        if url.path == '/status':
+            now = time.monotonic()
+            return self._json({
+                'pid': os.getpid(),
+                'uptime_s': round(time.time() - started_wall, 1),
+                'services': [s.status(now) for s in services],
+            })
+        if url.path == '/health':
+            if sampler is None:
+                return self._json({'erro': 'amostragem desligada (--sample-interval 0)'}, 404)
+            now = time.monotonic()
+            return self._json({
+                'services': [s.status(now) for s in services],
+                'sample': sampler.latest() or sampler.sample(),
+            })
+        if url.path == '/health/history':
+            if sampler is None:
+                return self._json({'erro': 'amostragem desligada (--sample-interval 0)'}, 404)
+            try:
+                minutes = float(params.get('minutos', 60))
+                since = float(params['desde']) if 'desde' in params else None
+            except ValueError:
+                return self._json({'erro': 'minutos e desde devem ser números'}, 400)
+            return self._json(sampler.history(minutes, since))
+        if url.path == '/logs':
+            try:
+                n = int(params.get('n', 200))
+                after = int(params.get('apos', 0))
+            except ValueError:
+                return self._json({'erro': 'n e apos devem ser inteiros'}, 400)
+            level = params.get('nivel', '').upper() or None
+            if not 1 <= n <= 2000:
+                return self._json({'erro': 'n deve estar entre 1 e 2000'}, 400)
+            if level and level not in log_estruturado.NIVEIS:
+                return self._json({'erro': f"nivel deve ser um de {', '.join(log_estruturado.NIVEIS)}"}, 400)
+            events = collector.cauda(n, nivel=level, origem=params.get('origem'), apos=after)
+            return self._json({
+                'eventos': events,
+                'ultimo_seq': events[-1]['seq'] if events else after,
+                'coletor': collector.estatisticas(),
+            })
+        self._json({'erro': 'não encontrado'}, 404)
+
+    def log_message(self, *args):
+        pass  # acessos ao admin não entram no log
+
+
+def start_admin_server(host, port):
+    try:
+        server = ThreadingHTTPServer((host, port), AdminHandler)
+    except OSError as e:
+        log(f"Servidor admin não iniciado em {host}:{port}: {e}", logging.WARNING)
+        return None
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, name='admin', daemon=True).start()
+    log(f"Admin: http://{host}:{port}/logs e /status")
+    return server
+
+
+def cleanup(*args):
+    """Para todos os processos graciosamente."""
+    global stopping
+
+    if stopping:
+        return
+    stopping = True
+
+    print(flush=True)
+    print_status()
+    log("Parando serviços...")
+
+    # Ordem inversa da partida: o QR Reader antes do Django
+    for service in reversed(services):
+        service.stop()
+
+    log("Todos os serviços parados.")
     sys.exit(0)
 
 
+def _probe_host(host):
+    return '127.0.0.1' if host in ('0.0.0.0', '', '::') else host
+
+
 def main():
-    global django_proc, qr_proc
-    
     parser = argparse.ArgumentParser(
-        description="Inicia o DashLog (Django + QR Reader) em primeiro plano."
+        description="Inicia o DashLog (Django + QR Reader) em primeiro plano, com supervisão."
     )
     parser.add_argument('--django-port', type=int, default=8001, help='Porta do Django (padrão: 8001)')
     parser.add_argument('--django-host', default='0.0.0.0', help='Host do Django (padrão: 0.0.0.0)')
@@ -88,43 +556,124 @@ def main():
     parser.add_argument('--tunnel', action='store_true', help='Ativar Cloudflare tunnel')
     parser.add_argument('--no-qr', action='store_true', help='Não iniciar o QR Reader')
     parser.add_argument('--migrate', action='store_true', help='Executar migrações antes de iniciar')
-    
+    parser.add_argument('--asgi', action='store_true', help='Servir o Django via uvicorn (ASGI) em vez do runserver')
+    supervision = parser.add_argument_group('supervisão')
+    supervision.add_argument('--probe-interval', type=float, default=2.0, help='Intervalo do health check (s)')
+    supervision.add_argument('--probe-failures', type=int, default=3,
+                             help='Reinicia depois de N health checks falhos seguidos (padrão: 3)')
+    supervision.add_argument('--startup-timeout', type=float, default=60.0,
+                             help='Tempo máximo (s) para um serviço ficar pronto (padrão: 60)')
+    supervision.add_argument('--backoff-max', type=float, default=60.0,
+                             help='Espera máxima (s) entre reinícios; dobra a cada falha a partir de 1s')
+    supervision.add_argument('--crash-loop', type=int, default=5,
+                             help='Falhas dentro de --crash-window que caracterizam crash loop (padrão: 5)')
+    supervision.add_argument('--crash-window', type=float, default=300.0, help='Janela do crash loop (s)')
+    supervision.add_argument('--crash-cooldown', type=float, default=300.0,
+                             help='Pausa (s) depois de um crash loop; 0 = desiste do serviço')
+    supervision.add_argument('--status-interval', type=float, default=600.0,
+                             help='Imprime o status dos serviços a cada N s (0 = só com SIGUSR1)')
+    logs = parser.add_argument_group('logs')
+    logs.add_argument('--log-file', default=os.environ.get('DASHLOG_LOG_FILE') or 'logs/dashlog.jsonl',
+                      help='Arquivo de eventos JSON de todos os processos (padrão: logs/dashlog.jsonl; "" = sem arquivo)')
+    logs.add_argument('--log-max-mb', type=float, default=float(os.environ.get('DASHLOG_LOG_MAX_MB', '10')),
+                      help='Rotaciona o arquivo ao passar de N MB (padrão: 10)')
+    logs.add_argument('--log-backups', type=int, default=int(os.environ.get('DASHLOG_LOG_BACKUPS', '5')),
+                      help='Arquivos rotacionados mantidos (padrão: 5)')
+    logs.add_argument('--console-level', default=os.environ.get('DASHLOG_LOG_LEVEL', 'INFO').upper(),
+                      choices=log_estruturado.NIVEIS, help='Nível mínimo mostrado no terminal (padrão: INFO)')
+    logs.add_argument('--admin-host', default='127.0.0.1', help='Host do servidor admin (padrão: 127.0.0.1)')
+    logs.add_argument('--admin-port', type=int, default=8002,
+                      help='Porta do servidor admin com /logs, /status e /health (padrão: 8002; 0 = desligado)')
+    logs.add_argument('--sample-interval', type=float, default=10.0,
+                      help='Amostra CPU, memória, câmera e filas a cada N s para /health (padrão: 10; 0 = desligado)')
+    logs.add_argument('--history-minutes', type=float, default=60.0,
+                      help='Janela guardada para /health/history, em minutos (padrão: 60)')
+
     args = parser.parse_args()
-    
-    # Registra handlers para SIGINT (Ctrl+C) e SIGTERM
-    signal.signal(signal.SIGINT, cleanup)
-    signal.signal(signal.SIGTERM, cleanup)
-    
+
     # Diretório base do projeto
     base_dir = os.path.dirname(os.path.abspath(__file__))
     os.chdir(base_dir)
-    
+
+    # Um coletor para os eventos do start.py e dos filhos: terminal + arquivo + cauda
+    global collector
+    collector = log_estruturado.configurar(
+        'DASHLOG', caminho=args.log_file or None,
+        max_bytes=int(args.log_max_mb * 1024 * 1024), backups=args.log_backups,
+        nivel_console=args.console_level, formatar=format_event, saida_json=False,
+    )
+
+    # Registra handlers para SIGINT (Ctrl+C) e SIGTERM
+    signal.signal(signal.SIGINT, cleanup)
+    signal.signal(signal.SIGTERM, cleanup)
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, lambda *_: print_status())
+
     # Detecta o Python do venv se existir
     venv_python = os.path.join(base_dir, '.venv', 'bin', 'python')
     python_exe = venv_python if os.path.exists(venv_python) else sys.executable
-    
-    print(f"{colored('[DASHLOG]', Colors.BOLD)} Iniciando DashLog...", flush=True)
-    print(f"{colored('[DASHLOG]', Colors.BOLD)} Python: {python_exe}", flush=True)
-    print(f"{colored('[DASHLOG]', Colors.BOLD)} Django: http://{args.django_host}:{args.django_port}", flush=True)
+
+    log("Iniciando DashLog...")
+    log(f"Python: {python_exe}")
+    log(f"Django: http://{args.django_host}:{args.django_port}")
     if not args.no_qr:
-        print(f"{colored('[DASHLOG]', Colors.BOLD)} QR Reader: http://0.0.0.0:{args.qr_port}", flush=True)
-    print(f"{colored('[DASHLOG]', Colors.BOLD)} Pressione Ctrl+C para parar tudo.\n", flush=True)
-    
+        log(f"QR Reader: http://0.0.0.0:{args.qr_port}")
+    if args.log_file:
+        log(f"Logs: {args.log_file}")
+    log(f"Pressione Ctrl+C para parar tudo (kill -USR1 {os.getpid()} mostra o status).")
+    if args.admin_port:
+        start_admin_server(args.admin_host, args.admin_port)
+
     # Executa migrações se solicitado
     if args.migrate:
-        print(f"{colored('[DJANGO]', Colors.DJANGO)} Executando migrações...", flush=True)
+        log("Executando migrações...", origin='DJANGO')
         result = subprocess.run([python_exe, 'manage.py', 'migrate', '--noinput'], cwd=base_dir)
         if result.returncode != 0:
-            print(f"{colored('[ERRO]', Colors.ERROR)} Falha nas migrações!", flush=True)
+            log("Falha nas migrações!", logging.ERROR)
             sys.exit(1)
-        print(f"{colored('[DJANGO]', Colors.DJANGO)} Migrações concluídas.\n", flush=True)
-    
+        log("Migrações concluídas.", origin='DJANGO')
+
     # Configura variável de ambiente para desativar auto-start do QR Reader no apps.py
     # (já que vamos iniciar manualmente aqui)
-    env = os.environ.copy()
+    # Os filhos escrevem eventos JSON no stdout; o arquivo é só do start.py
+    child_env = os.environ.copy()
+    child_env['DASHLOG_LOG_JSON'] = '1'
+    child_env.pop('DASHLOG_LOG_FILE', None)
+    env = dict(child_env)
     env['DASHLOG_DISABLE_QR_AUTOSTART'] = '1'
-    
-    # Inicia o QR Reader primeiro (se não desativado)
+
+    supervision_opts = {
+        'probe_interval': args.probe_interval,
+        'probe_failures': args.probe_failures,
+        'startup_timeout': args.startup_timeout,
+        'backoff_max': args.backoff_max,
+        'crash_loop': args.crash_loop,
+        'crash_window': args.crash_window,
+        'crash_cooldown': args.crash_cooldown,
+    }
+
+    if args.asgi:
+        # ASGI: as rotas /api/arduino/* aguardam a serial sem prender threads
+        django_args = [
+            python_exe, '-m', 'uvicorn', 'dashlog.asgi:application',
+            '--host', args.django_host,
+            '--port', str(args.django_port),
+        ]
+    else:
+        django_args = [
+            python_exe, 'manage.py', 'runserver',
+            f'{args.django_host}:{args.django_port}',
+            '--noreload'  # Desativa reload para evitar duplicação de processos
+        ]
+    django = Service(
+        'Django', 'DJANGO', django_args,
+        health_url=f'http://{_probe_host(args.django_host)}:{args.django_port}/api/saude/',
+        stats_url=f'http://{_probe_host(args.django_host)}:{args.django_port}/api/saude/?detalhes=1',
+        env=env, cwd=base_dir, critical=True, **supervision_opts,
+    )
+    services.append(django)
+
+    # O QR Reader sobe depois do Django pronto (ele envia os pacotes para lá)
     if not args.no_qr:
         qr_script = os.path.join(base_dir, 'script-read-qrcode.py')
         if os.path.exists(qr_script):
@@ -137,61 +686,50 @@ def main():
             ]
             if args.tunnel:
                 qr_args.append('--tunnel')
-            
-            qr_proc = subprocess.Popen(
-                qr_args,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,
-                cwd=base_dir
-            )
-            
-            # Thread para ler output do QR Reader
-            qr_thread = Thread(target=stream_output, args=(qr_proc, 'QR', Colors.QR), daemon=True)
-            qr_thread.start()
-            
-            # Aguarda um pouco para o QR Reader iniciar
-            time.sleep(1)
-            if qr_proc.poll() is not None:
-                print(f"{colored('[ERRO]', Colors.ERROR)} QR Reader falhou ao iniciar!", flush=True)
+            services.append(Service(
+                'QR Reader', 'QR', qr_args,
+                health_url=f'http://127.0.0.1:{args.qr_port}/saude',
+                stats_url=f'http://127.0.0.1:{args.qr_port}/stats',
+                env=child_env, cwd=base_dir, depends_on=django, **supervision_opts,
+            ))
         else:
-            print(f"{colored('[WARN]', Colors.WARN)} script-read-qrcode.py não encontrado, pulando QR Reader.", flush=True)
-    
-    # Inicia o Django
-    django_args = [
-        python_exe, 'manage.py', 'runserver',
-        f'{args.django_host}:{args.django_port}',
-        '--noreload'  # Desativa reload para evitar duplicação de processos
-    ]
-    
-    django_proc = subprocess.Popen(
-        django_args,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-        bufsize=1,
-        cwd=base_dir,
-        env=env
-    )
-    
-    # Thread para ler output do Django
-    django_thread = Thread(target=stream_output, args=(django_proc, 'DJANGO', Colors.DJANGO), daemon=True)
-    django_thread.start()
-    
-    # Loop principal - espera os processos terminarem
+            log("script-read-qrcode.py não encontrado, pulando QR Reader.", logging.WARNING)
+
+    global sampler
+    if args.sample_interval > 0:
+        sampler = HealthSampler(args.sample_interval, args.history_minutes * 60)
+        sampler.start()
+
+    django.start()
+    started = time.monotonic()
+    all_ready = False
+    last_status = started
+
+    # Loop principal - supervisiona os processos
     try:
         while True:
-            # Verifica se algum processo morreu
-            if django_proc and django_proc.poll() is not None:
-                print(f"{colored('[ERRO]', Colors.ERROR)} Django parou inesperadamente!", flush=True)
-                cleanup()
-                break
-            
-            if qr_proc and qr_proc.poll() is not None and not args.no_qr:
-                print(f"{colored('[WARN]', Colors.WARN)} QR Reader parou.", flush=True)
-                qr_proc = None  # Não tentar parar de novo
-            
+            now = time.monotonic()
+            for service in services:
+                dependency = service.depends_on
+                if service.state == 'waiting':
+                    if dependency.state == 'ready':
+                        service.start()
+                    elif now - started > dependency.startup_timeout:
+                        log(f"{dependency.name} ainda não está pronto; iniciando {service.name} assim mesmo.",
+                            logging.WARNING)
+                        service.start()
+                    continue
+                if not service.supervise(now) and service.critical:
+                    log(f"{service.name} não se recupera; parando o DashLog.", logging.ERROR)
+                    cleanup()
+
+            if not all_ready and all(s.state == 'ready' for s in services):
+                all_ready = True
+                log(f"✓ DashLog pronto em {now - started:.1f}s")
+            if args.status_interval and now - last_status >= args.status_interval:
+                last_status = now
+                print_status()
+
             time.sleep(0.5)
     except KeyboardInterrupt:
         cleanup()